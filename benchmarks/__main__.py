@@ -0,0 +1,6 @@
+import sys
+
+from benchmarks.suite import main
+
+
+sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Micro-benchmarks for model construction and field assignment, which don't
+need a database:
+
+python -m benchmarks.fields
+"""
+
+from datetime import datetime
+import timeit
+
+from mogo import Field, Model, ReferenceField
+
+from typing import Any, Dict
+from typing import Callable, List, Tuple  # noqa: F401
+
+
+class Account(Model):
+    pass
+
+
+class Profile(Model):
+    name = Field[str](str, required=True)
+    email = Field[str](str)
+    age = Field[int](int, coerce_callback=int)
+    score = Field[float](float, default=0.0)
+    tags = Field[List[str]](list, default=list)
+    created = Field[datetime](datetime, default=datetime.now)
+    nickname = Field[str](str, field_name="nick")
+    account = ReferenceField(Account)
+
+
+ACCOUNT = Account(_id="account")
+VALUES = {
+    "name": "Malcolm Reynolds",
+    "email": "mal@serenity.example",
+    "age": "40",
+    "nickname": "Mal",
+    "account": ACCOUNT,
+}  # type: Dict[str, Any]
+
+
+def construct() -> None:
+    Profile(**VALUES)
+
+
+def assign(profile: Profile = Profile(name="Zoe")) -> None:
+    profile.email = "zoe@serenity.example"
+    profile.age = 33
+    profile.nickname = "Zoe"
+
+
+def load(document: Dict[str, Any] = dict(
+        Profile(**VALUES).copy(), _id="profile")) -> None:
+    Profile.from_document(document)
+
+
+BENCHMARKS = [
+    ("construct (5 fields + 3 defaults)", construct),
+    ("assign (3 fields)", assign),
+    ("from_document", load),
+]  # type: List[Tuple[str, Callable[[], None]]]
+
+
+def run(number: int = 20000, repeat: int = 5) -> Dict[str, float]:
+    """ Returns the best time per call (in microseconds) by benchmark """
+    results = {}
+    for name, function in BENCHMARKS:
+        best = min(timeit.repeat(function, number=number, repeat=repeat))
+        results[name] = best / number * 1e6
+    return results
+
+
+def main() -> None:
+    for name, microseconds in run().items():
+        print("{:<36} {:8.2f} us".format(name, microseconds))
+
+
+if __name__ == "__main__":
+    main()
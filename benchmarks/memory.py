@@ -0,0 +1,46 @@
+"""
+Measures the memory used by loaded model instances, not counting the
+documents themselves:
+
+python -m benchmarks.memory
+"""
+
+import tracemalloc
+
+from mogo import Field, Model
+
+from typing import Any, Dict, List, Type  # noqa: F401
+
+
+class Hero(Model):
+    name = Field[str](str)
+    age = Field[int](int)
+
+
+class SlottedHero(Model, slots=True):
+    name = Field[str](str)
+    age = Field[int](int)
+
+
+def measure(model: Type[Model], count: int = 100000) -> float:
+    """ Returns the average bytes allocated per model instance """
+    documents = [
+        {"_id": index, "name": "Hero", "age": index}
+        for index in range(count)]  # type: List[Dict[str, Any]]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    models = [model.from_document(document) for document in documents]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list holding the models is not part of the instances
+    list_size = 8 * len(models)
+    return (after - before - list_size) / count
+
+
+def main() -> None:
+    for name, model in [("Model", Hero), ("Model, slots=True", SlottedHero)]:
+        print("{:<24} {:8.1f} bytes".format(name, measure(model)))
+
+
+if __name__ == "__main__":
+    main()
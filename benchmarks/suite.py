@@ -0,0 +1,286 @@
+"""
+Micro-benchmarks for mogo's hot paths, run against the in-memory client
+(see mogo.memory) so they don't need a database:
+
+python -m benchmarks                   # compare against the baseline
+python -m benchmarks --save            # record a new baseline
+python -m benchmarks --threshold 0.2   # allow 20% slowdowns
+
+Each timing is the best of several repeats, spread over the run. The
+timings are divided by the time of a fixed pure Python workload (the
+median of the samples taken between the benchmarks), so a baseline
+recorded on one machine can be compared against another. The comparison
+exits with status 1 when a benchmark got slower than the baseline by
+more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import timeit
+
+import mogo
+from mogo import Field, Model, PolyModel, ReferenceField
+from mogo.memory import MemoryClient
+
+from typing import Any, cast, Dict, Optional, Sequence
+from typing import Callable, List, Tuple  # noqa: F401
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.5
+
+
+class Account(Model):
+    name = Field[str](str)
+
+
+class Profile(Model):
+    name = Field[str](str, required=True)
+    email = Field[str](str)
+    age = Field[int](int, coerce_callback=int)
+    score = Field[float](float, default=0.0)
+    tags = Field[List[str]](list, default=list)
+    nickname = Field[str](str, field_name="nick")
+    shout = Field[str](
+        str,
+        get_callback=lambda instance, value: (value or "").upper(),
+        set_callback=lambda instance, value: (value or "").strip())
+    account = ReferenceField(Account)
+
+
+class SavedProfile(Profile):
+    """ Keeps the saved profiles out of the hydration benchmark """
+    _name = "saved_profile"
+
+
+class Vehicle(PolyModel):
+    kind = Field[str](str, default="vehicle")
+    wheels = Field[int](int, default=4)
+
+    @classmethod
+    def get_child_key(cls) -> str:
+        return "kind"
+
+
+@Vehicle.register
+class Truck(Vehicle):
+    payload = Field[int](int, default=1000)
+
+
+@Vehicle.register
+class Bike(Vehicle):
+    wheels = Field[int](int, default=2)
+
+
+mogo.connect("benchmarks", client=MemoryClient())
+ACCOUNT = Account(name="Serenity")
+ACCOUNT.save()
+VALUES = {
+    "name": "Malcolm Reynolds",
+    "email": "mal@serenity.example",
+    "age": "40",
+    "nickname": "Mal",
+    "shout": " aim to misbehave ",
+    "account": ACCOUNT,
+}  # type: Dict[str, Any]
+for _index in range(100):
+    Profile(**dict(VALUES, age=_index)).save()
+
+PROFILE = Profile.find_one({"age": 1})
+assert PROFILE is not None
+PROFILE_DOCUMENT = dict(PROFILE.copy())
+TRUCK_DOCUMENT = dict(Truck(payload=500).copy(), _id="truck")
+UPDATED = SavedProfile(**VALUES)
+UPDATED.save()
+
+
+def calibration() -> None:
+    """ A fixed pure Python workload to scale the timings by """
+    values = {}
+    for index in range(100):
+        values[str(index)] = [index] * 3
+    sorted(values, key=lambda key: values[key][0])
+
+
+def construct() -> None:
+    Profile(**VALUES)
+
+
+def from_document() -> None:
+    Profile.from_document(PROFILE_DOCUMENT)
+
+
+def hydrate() -> None:
+    for _ in Profile.find():
+        pass
+
+
+def get_field(profile: Profile = PROFILE) -> None:
+    profile.name
+    profile.email
+    profile.nickname
+
+
+def get_field_callback(profile: Profile = PROFILE) -> None:
+    profile.shout
+
+
+def set_field(profile: Profile = PROFILE) -> None:
+    profile.name = "Zoe Washburne"
+    profile.email = "zoe@serenity.example"
+    profile.nickname = "Zoe"
+
+
+def set_field_callbacks(profile: Profile = PROFILE) -> None:
+    profile.age = "33"
+    profile.shout = " shiny "
+
+
+def polymodel_construct() -> None:
+    Vehicle(kind="truck", payload=500)
+
+
+def polymodel_from_document() -> None:
+    Vehicle.from_document(TRUCK_DOCUMENT)
+
+
+def dereference(profile: Profile = PROFILE) -> None:
+    profile.account
+
+
+def build_search() -> None:
+    Profile.search(name="Malcolm Reynolds", nickname="Mal", account=ACCOUNT)
+
+
+def save_insert() -> None:
+    SavedProfile(**VALUES).save()
+
+
+def save_update(profile: SavedProfile = UPDATED) -> None:
+    profile.score = cast(float, profile.score) + 1
+    profile.save()
+
+
+# (name, function, calls per timing)
+BENCHMARKS = [
+    ("construct", construct, 10000),
+    ("from_document", from_document, 50000),
+    ("cursor hydration (100 documents)", hydrate, 100),
+    ("field get (3 fields)", get_field, 50000),
+    ("field get with get_callback", get_field_callback, 50000),
+    ("field set (3 fields)", set_field, 20000),
+    ("field set with coerce / set callbacks", set_field_callbacks, 20000),
+    ("polymodel construct", polymodel_construct, 10000),
+    ("polymodel from_document", polymodel_from_document, 50000),
+    ("reference dereference", dereference, 10000),
+    ("search query building", build_search, 10000),
+    ("save (insert)", save_insert, 1000),
+    ("save (update)", save_update, 1000),
+]  # type: List[Tuple[str, Callable[[], None], int]]
+
+
+def measure(
+        function: Callable[[], None], number: int, repeat: int = 5) -> float:
+    """
+    Returns the best time per call, in microseconds (the other repeats
+    were slowed down by something else running)
+    """
+    best = min(timeit.repeat(function, number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def run(rounds: int = 3, repeat: int = 5) -> Dict[str, Any]:
+    """
+    Returns the best timing of each benchmark (in microseconds) and the
+    calibration, the median of the samples taken before each benchmark.
+    The benchmarks are repeated in rounds, so that a slow spell of the
+    machine doesn't affect all the timings of a benchmark.
+    """
+    samples = []  # type: List[float]
+    timings = {
+        name: [] for name, _, _ in BENCHMARKS
+    }  # type: Dict[str, List[float]]
+    for _ in range(rounds):
+        for name, function, number in BENCHMARKS:
+            samples.append(measure(calibration, 1000, repeat))
+            timings[name].append(measure(function, number, repeat))
+    return {
+        "calibration": statistics.median(samples),
+        "benchmarks": {name: min(values) for name, values in timings.items()},
+    }
+
+
+def relative_change(
+        results: Dict[str, Any],
+        baseline: Dict[str, Any],
+        name: str) -> Optional[float]:
+    """ The change from the baseline, relative to the calibration """
+    expected = baseline["benchmarks"].get(name)
+    if not expected:
+        return None
+    scale = baseline["calibration"] / results["calibration"]
+    return float(results["benchmarks"][name] * scale / expected - 1)
+
+
+def compare(
+        results: Dict[str, Any],
+        baseline: Dict[str, Any],
+        threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Returns the names of the benchmarks that are slower than the baseline
+    by more than the threshold (0.5 = 50%).
+    """
+    regressions = []
+    for name in results["benchmarks"]:
+        change = relative_change(results, baseline, name)
+        if change is not None and change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def load_baseline(path: str = BASELINE) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)  # type: Dict[str, Any]
+    return baseline
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--save", action="store_true", help="record a new baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="the allowed slowdown (default: %(default)s)")
+    parser.add_argument("--baseline", default=BASELINE)
+    args = parser.parse_args(argv)
+
+    results = run()
+    baseline = None if args.save else load_baseline(args.baseline)
+    for name, microseconds in results["benchmarks"].items():
+        line = "{:<40} {:10.2f} us".format(name, microseconds)
+        if baseline is not None:
+            change = relative_change(results, baseline, name)
+            if change is not None:
+                line += "  {:+7.1%}".format(change)
+        print(line)
+
+    if args.save:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        print("Saved the baseline to {}".format(args.baseline))
+        return 0
+    if baseline is None:
+        print("No baseline found, run with --save to record one.")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for name in regressions:
+        print("Regression: {} is more than {:.0%} slower than the "
+              "baseline".format(name, args.threshold), file=sys.stderr)
+    return 1 if regressions else 0
@@ -4,11 +4,18 @@ from mogo.model import *  # noqa: F403,F401
 from mogo.field import *  # noqa: F403,F401
 from mogo.cursor import *  # noqa: F403,F401
 from mogo.connection import *  # noqa: F403,F401
+from mogo.identity import *  # noqa: F403,F401
+from mogo.cache import *  # noqa: F403,F401
+from mogo.profiling import *  # noqa: F403,F401
 
 # Allows flexible (probably dangerous) automatic field creation for
 # /really/ schemaless designs.
 AUTO_CREATE_FIELDS = False
 
+# Computes field defaults on first access instead of on construction, and
+# only saves them when they were read or the field is required.
+LAZY_DEFAULTS = False
+
 
 __all__ = [  # noqa: F405
     "Model",
@@ -19,6 +26,9 @@ __all__ = [  # noqa: F405
     "EnumField",
     "connect",
     "session",
+    "identity_map",
+    "QueryCache",
+    "DocumentCache",
     "DESC",
     "ASC",
 ]
@@ -0,0 +1,569 @@
+"""
+Native asyncio support, built on PyMongo's AsyncMongoClient (PyMongo 4.9+).
+
+Model definitions are shared with the synchronous API -- every model (and
+model instance) has an `aio` attribute with the awaitable versions of the
+query and persistence methods:
+
+from mogo import aio
+
+aio.connect("my_database")
+
+hero = await Hero.aio.find_one({"name": "Mal"})
+hero.name = "Malcolm"
+await hero.aio.save()
+
+async for hero in Hero.aio.search(active=True).order(name=ASC):
+    print(hero.name)
+
+async with aio.session("other_database") as session:
+    await Hero.aio.use(session).create(name="Zoe")
+
+Field access on the models is still synchronous, so ReferenceFields must
+be resolved with `AsyncCursor.prefetch()`, and projections must include
+every field that is read: instead of blocking the event loop with the
+synchronous connection, loading a reference or a field left out by a
+projection of a model loaded with the asyncio API raises
+BlockingLoadError.
+"""
+
+from collections import deque
+from types import TracebackType
+
+from mogo.connection import get_database_name
+from mogo.cursor import ASC, DESC
+from mogo.field import ReferenceField
+from mogo.helpers import check_none, Document
+from mogo.identity import IdentityMap, _current_identity_map
+
+from bson.raw_bson import RawBSONDocument
+from pymongo.collation import Collation
+from pymongo.results import DeleteResult, UpdateResult
+
+try:
+    from pymongo import AsyncMongoClient
+    from pymongo.asynchronous.collection import AsyncCollection
+    from pymongo.asynchronous.cursor import AsyncCursor as PyAsyncCursor  # noqa
+    from pymongo.asynchronous.database import AsyncDatabase
+except ImportError:  # pragma: no cover
+    raise ImportError("mogo.aio requires PyMongo 4.9 or newer.")
+
+from contextvars import Token
+from typing import Any, Dict, Generic, List, Optional, Sequence
+from typing import Type, TypeVar, TYPE_CHECKING
+
+from typing import Deque, Tuple  # noqa: F401
+
+
+M = TypeVar("M", bound="Model")
+
+
+def _loaded(instance: M) -> M:
+    """
+    Marks an instance loaded with mogo.aio, so that its implicit loads
+    raise BlockingLoadError instead of blocking the event loop.
+    """
+    instance._asynchronous = True
+    return instance
+
+
+class AsyncConnection(object):
+    """ The asyncio counterpart of mogo.connection.Connection. """
+
+    _instance = None  # type: Optional['AsyncConnection']
+    _database = None  # type: Optional[str]
+    connection: Optional[AsyncMongoClient[Document]] = None
+
+    @classmethod
+    def instance(cls) -> "AsyncConnection":
+        """ Retrieves the shared connection. """
+        if not cls._instance:
+            cls._instance = AsyncConnection()
+        return cls._instance
+
+    @classmethod
+    def connect(
+            cls, database: Optional[str] = None,
+            uri: str = "mongodb://localhost:27017",
+            **kwargs: Any) -> AsyncMongoClient[Document]:
+        """ Wraps an (asyncio) pymongo connection. """
+        database = get_database_name(database, uri)
+        conn = cls.instance()
+        conn._database = database
+        conn.connection = AsyncMongoClient(uri, **kwargs)
+        return conn.connection
+
+    def get_database(
+            self,
+            database: Optional[str] = None) -> AsyncDatabase[Document]:
+        """ Retrieves a database from an existing connection. """
+        if not self.connection:
+            raise ConnectionError("No connection")
+        if not database:
+            if not self._database:
+                raise Exception("No database submitted")
+            database = self._database
+        return self.connection[database]
+
+    def get_collection(
+            self,
+            collection: str,
+            database: Optional[str] = None) -> AsyncCollection[Document]:
+        """ Retrieve a collection from an existing connection. """
+        return self.get_database(database=database)[collection]
+
+
+class AsyncSession(object):
+    """ The asyncio counterpart of mogo.connection.Session. """
+
+    connection = None  # type: Optional[AsyncConnection]
+    database = None  # type: Optional[str]
+    args = None  # type: Any
+    kwargs = None  # type: Any
+    identity_map = None  # type: Optional[IdentityMap]
+    _identity_token: Optional[Token[Optional[IdentityMap]]] = None
+
+    def __init__(
+            self,
+            database: str,
+            *args: Any,
+            identity_map: bool = False,
+            **kwargs: Any) -> None:
+        self.connection = None
+        self.database = database
+        self.args = args
+        self.kwargs = kwargs
+        self.identity_map = IdentityMap() if identity_map else None
+
+    def connect(self) -> None:
+        """ Connect to MongoDB """
+        connection = AsyncConnection()
+        connection._database = self.database
+        connection.connection = AsyncMongoClient(*self.args, **self.kwargs)
+        self.connection = connection
+
+    async def close(self) -> None:
+        if self.connection is not None and \
+                self.connection.connection is not None:
+            await self.connection.connection.close()
+
+    async def __aenter__(self) -> "AsyncSession":
+        """ Open the connection """
+        self.connect()
+        if self.identity_map is not None:
+            self._identity_token = _current_identity_map.set(
+                self.identity_map)
+        return self
+
+    async def __aexit__(
+            self,
+            exc_type: Optional[Type[Exception]],
+            exc_value: Optional[Exception],
+            traceback: Optional[TracebackType]) -> None:
+        """ Close the connection """
+        if self._identity_token is not None:
+            _current_identity_map.reset(self._identity_token)
+            self._identity_token = None
+            check_none(self.identity_map).clear()
+        await self.close()
+
+
+def connect(*args: Any, **kwargs: Any) -> AsyncMongoClient[Document]:
+    """ Initializes the shared asyncio connection and the database. """
+    return AsyncConnection.connect(*args, **kwargs)
+
+
+def session(database: str, *args: Any, **kwargs: Any) -> AsyncSession:
+    """ Returns a session object to be used with `async with`. """
+    return AsyncSession(database, *args, **kwargs)
+
+
+class _AsyncManager(Generic[M]):
+
+    def __init__(
+            self,
+            model: Type[M],
+            connection: Optional[AsyncConnection] = None) -> None:
+        self.model = model
+        self._connection = connection
+
+    def get_collection(self) -> AsyncCollection[Document]:
+        """ Returns the model's collection on the asyncio connection """
+        connection = self._connection or AsyncConnection.instance()
+        collection = connection.get_collection(self.model._get_name())
+        if self.model.LAZY_DECODING:
+            codec_options = collection.codec_options.with_options(
+                document_class=RawBSONDocument)
+            return collection.with_options(codec_options=codec_options)
+        return collection
+
+    def _get_session_connection(
+            self, session: AsyncSession) -> AsyncConnection:
+        if session.connection is None:
+            raise Exception("No connection for session.")
+        return session.connection
+
+
+class AsyncModelManager(_AsyncManager[M]):
+    """ The awaitable class methods of a model, available as `Model.aio`. """
+
+    def use(self, session: AsyncSession) -> "AsyncModelManager[M]":
+        """ Uses a specific connection session """
+        return AsyncModelManager(
+            self.model, self._get_session_connection(session))
+
+    def find(
+            self,
+            spec: Optional[Dict[str, Any]] = None,
+            *args: Any,
+            **kwargs: Any) -> "AsyncCursor[M]":
+        """ A wrapper for the pymongo AsyncCursor. """
+        if kwargs and spec is None and not args:
+            raise ValueError(
+                "find() requires a query when called with keyword arguments")
+        spec = self.model._update_search_spec(spec)
+        return AsyncCursor(self, spec, *args, **kwargs)
+
+    async def find_one(
+            self,
+            spec: Optional[Dict[str, Any]] = None,
+            *args: Any,
+            **kwargs: Any) -> Optional[M]:
+        """ A wrapper for collection.find_one(). """
+        if kwargs and spec is None and not args:
+            raise ValueError(
+                "find_one() requires a query when called with "
+                "keyword arguments")
+        collection = self.get_collection()
+        namespace = collection.full_name
+        identity = self.model._get_identity((spec,) + args, kwargs, namespace)
+        if identity is not None:
+            return _loaded(identity)
+        cached = self.model._get_cached((spec,) + args, kwargs, collection)
+        if cached is not None:
+            return _loaded(cached)
+        spec = self.model._update_search_spec(spec)
+        args, kwargs, projection = self.model._get_projection_arguments(
+            0, args, kwargs)
+        document = await collection.find_one(spec, *args, **kwargs)
+        if document is None:
+            return None
+        self.model._cache_loaded(collection, document, projection)
+        return _loaded(
+            self.model._load_document(document, projection, namespace))
+
+    def search(self, **kwargs: Any) -> "AsyncCursor[M]":
+        """ Like Model.search() """
+        return self.find(self.model._build_search_spec(kwargs))
+
+    async def first(self, **kwargs: Any) -> Optional[M]:
+        """ Like Model.first() """
+        return await self.search(**kwargs).first()
+
+    async def grab(self, object_id: Any) -> Optional[M]:
+        """ A shortcut to retrieve one object by its id. """
+        if not isinstance(object_id, self.model._id_type):
+            object_id = self.model._id_type(object_id)
+        return await self.find_one({self.model._id_field: object_id})
+
+    async def create(self, **kwargs: Any) -> M:
+        """ Create a new model and save it. """
+        model = self.model.new(**kwargs)
+        await AsyncInstanceManager(model, self._connection).save()
+        return model
+
+    async def count_documents(
+            self,
+            filter: Dict[str, Any],
+            *args: Any,
+            **kwargs: Any) -> int:
+        return await self.get_collection().count_documents(
+            filter, *args, **kwargs)
+
+    async def distinct(self, key: str) -> List[Any]:
+        """ Wrapper for collection distinct() """
+        return await self.get_collection().distinct(
+            key, self.model._update_search_spec(None))
+
+    async def update(
+            self,
+            *args: Any,
+            multi: bool = False,
+            **kwargs: Any) -> UpdateResult:
+        """ Direct passthru to PyMongo's update_one / update_many. """
+        collection = self.get_collection()
+        args, kwargs = self.model._get_update_arguments(args, kwargs)
+        try:
+            if multi:
+                return await collection.update_many(*args, **kwargs)
+            return await collection.update_one(*args, **kwargs)
+        finally:
+            self.model._collection_changed(collection.full_name)
+
+    async def remove(
+            self,
+            *args: Any,
+            multi: bool = False,
+            **kwargs: Any) -> DeleteResult:
+        """ Just a wrapper around the collection's delete methods. """
+        if not args:
+            raise ValueError(
+                "remove() requires a query when called with keyword arguments")
+        collection = self.get_collection()
+        try:
+            if multi:
+                return await collection.delete_many(*args, **kwargs)
+            return await collection.delete_one(*args, **kwargs)
+        finally:
+            self.model._collection_changed(collection.full_name)
+
+
+class AsyncInstanceManager(_AsyncManager[M]):
+    """ The awaitable instance methods of a model, as `instance.aio`. """
+
+    def __init__(
+            self,
+            instance: M,
+            connection: Optional[AsyncConnection] = None) -> None:
+        super().__init__(type(instance), connection)
+        self.instance = instance
+
+    def use(self, session: AsyncSession) -> "AsyncInstanceManager[M]":
+        """ Uses a specific connection session """
+        return AsyncInstanceManager(
+            self.instance, self._get_session_connection(session))
+
+    async def save(self, replace: bool = False) -> Any:
+        """ Like Model.save() """
+        instance = self.instance
+        collection = self.get_collection()
+        instance._check_required()
+        object_id = instance._get_id()
+        version = instance._get_next_version()
+        if object_id is None:
+            result = await collection.insert_one(
+                instance._get_versioned_copy(version))
+            object_id = result.inserted_id
+            instance[instance._id_field] = object_id
+        elif replace or instance._needs_replace():
+            instance._check_replaceable()
+            spec = instance._get_write_spec()
+            instance._check_version(await collection.replace_one(
+                spec, instance._get_versioned_copy(version),
+                upsert=instance._may_upsert(spec)))
+        else:
+            modifier = instance._get_changes()
+            if not modifier:
+                version = None
+            else:
+                spec = instance._get_write_spec()
+                update_result = await collection.update_one(spec, modifier)
+                instance._check_version(update_result)
+                instance._check_updated(update_result)
+                if instance._needs_restore(update_result):
+                    await collection.replace_one(
+                        spec, instance.copy(), upsert=True)
+        instance._set_version(version)
+        instance._documents_changed(collection.full_name)
+        instance._reset_changes()
+        instance._remember(collection.full_name)
+        instance._cache_document(collection)
+        return object_id
+
+    async def update(self, **kwargs: Any) -> UpdateResult:
+        """ Like calling Model.update() on an instance. """
+        instance = self.instance
+        version = instance._get_next_version()
+        spec, body = instance._prepare_instance_update(kwargs)
+        collection = self.get_collection()
+        result = await collection.update_one(
+            spec, instance._add_version_increment({"$set": body}))
+        instance._check_version(result)
+        instance._set_version(version)
+        instance._documents_changed(collection.full_name)
+        instance._uncache_document(collection.full_name)
+        if instance._changed_keys is not None:
+            instance._changed_keys = instance._changed_keys.difference(body)
+        return result
+
+    async def delete(self, *args: Any, **kwargs: Any) -> DeleteResult:
+        """ Like Model.delete() """
+        instance = self.instance
+        object_id = instance._get_id()
+        if not object_id:
+            raise ValueError("No id has been set, so removal is impossible.")
+        collection = self.get_collection()
+        result = await collection.delete_one(
+            {instance._id_field: object_id}, *args, **kwargs)
+        instance._documents_changed(collection.full_name)
+        instance._uncache_document(collection.full_name)
+        instance._forget(collection.full_name)
+        return result
+
+
+class AsyncCursor(Generic[M]):
+    """ The asyncio counterpart of mogo.cursor.Cursor. """
+
+    _prefetch_batch_size = 100  # type: int
+
+    def __init__(
+            self,
+            manager: AsyncModelManager[M],
+            spec: Optional[Dict[str, Any]] = None,
+            *args: Any,
+            **kwargs: Any) -> None:
+        self._manager = manager
+        self._model = manager.model
+        self._query = spec
+        self._order_entries = []  # type: List[Tuple[str, int]]
+        self._prefetch_fields = []  # type: List[ReferenceField]
+        self._buffer = deque()  # type: Deque[M]
+        args, kwargs, projection = self._model._get_projection_arguments(
+            0, args, kwargs)
+        self._projection = projection
+        collection = manager.get_collection()
+        self._namespace = collection.full_name
+        self._cursor = collection.find(
+            spec, *args, **kwargs)  # type: PyAsyncCursor[Document]
+
+    def __aiter__(self) -> "AsyncCursor[M]":
+        return self
+
+    async def __anext__(self) -> M:
+        if self._prefetch_fields:
+            return await self._next_prefetched()
+        return self._load(await self._cursor.next())
+
+    def _load(self, document: Document) -> M:
+        return _loaded(self._model._load_document(
+            document, self._projection, self._namespace))
+
+    async def _next_prefetched(self) -> M:
+        if not self._buffer:
+            batch = []  # type: List[M]
+            while len(batch) < self._prefetch_batch_size:
+                try:
+                    batch.append(self._load(await self._cursor.next()))
+                except StopAsyncIteration:
+                    break
+            if not batch:
+                raise StopAsyncIteration
+            for field in self._prefetch_fields:
+                await self._prefetch(field, batch)
+            self._buffer.extend(batch)
+        return self._buffer.popleft()
+
+    async def _prefetch(
+            self, field: ReferenceField, models: Sequence[M]) -> None:
+        references = field._collect_references(models)
+        if not references:
+            return
+        ids = list({reference.id for _, _, reference in references})
+        manager = AsyncModelManager(field.model, self._manager._connection)
+        collection = manager.get_collection()
+        found = {}  # type: Dict[Any, Model]
+        missing = []
+        for object_id in ids:
+            cached = field.model._get_cached(
+                [{field.model._id_field: object_id}], {}, collection)
+            if cached is None:
+                missing.append(object_id)
+            else:
+                found[object_id] = _loaded(cached)
+        if missing:
+            cursor = manager.find({field.model._id_field: {"$in": missing}})
+            async for document in cursor._cursor:
+                model = cursor._load(document)
+                found[model._get_id()] = model
+                field.model._cache_loaded(collection, document, None)
+        field._store_references(references, found)
+
+    def prefetch(
+            self,
+            *fields: str,
+            batch_size: Optional[int] = None) -> "AsyncCursor[M]":
+        """ Like Cursor.prefetch() """
+        for name in fields:
+            field = getattr(self._model, name, None)
+            if not isinstance(field, ReferenceField):
+                raise ValueError(
+                    "Cannot prefetch '{}', it is not a ReferenceField.".format(
+                        name))
+            self._prefetch_fields.append(field)
+        if batch_size is not None:
+            if batch_size < 1:
+                raise ValueError("batch_size must be a positive integer.")
+            self._prefetch_batch_size = batch_size
+        return self
+
+    async def first(self) -> Optional[M]:
+        try:
+            return await self.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def to_list(self, length: Optional[int] = None) -> List[M]:
+        """ Loads (up to `length`) remaining results into a list. """
+        results = []  # type: List[M]
+        async for model in self:
+            results.append(model)
+            if length is not None and len(results) >= length:
+                break
+        return results
+
+    async def count(self) -> int:
+        collection = self._manager.get_collection()
+        return await collection.count_documents(self._query or {})
+
+    async def distinct(self, key: str) -> List[Any]:
+        return await self._cursor.distinct(key)
+
+    async def close(self) -> None:
+        await self._cursor.close()
+
+    async def rewind(self) -> "AsyncCursor[M]":
+        await self._cursor.rewind()
+        self._buffer.clear()
+        return self
+
+    def collation(self, collation: Collation) -> "AsyncCursor[M]":
+        self._cursor.collation(collation)
+        return self
+
+    def skip(self, skip: int) -> "AsyncCursor[M]":
+        self._cursor.skip(skip)
+        return self
+
+    def limit(self, limit: int) -> "AsyncCursor[M]":
+        self._cursor.limit(limit)
+        return self
+
+    def sort(self, *args: Any, **kwargs: Any) -> "AsyncCursor[M]":
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def order(self, **kwargs: int) -> "AsyncCursor[M]":
+        """ Like Cursor.order() """
+        if len(kwargs) != 1:
+            raise ValueError("order() requires one field = ASC or DESC.")
+        for key, value in kwargs.items():
+            if value not in (ASC, DESC):
+                raise TypeError("Order value must be mogo.ASC or mogo.DESC.")
+            self._order_entries.append((key, value))
+            self._cursor.sort(list(self._order_entries))
+        return self
+
+
+if TYPE_CHECKING:
+    from mogo.model import Model  # noqa: F401
+
+
+__all__ = [
+    "AsyncConnection",
+    "AsyncCursor",
+    "AsyncInstanceManager",
+    "AsyncModelManager",
+    "AsyncSession",
+    "connect",
+    "session",
+]
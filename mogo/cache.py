@@ -0,0 +1,287 @@
+"""
+An opt-in cache for the results of identical queries, per model:
+
+class Hero(Model):
+    QUERY_CACHE = QueryCache(max_size=500, ttl=60)
+
+Hero.search(active=True) (iterated to the end), Hero.count() and
+Hero.distinct("team") then only query the database once, until any write
+through mogo to the "hero" collection (or the ttl) expires the results.
+Writes from other processes are only picked up when the ttl expires.
+
+Models can also cache their documents by id, which serves grab(),
+find_one() by id and ReferenceField lookups:
+
+class Team(Model):
+    DOCUMENT_CACHE = DocumentCache(max_size=10000)
+
+The documents are kept in a CacheBackend, which can be shared between
+processes (e.g. memcached or redis) by implementing the interface.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+from weakref import WeakSet
+
+import bson
+from bson.codec_options import CodecOptions, DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+
+from mogo.helpers import Document
+
+from typing import Any, Dict, Hashable, Optional, Tuple  # noqa: F401
+
+
+# The number of writes seen per collection full name. Cached results
+# remember the count at the time of their query, so a write expires
+# the results in every cache at once.
+_generations = {}  # type: Dict[str, int]
+_caches = WeakSet()  # type: WeakSet[QueryCache]
+_lock = threading.Lock()
+
+
+def get_generation(namespace: str) -> int:
+    return _generations.get(namespace, 0)
+
+
+def invalidate(namespace: str) -> None:
+    """ Expires every cached result for the collection (by full name). """
+    with _lock:
+        _generations[namespace] = _generations.get(namespace, 0) + 1
+
+
+def caches_enabled() -> bool:
+    """ Whether any QueryCache exists, so writes have to be tracked. """
+    return bool(_caches)
+
+
+_CacheEntry = Tuple[str, int, Optional[float], Any]
+
+
+class QueryCache(object):
+    """
+    A least recently used cache of query results, with an optional time
+    to live in seconds. Keys start with the collection's full name.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: Optional[float] = None):
+        if max_size < 1:
+            raise ValueError("max_size must be a positive integer.")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be a positive number of seconds.")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = \
+            OrderedDict()  # type: OrderedDict[Hashable, _CacheEntry]
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Any]:
+        """ Returns the cached value, or None (counted as a miss). """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_namespace, generation, expires, value = entry
+                if generation == get_generation(entry_namespace) and (
+                        expires is None or expires > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(
+            self,
+            namespace: str,
+            key: Hashable,
+            value: Any,
+            generation: int) -> None:
+        """
+        Caches the value of a query that started at the given generation
+        of the collection, unless the collection was written to since.
+        """
+        if generation != get_generation(namespace):
+            return
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (namespace, generation, expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBackend(object):
+    """
+    The storage of a DocumentCache, mapping string keys to encoded
+    documents. Keys start with the collection's full name and a colon.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError("`get(key)` not implemented.")
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError("`set(key, value)` not implemented.")
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError("`delete(key)` not implemented.")
+
+    def delete_prefix(self, prefix: str) -> None:
+        """ Deletes every key that starts with the prefix. """
+        raise NotImplementedError("`delete_prefix(prefix)` not implemented.")
+
+
+class DictCacheBackend(CacheBackend):
+    """ An unbounded backend, e.g. for tests. """
+
+    def __init__(self) -> None:
+        self.values = {}  # type: Dict[str, bytes]
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.values.get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.values[key] = value
+
+    def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        for key in [key for key in self.values if key.startswith(prefix)]:
+            del self.values[key]
+
+
+class LocalCacheBackend(CacheBackend):
+    """ An in-process backend keeping the most recently used documents. """
+
+    def __init__(self, max_size: int = 10000) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be a positive integer.")
+        self.max_size = max_size
+        self._values = OrderedDict()  # type: OrderedDict[str, bytes]
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._values if key.startswith(
+                    prefix)]:
+                del self._values[key]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class DocumentCache(object):
+    """
+    Caches complete documents by id, encoded as BSON so that the models
+    loaded from the cache don't share any state.
+    """
+
+    def __init__(
+            self,
+            max_size: int = 10000,
+            backend: Optional[CacheBackend] = None) -> None:
+        if backend is None:
+            backend = LocalCacheBackend(max_size)
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def _get_key(self, namespace: str, object_id: Any) -> str:
+        # encoded, so that e.g. 1 and "1" are different keys
+        return "{}:{}".format(
+            namespace, bson.encode({"_id": object_id}).hex())
+
+    def get(
+            self,
+            namespace: str,
+            object_id: Any,
+            codec_options: "CodecOptions[Any]" = DEFAULT_CODEC_OPTIONS
+            ) -> Optional[Document]:
+        """ Returns the cached document, or None (counted as a miss). """
+        value = self.backend.get(self._get_key(namespace, object_id))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        document = bson.decode(
+            value, codec_options=codec_options)  # type: Document
+        return document
+
+    def set(
+            self,
+            namespace: str,
+            object_id: Any,
+            document: Document,
+            codec_options: "CodecOptions[Any]" = DEFAULT_CODEC_OPTIONS
+            ) -> None:
+        if isinstance(document, RawBSONDocument):
+            value = bytes(document.raw)
+        else:
+            value = bson.encode(document, codec_options=codec_options)
+        self.backend.set(self._get_key(namespace, object_id), value)
+
+    def delete(self, namespace: str, object_id: Any) -> None:
+        self.backend.delete(self._get_key(namespace, object_id))
+
+    def clear(self, namespace: str) -> None:
+        """ Forgets every document of the collection. """
+        self.backend.delete_prefix("{}:".format(namespace))
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+__all__ = [
+    "QueryCache",
+    "DocumentCache",
+    "CacheBackend",
+    "DictCacheBackend",
+    "LocalCacheBackend",
+]
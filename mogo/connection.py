@@ -1,6 +1,7 @@
 """ The wrapper for pymongo's connection stuff. """
 
-from mogo.helpers import Document
+from mogo.helpers import check_none, Document
+from mogo.identity import IdentityMap, _current_identity_map
 
 from urllib.parse import urlparse
 from pymongo import MongoClient
@@ -8,8 +9,10 @@ from pymongo.collection import Collection
 from pymongo.database import Database
 from pymongo.errors import ConnectionFailure
 
+from contextvars import Token
 from types import TracebackType
 from typing import Any, Optional, Type
+from typing import Dict, Tuple  # noqa: F401
 
 
 class Connection(object):
@@ -20,6 +23,8 @@ class Connection(object):
 
     _instance = None  # type: Optional['Connection']
     _database = None  # type: Optional[str]
+    # the arguments of connect(), to connect again from other processes
+    _connect_args = None  # type: Optional[Tuple[str, str, Dict[str, Any]]]
     connection: Optional[MongoClient[Document]] = None
 
     @classmethod
@@ -33,21 +38,23 @@ class Connection(object):
     def connect(
             cls, database: Optional[str] = None,
             uri: str = "mongodb://localhost:27017",
+            client: Optional[Any] = None,
             **kwargs: Any) -> MongoClient[Document]:
         """
-        Wraps a pymongo connection.
+        Wraps a pymongo connection. A `client` (e.g. a
+        mogo.memory.MemoryClient) is used instead of connecting to `uri`.
         TODO: Allow some of the URI stuff.
         """
-        if not database:
-            database = urlparse(uri).path
-            while database.startswith("/"):
-                database = database[1:]
-            if not database:
-                raise ValueError("A database name is required to connect.")
-
+        database = get_database_name(database, uri)
         conn = cls.instance()
         conn._database = database
-        conn.connection = MongoClient(uri, **kwargs)
+        if client is not None:
+            # other processes can't share the client
+            conn._connect_args = None
+            conn.connection = client
+        else:
+            conn._connect_args = (database, uri, kwargs)
+            conn.connection = MongoClient(uri, **kwargs)
         return conn.connection
 
     def get_database(
@@ -78,19 +85,37 @@ class Session(object):
     database = None  # type: Optional[str]
     args = None  # type: Any
     kwargs = None  # type: Any
+    identity_map = None  # type: Optional[IdentityMap]
+    client = None  # type: Optional[Any]
+    _identity_token: Optional[Token[Optional[IdentityMap]]] = None
 
-    def __init__(self, database: str, *args: Any, **kwargs: Any) -> None:
-        """ Stores a connection instance """
+    def __init__(
+            self,
+            database: str,
+            *args: Any,
+            identity_map: bool = False,
+            client: Optional[Any] = None,
+            **kwargs: Any) -> None:
+        """
+        Stores a connection instance. With `identity_map`, an identity map
+        is active for the duration of the `with` block. A `client` (e.g. a
+        mogo.memory.MemoryClient) is used instead of a new MongoClient.
+        """
         self.connection = None
         self.database = database
         self.args = args
         self.kwargs = kwargs
+        self.identity_map = IdentityMap() if identity_map else None
+        self.client = client
 
     def connect(self) -> None:
         """ Connect to MongoDB """
         connection = Connection()
         connection._database = self.database
-        connection.connection = MongoClient(*self.args, **self.kwargs)
+        if self.client is not None:
+            connection.connection = self.client
+        else:
+            connection.connection = MongoClient(*self.args, **self.kwargs)
         self.connection = connection
 
     def disconnect(self) -> None:
@@ -105,6 +130,9 @@ class Session(object):
     def __enter__(self) -> 'Session':
         """ Open the connection """
         self.connect()
+        if self.identity_map is not None:
+            self._identity_token = _current_identity_map.set(
+                self.identity_map)
         return self
 
     def __exit__(
@@ -113,9 +141,24 @@ class Session(object):
             exc_value: Optional[Exception],
             traceback: Optional[TracebackType]) -> None:
         """ Close the connection """
+        if self._identity_token is not None:
+            _current_identity_map.reset(self._identity_token)
+            self._identity_token = None
+            check_none(self.identity_map).clear()
         self.disconnect()
 
 
+def get_database_name(database: Optional[str], uri: str) -> str:
+    """ Returns the database name, falling back to the one in the URI. """
+    if not database:
+        database = urlparse(uri).path
+        while database.startswith("/"):
+            database = database[1:]
+        if not database:
+            raise ValueError("A database name is required to connect.")
+    return database
+
+
 def connect(*args: Any, **kwargs: Any) -> MongoClient[Document]:
     """
     Initializes a connection and the database. It returns
@@ -1,19 +1,186 @@
-from mogo.helpers import check_none, Document
+from mogo.cache import get_generation, QueryCache
+from mogo.field import Field, ReferenceField
+from mogo.helpers import check_none, Document, get_bson_type
+from mogo.helpers import is_inclusion_projection
+from mogo import instrumentation
+from mogo.instrumentation import instrumented, track_documents
 
+import bson
+from bson.codec_options import CodecOptions
+from bson.errors import BSONError
+from bson.raw_bson import RawBSONDocument
 from pymongo import ASCENDING, DESCENDING
 from pymongo.collation import Collation
 from pymongo.cursor import Cursor as PyCursor
 
-from typing import Any, cast, Dict, Generic, Optional
-from typing import Type, TypeVar, TYPE_CHECKING
+from typing import Any, Callable, cast, Dict, Generic, Hashable, Iterator
+from typing import Optional, Type, TypeVar, TYPE_CHECKING
 
-from typing import List, Tuple  # noqa: F401
+import base64
+import binascii
+from collections import deque
+from collections.abc import Mapping
+from functools import lru_cache
+import keyword
+from typing import Deque, List, Sequence, Tuple  # noqa: F401
 
 
 ASC = ASCENDING
 DESC = DESCENDING
 
 T = TypeVar("T", bound="Model")
+V = TypeVar("V")
+
+
+class Record(object):
+    """
+    A lightweight, read-only result row returned by Cursor.records(). The
+    attributes are the storage names of the requested fields.
+    """
+
+    __slots__ = ()
+    _fields = ()  # type: Tuple[str, ...]
+
+    def __init__(self, *values: Any) -> None:
+        for name, value in zip(self._fields, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Records are read-only.")
+
+    def _asdict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._fields}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Record):
+            return False
+        return self._asdict() == other._asdict()
+
+    def __repr__(self) -> str:
+        return "Record({})".format(", ".join(
+            "{}={!r}".format(name, getattr(self, name))
+            for name in self._fields))
+
+
+@lru_cache(maxsize=128)
+def _record_class(fields: Tuple[str, ...]) -> Type[Record]:
+    """ Creates (and caches) a slotted Record subclass for the fields. """
+    for name in fields:
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(
+                "Cannot create a record with the field '{}'.".format(name))
+    return type(
+        "Record", (Record,), {"__slots__": fields, "_fields": fields})
+
+
+def _get_path(document: Document, path: str) -> Any:
+    """ Returns the value at a dotted path of a document (None if missing) """
+    value = document  # type: Any
+    for key in path.split("."):
+        if not isinstance(value, Mapping):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _encode_page_token(
+        key: str, direction: int, value: Any, object_id: Any) -> str:
+    """ Encodes the position after a page as an (opaque) token. """
+    position = {"k": key, "d": direction, "v": value, "i": object_id}
+    return base64.urlsafe_b64encode(bson.encode(position)).decode("ascii")
+
+
+def _decode_page_token(
+        token: str, key: str, direction: int) -> Tuple[Any, Any]:
+    """ Returns the (value, id) position stored in a page token. """
+    try:
+        position = bson.decode(base64.urlsafe_b64decode(token))
+    except (BSONError, binascii.Error, ValueError):
+        raise ValueError("Invalid pagination token.")
+    if position.get("k") != key or position.get("d") != direction:
+        raise ValueError(
+            "The pagination token was created for a different order.")
+    return position.get("v"), position.get("i")
+
+
+# the $type aliases, in the order that the server sorts values by type
+_TYPE_ORDER = (
+    ("minKey",), ("null",), ("int", "long", "double", "decimal"),
+    ("string", "symbol"), ("object",), ("array",), ("binData",),
+    ("objectId",), ("bool",), ("date",), ("timestamp",), ("regex",),
+    ("maxKey",))
+
+
+def _get_type_position(value: Any) -> int:
+    """ The position of a (sort key) value's type in the sort order. """
+    bson_type = get_bson_type(value)
+    if bson_type == "array":
+        raise ValueError("Cannot paginate by a field with array values.")
+    for position, aliases in enumerate(_TYPE_ORDER):
+        if bson_type in aliases:
+            return position
+    raise ValueError("Cannot paginate by a value of type {}.".format(
+        type(value).__name__))
+
+
+def _get_page_predicate(
+        key: str,
+        value: Any,
+        id_field: str,
+        object_id: Any,
+        direction: int) -> Dict[str, Any]:
+    """
+    Matches the documents after the (value, id) position in the order.
+    Comparisons only match values of the same type, so the values of the
+    types that sort after the value's type are matched by $type (and
+    null, which also matches missing fields, explicitly).
+    """
+    operator = "$gt" if direction == ASC else "$lt"
+    position = _get_type_position(value)
+    after = [
+        {key: value, id_field: {operator: object_id}},
+    ]  # type: List[Dict[str, Any]]
+    if get_bson_type(value) not in ("null", "minKey", "maxKey"):
+        after.append({key: {operator: value}})
+    if direction == ASC:
+        types = _TYPE_ORDER[position + 1:]
+    else:
+        types = _TYPE_ORDER[:position]
+    aliases = [
+        alias for group in types for alias in group if alias != "null"]
+    if aliases:
+        after.append({key: {"$type": aliases}})
+    if ("null",) in types:
+        after.append({key: None})
+    return {"$or": after}
+
+
+def _cache_documents(
+        cursor: Iterator[Document],
+        codec_options: "CodecOptions[Any]",
+        cache: QueryCache,
+        namespace: str,
+        key: Hashable,
+        generation: int) -> Iterator[Document]:
+    """
+    Yields the cursor's documents, and caches them (encoded, so that they
+    can't be modified) once all of them have been read.
+    """
+    encoded = []
+    for document in cursor:
+        if isinstance(document, RawBSONDocument):
+            encoded.append(document.raw)
+        else:
+            encoded.append(bson.encode(document, codec_options=codec_options))
+        yield document
+    cache.set(namespace, key, tuple(encoded), generation)
+
+
+def _cache_value(value: Any) -> Any:
+    """ Converts modifier arguments to something BSON can encode """
+    if isinstance(value, Collation):
+        return value.document
+    return value
 
 
 class Cursor(Generic[T]):
@@ -24,6 +191,20 @@ class Cursor(Generic[T]):
     _model = None  # type: Optional[Type[T]]
     _model_class = None  # type: Optional[Type[T]]
     _cursor: Optional[PyCursor[Document]] = None
+    _args = ()  # type: Tuple[Any, ...]
+    _kwargs = {}  # type: Dict[str, Any]
+    # (method name, args, kwargs) applied to the pymongo cursor, so that
+    # it can be rebuilt with a new projection
+    _modifiers = []  # type: List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]]
+    _projection = None  # type: Optional[Dict[str, Any]]
+    _prefetch_fields: Sequence[ReferenceField] = ()
+    _prefetch_batch_size = 100  # type: int
+    _buffer = None  # type: Optional[Deque[T]]
+    # the documents being iterated over (see _load_documents())
+    _documents = None  # type: Optional[Iterator[Document]]
+    # the (model name, method name) that created the cursor, when
+    # instrumentation is enabled
+    _operation = None  # type: Optional[Tuple[Optional[str], str]]
 
     def __init__(
             self,
@@ -35,24 +216,167 @@ class Cursor(Generic[T]):
         self._query = spec
         self._model = model
         self._model_class = model
-        self._cursor = PyCursor(
-            self._model_class._get_collection(), spec, *args, **kwargs)
+        args, kwargs, self._projection = model._get_projection_arguments(
+            0, args, kwargs)
+        self._args = args
+        self._kwargs = kwargs
+        self._modifiers = []
+        self._cursor = self._model_class._get_collection().find(
+            spec, *args, **kwargs)
+        if instrumentation.is_enabled():
+            self._operation = instrumentation.get_current_operation() or (
+                model.__name__, "find")
+
+    def _modify(self, method: str, *args: Any, **kwargs: Any) -> None:
+        """ Applies (and records) a modifier on the pymongo cursor """
+        getattr(check_none(self._cursor), method)(*args, **kwargs)
+        self._modifiers.append((method, args, kwargs))
+
+    def _rebuild(self) -> None:
+        """ Recreates the pymongo cursor with the current projection """
+        cursor = self._find(self._query, self._projection)
+        for method, method_args, method_kwargs in self._modifiers:
+            getattr(cursor, method)(*method_args, **method_kwargs)
+        self._cursor = cursor
+        self._buffer = None
+        self._documents = None
+
+    def _find(
+            self,
+            spec: Optional[Dict[str, Any]],
+            projection: Optional[Dict[str, Any]]) -> PyCursor[Document]:
+        """ Runs the cursor's find() with another query and projection """
+        args = self._args
+        kwargs = dict(self._kwargs)
+        if args:
+            args = (projection,) + args[1:]
+        else:
+            kwargs["projection"] = projection
+        return check_none(self._model_class)._get_collection().find(
+            spec, *args, **kwargs)
 
     def __iter__(self) -> "Cursor[T]":
         return self
 
     def __next__(self) -> T:
-        value = check_none(self._cursor).next()
-        return check_none(self._model)(**value)
+        if self._prefetch_fields:
+            return self._next_prefetched()
+        documents = self._documents
+        if documents is None:
+            documents = self._documents = self._load_documents()
+        return check_none(self._model).from_document(
+            next(documents), self._projection)
+
+    def _next_prefetched(self) -> T:
+        """ Hydrates a batch at a time so references resolve together. """
+        if not self._buffer:
+            if self._documents is None:
+                self._documents = self._load_documents()
+            documents = self._documents
+            model = check_none(self._model)
+            batch = []  # type: List[T]
+            while len(batch) < self._prefetch_batch_size:
+                try:
+                    batch.append(model.from_document(
+                        next(documents), self._projection))
+                except StopIteration:
+                    break
+            if not batch:
+                raise StopIteration
+            self._prefetch(batch)
+            self._buffer = deque(batch)
+        return self._buffer.popleft()
+
+    def _load_documents(self) -> Iterator[Document]:
+        """
+        Returns the pymongo cursor, or when the model has a QUERY_CACHE,
+        the cached documents (or the cursor's, cached once exhausted).
+        """
+        cursor = self._track(check_none(self._cursor))
+        cached = self._query_cache("find")
+        if cached is None:
+            return cursor
+        cache, namespace, key, generation = cached
+        codec_options = check_none(
+            self._model_class)._get_collection().codec_options
+        documents = cache.get(namespace, key)
+        if documents is None:
+            return _cache_documents(
+                cursor, codec_options, cache, namespace, key, generation)
+        return (
+            bson.decode(document, codec_options=codec_options)
+            for document in documents)
+
+    def _track(self, documents: Iterator[Document]) -> Iterator[Document]:
+        """ Attributes the queries of the iteration to the operation """
+        if self._operation is None:
+            return documents
+        return track_documents(documents, self._operation)
+
+    def _query_cache(
+            self,
+            operation: str,
+            *extra: Any) -> Optional[Tuple[QueryCache, str, Hashable, int]]:
+        """
+        Returns the model's QUERY_CACHE, the collection's full name, the
+        key for the operation on this cursor's query and the collection's
+        generation (see mogo.cache), or None when not caching.
+        """
+        model = check_none(self._model_class)
+        cache = model.QUERY_CACHE
+        if cache is None:
+            return None
+        namespace = model._get_collection().full_name
+        generation = get_generation(namespace)
+        kwargs = dict(self._kwargs)
+        kwargs.pop("projection", None)
+        query = {
+            "o": operation,
+            # the order of the top level keys doesn't change the results
+            "q": dict(sorted((self._query or {}).items())),
+            "p": self._projection,
+            "a": [_cache_value(arg) for arg in self._args[1:]],
+            "k": {key: _cache_value(value) for key, value in kwargs.items()},
+            "m": [
+                [method, [_cache_value(arg) for arg in args], {
+                    key: _cache_value(value)
+                    for key, value in method_kwargs.items()}]
+                for method, args, method_kwargs in self._modifiers],
+            "x": list(extra),
+        }  # type: Dict[str, Any]
+        try:
+            key = (namespace, bson.encode(query))
+        except (BSONError, TypeError):
+            # e.g. a query with values that can't be compared as BSON
+            return None
+        return cache, namespace, key, generation
+
+    def _cached(self, operation: str, load: Callable[[], V], *extra: Any) -> V:
+        """ Returns the cached result of the operation, or loads it. """
+        cached = self._query_cache(operation, *extra)
+        if cached is None:
+            return load()
+        cache, namespace, key, generation = cached
+        value = cache.get(namespace, key)
+        if value is None:
+            value = load()
+            cache.set(namespace, key, value, generation)
+        return cast(V, value)
+
+    def _prefetch(self, models: Sequence[T]) -> None:
+        for field in self._prefetch_fields:
+            field._prefetch(models)
 
     def next(self) -> T:
         # still need this, since pymongo's cursor still implements next()
         # and returns the raw dict.
         return self.__next__()
 
+    @instrumented("count")
     def count(self) -> int:
         collection = check_none(self._model_class)._get_collection()
-        return collection.count_documents(self._query or {})
+        return self._cached(
+            "count", lambda: collection.count_documents(self._query or {}))
 
     # convenient because if it quacks like a list...
     def __len__(self) -> int:
@@ -62,13 +386,18 @@ class Cursor(Generic[T]):
         value = check_none(self._cursor).__getitem__(index)
         if isinstance(value, self.__class__):
             return cast(T, value)
-        return check_none(self._model)(**value)
+        model = check_none(self._model).from_document(
+            value, self._projection)
+        self._prefetch([model])
+        return model
 
     def close(self) -> None:
         return check_none(self._cursor).close()
 
     def rewind(self) -> "Cursor[T]":
         check_none(self._cursor).rewind()
+        self._buffer = None
+        self._documents = None
         return self
 
     def first(self) -> Optional[T]:
@@ -77,20 +406,126 @@ class Cursor(Generic[T]):
         except StopIteration:
             return None
 
+    def prefetch(
+            self,
+            *fields: str,
+            batch_size: Optional[int] = None) -> "Cursor[T]":
+        """
+        Resolves the given ReferenceFields for each batch of results with
+        one query per field, instead of one query per attribute access.
+        """
+        model = check_none(self._model_class)
+        prefetch_fields = list(self._prefetch_fields)
+        for name in fields:
+            field = getattr(model, name, None)
+            if not isinstance(field, ReferenceField):
+                raise ValueError(
+                    "Cannot prefetch '{}', it is not a ReferenceField.".format(
+                        name))
+            prefetch_fields.append(field)
+        self._prefetch_fields = prefetch_fields
+        if batch_size is not None:
+            if batch_size < 1:
+                raise ValueError("batch_size must be a positive integer.")
+            self._prefetch_batch_size = batch_size
+        return self
+
+    def only(self, *fields: str) -> "Cursor[T]":
+        """
+        Only loads the given fields (and the id). Other fields are fetched
+        from the database on first access. Must be called before iterating.
+        """
+        return self._project(fields, 1)
+
+    def exclude(self, *fields: str) -> "Cursor[T]":
+        """
+        Leaves the given fields out of the results. They are fetched from
+        the database on first access. Must be called before iterating.
+        """
+        return self._project(fields, 0)
+
+    def _project(self, fields: Sequence[str], value: int) -> "Cursor[T]":
+        model = check_none(self._model_class)
+        projection = dict(self._projection or {})
+        for name in fields:
+            field = getattr(model, name, None)
+            key = name
+            if isinstance(field, Field):
+                key = field._get_field_name(model)
+            if key == model._id_field and not value:
+                raise ValueError("The id field cannot be excluded.")
+            projection[key] = value
+        values = set(
+            bool(included) for key, included in projection.items()
+            if key != model._id_field)
+        if len(values) > 1:
+            raise ValueError("Cannot combine only() and exclude().")
+        self._projection = model._keep_version(projection)
+        self._rebuild()
+        return self
+
+    def raw(self) -> Iterator[Document]:
+        """ Iterates over the documents without constructing models. """
+        return self._track(iter(check_none(self._cursor)))
+
+    def values(self, *fields: str) -> Iterator[Tuple[Any, ...]]:
+        """
+        Iterates over tuples of the given fields' stored values (or the
+        values at dotted paths), only loading those from the database.
+        """
+        keys = self._storage_keys(fields)
+        documents = self._track(check_none(self._cursor))
+        if any("." in key for key in keys):
+            return (
+                tuple([_get_path(document, key) for key in keys])
+                for document in documents)
+        return (
+            tuple([document.get(key) for key in keys])
+            for document in documents)
+
+    def records(self, *fields: str) -> Iterator[Record]:
+        """
+        Iterates over slotted records with the given fields' stored
+        values as attributes named by the fields' storage names.
+        """
+        keys = self._storage_keys(fields)
+        record_class = _record_class(keys)
+        return (
+            record_class(*[document.get(key) for key in keys])
+            for document in self._track(check_none(self._cursor)))
+
+    def _storage_keys(self, fields: Sequence[str]) -> Tuple[str, ...]:
+        """ Projects the cursor on the fields' storage names """
+        if not fields:
+            raise ValueError("At least one field is required.")
+        model = check_none(self._model_class)
+        keys = []  # type: List[str]
+        for name in fields:
+            field = getattr(model, name, None)
+            if isinstance(field, Field):
+                name = field._get_field_name(model)
+            keys.append(name)
+        projection = {key: 1 for key in keys}  # type: Dict[str, Any]
+        if model._id_field not in projection:
+            projection[model._id_field] = 0
+        self._projection = projection
+        self._rebuild()
+        return tuple(keys)
+
     def collation(self, collation: Collation) -> "Cursor[T]":
-        check_none(self._cursor).collation(collation)
+        self._modify("collation", collation)
         return self
 
     def skip(self, skip: int) -> "Cursor[T]":
-        check_none(self._cursor).skip(skip)
+        self._modify("skip", skip)
         return self
 
     def limit(self, limit: int) -> "Cursor[T]":
-        check_none(self._cursor).limit(limit)
+        self._modify("limit", limit)
         return self
 
     def sort(self, *args: Any, **kwargs: Any) -> "Cursor[T]":
-        check_none(self._cursor).sort(*args, **kwargs)
+        self._modify("sort", *args, **kwargs)
         return self
 
     def order(
@@ -105,9 +540,76 @@ class Cursor(Generic[T]):
             self._order_entries.append((key, value))
             # According to the docs, only the LAST .sort() matters to
             # pymongo, so this SHOULD be safe
-            check_none(self._cursor).sort(self._order_entries)
+            self._modify("sort", list(self._order_entries))
         return self
 
+    @instrumented("paginate")
+    def paginate(
+            self,
+            order_by: Optional[str] = None,
+            after: Optional[str] = None,
+            page_size: int = 20,
+            direction: int = ASC) -> Tuple[List[T], Optional[str]]:
+        """
+        Returns a page of results ordered by the field (and the id), and
+        the token for the next page (None for the last page). Pages start
+        right after the token's position instead of skipping results, so
+        deep pages cost the same as the first one. Any sort, skip or limit
+        on the cursor is ignored.
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be a positive integer.")
+        if direction not in (ASC, DESC):
+            raise TypeError("Order value must be mogo.ASC or mogo.DESC.")
+        model = check_none(self._model_class)
+        id_field = model._id_field
+        key = id_field
+        if order_by is not None:
+            field = getattr(model, order_by, None)
+            key = order_by
+            if isinstance(field, Field):
+                key = field._get_field_name(model)
+        sort = [(id_field, direction)]
+        if key != id_field:
+            sort.insert(0, (key, direction))
+
+        query = self._query or {}
+        if after is not None:
+            value, object_id = _decode_page_token(after, key, direction)
+            operator = "$gt" if direction == ASC else "$lt"
+            predicate = {
+                id_field: {operator: object_id}}  # type: Dict[str, Any]
+            if key != id_field:
+                predicate = _get_page_predicate(
+                    key, value, id_field, object_id, direction)
+            query = {"$and": [query, predicate]} if query else predicate
+
+        projection = self._projection
+        if projection is not None and key not in projection and \
+                is_inclusion_projection(projection, id_field):
+            # the sort key is needed for the token
+            projection = dict(projection, **{key: 1})
+        cursor = self._find(query, projection)
+        for method, method_args, method_kwargs in self._modifiers:
+            if method not in ("sort", "skip", "limit"):
+                getattr(cursor, method)(*method_args, **method_kwargs)
+        documents = list(cursor.sort(sort).limit(page_size + 1))
+
+        token = None
+        if len(documents) > page_size:
+            documents = documents[:page_size]
+            last = documents[-1]
+            value = _get_path(last, key)
+            # refuse (array) values that the next page can't start after
+            _get_type_position(value)
+            token = _encode_page_token(
+                key, direction, value, last[id_field])
+        models = [
+            model.from_document(document, projection)
+            for document in documents]
+        self._prefetch(models)
+        return models, token
+
     def update(self, modifier: Dict[str, Any]) -> "Cursor[T]":
         if self._query is None:
             raise ValueError(
@@ -122,12 +624,24 @@ class Cursor(Generic[T]):
         modifier = {"$set": kwargs}
         return self.update(modifier)
 
+    @instrumented("distinct")
     def distinct(self, key: str) -> list[Any]:
-        return check_none(self._cursor).distinct(key)
+        cursor = check_none(self._cursor)
+        model = check_none(self._model_class)
+        if model.QUERY_CACHE is None:
+            return cursor.distinct(key)
+        # cached encoded, so that the results can't be modified
+        codec_options = model._get_collection().codec_options.with_options(
+            document_class=dict)
+        encoded = self._cached("distinct", lambda: bson.encode(
+            {"v": cursor.distinct(key)}, codec_options=codec_options), key)
+        values = bson.decode(
+            encoded, codec_options=codec_options)["v"]  # type: list[Any]
+        return values
 
 
 if TYPE_CHECKING:
     from mogo.model import Model  # noqa: F401
 
 
-__all__ = ["Cursor", "ASC", "DESC"]
+__all__ = ["Cursor", "Record", "ASC", "DESC"]
@@ -5,6 +5,8 @@ from bson.dbref import DBRef
 from typing import Any, Callable, cast, Generic, Optional
 from typing import Sequence, Type, TypeVar, TYPE_CHECKING, Union
 
+from typing import Dict, List, Tuple  # noqa: F401
+
 
 S = TypeVar("S")  # serialized type
 T = TypeVar("T")  # interface type
@@ -13,6 +15,7 @@ _DefaultCallback = Callable[[], T]
 _SetCallback = Callable[["Model", Optional[T]], Any]
 _GetCallback = Callable[["Model", Any], Optional[T]]
 _CoerceCallback = Callable[[Any], Optional[T]]
+_Setter = Callable[["Model", Any], None]
 
 
 class EmptyRequiredField(Exception):
@@ -45,11 +48,14 @@ class Field(Generic[T]):
     value_type = None  # type: Optional[Type[T]]
     id = 0  # type: int
     _field_name = None  # type: Optional[str]
+    # the attribute name the field is bound to ("" when bound to several)
+    _bound_name = None  # type: Optional[str]
     __set_callback = None  # type: Optional[_SetCallback[T]]
     __get_callback = None  # type: Optional[_GetCallback[T]]
     __coerce_callback = None  # type: Optional[_CoerceCallback[T]]
     __default = None  # type: Optional[_DefaultOptions[T]]
     __required = False  # type: bool
+    __setter = None  # type: Optional[_Setter]
 
     def __init__(
             self,
@@ -70,6 +76,15 @@ class Field(Generic[T]):
         self.__default = default
         self.id = id(self)
 
+    def __set_name__(self, owner: Type["Model"], name: str) -> None:
+        """ Records the attribute name, which is the default storage key """
+        if self._bound_name is None:
+            self._bound_name = name
+        elif self._bound_name != name:
+            # shared between attributes, so resolve it through the model
+            self._bound_name = ""
+        self.__setter = None
+
     def __get__(
             self,
             instance: "Model",
@@ -81,6 +96,9 @@ class Field(Generic[T]):
         value = self._get_value(instance)
         return value
 
+    def _has_default(self) -> bool:
+        return self.__default is not NO_DEFAULT
+
     def _get_default(self) -> T:
         if self.__default == NO_DEFAULT:
             raise NoDefaultValue("No default value for field")
@@ -89,17 +107,23 @@ class Field(Generic[T]):
         else:
             return self.__default()
 
-    def _get_field_name(self, model_instance: "Model") -> str:
+    def _get_field_name(
+            self,
+            model_instance: Union["Model", Type["Model"]]) -> str:
         """ Try to retrieve field name from instance """
         if self._field_name:
             return self._field_name
+        if self._bound_name:
+            return self._bound_name
         return model_instance._get_fields()[self.id]
 
     def _get_value(self, instance: "Model") -> Optional[T]:
         """ Retrieve the value from the instance """
         field_name = self._get_field_name(instance)
+        if instance._projection is not None:
+            instance._load_missing(field_name)
         if field_name not in instance:
-            if self._is_required():
+            if self._is_required() and not self._has_default():
                 raise EmptyRequiredField(
                     "'{}' is required but is empty.".format(field_name))
             self._set_default(instance, field_name)
@@ -107,13 +131,15 @@ class Field(Generic[T]):
         return value
 
     def _set_default(self, model: "Model", field: str) -> None:
-        if field in model:
-            # value already set, not overwriting it.
+        if field in model or model._is_missing(field):
+            # value already set (or stored, but not loaded), not
+            # overwriting it.
             return
         try:
-            setattr(model, field, self._get_default())
+            default = self._get_default()
         except NoDefaultValue:
-            pass
+            return
+        self.__set__(model, default)
 
     def _is_required(self) -> bool:
         return self.__required
@@ -129,15 +155,57 @@ class Field(Generic[T]):
                         value_type, self.value_type, field_name))
 
     def __set__(self, instance: "Model", value: Any) -> None:
-        field_name = self._get_field_name(instance)
-        try:
-            self._check_value_type(value, field_name)
-        except TypeError:
-            value = self.coerce_callback(value)
-            self._check_value_type(value, field_name)
-
-        value = self.set_callback(instance, value)
-        instance[field_name] = value
+        setter = self.__setter
+        if setter is None:
+            setter = self._compile_setter(self._get_field_name(instance))
+            if self._field_name or self._bound_name:
+                # the storage key doesn't depend on the model
+                self.__setter = setter
+        setter(instance, value)
+
+    def _compile_setter(self, field_name: str) -> _Setter:
+        """
+        Builds the function that checks, coerces and stores values for the
+        field, with the value type and callbacks resolved once.
+        """
+        value_type = self.value_type
+        coerce_callback, set_callback = self._get_setter_callbacks()
+        check_value_type = self._check_value_type
+
+        def setter(instance: "Model", value: Any) -> None:
+            if value is not None and value_type is not None and \
+                    not isinstance(value, value_type):
+                value = coerce_callback(value)
+                check_value_type(value, field_name)
+            if set_callback is not None:
+                value = set_callback(instance, value)
+            instance[field_name] = value
+
+        return setter
+
+    def _get_setter_callbacks(
+            self) -> Tuple[_CoerceCallback[T], Optional[_SetCallback[T]]]:
+        """
+        Returns the coerce callback and the set callback (None when values
+        are stored as they are) used by the compiled setter. Subclasses
+        overriding coerce_callback() or set_callback() get them called.
+        """
+        field_class = type(self)
+        if field_class.coerce_callback is not Field.coerce_callback:
+            coerce_callback = self.coerce_callback  # type: _CoerceCallback[T]
+        else:
+            coerce_callback = self.__coerce_callback or self._coerce_callback
+        if field_class.set_callback is not Field.set_callback:
+            return coerce_callback, self.set_callback
+        set_callback = self.__set_callback
+        if set_callback is None and \
+                field_class._set_callback is not Field._set_callback:
+            set_callback = self._set_callback
+        return coerce_callback, set_callback
+
+    def _reset_setter(self) -> None:
+        """ Forgets the compiled setter, so the next set compiles it again """
+        self.__setter = None
 
     # The Field.X_callback methods are always called, and they are simply
     # responsible for delegating whether to call the default (sub)class'
@@ -203,9 +271,53 @@ class ReferenceField(Field["Model"]):
         """ Retrieves the id, then retrieves the model from the db """
         if value is not None:
             # Should be a DBRef
+            prefetched = instance._prefetched
+            if prefetched is not None:
+                entry = prefetched.get(self._get_field_name(instance))
+                if entry is not None and entry[0] == value.id:
+                    return entry[1]
+            instance._check_not_blocking(
+                "Cannot load the '{}' reference in a running event loop, "
+                "use AsyncCursor.prefetch() instead.".format(
+                    self._get_field_name(instance)))
             return self.model.find_one({"_id": value.id})
         return None
 
+    def _prefetch(self, instances: Sequence["Model"]) -> None:
+        """
+        Resolves the references of all the instances with a single query
+        and stores the results on the instances for later access.
+        """
+        references = self._collect_references(instances)
+        if not references:
+            return
+        ids = list({reference.id for _, _, reference in references})
+        found = self.model._find_by_ids(
+            ids)  # type: Dict[Any, Model]
+        self._store_references(references, found)
+
+    def _collect_references(
+            self,
+            instances: Sequence["Model"]) -> List[Tuple["Model", str, DBRef]]:
+        references = []  # type: List[Tuple[Model, str, DBRef]]
+        for instance in instances:
+            field_name = self._get_field_name(instance)
+            value = instance.get(field_name)
+            if isinstance(value, DBRef):
+                references.append((instance, field_name, value))
+        return references
+
+    def _store_references(
+            self,
+            references: Sequence[Tuple["Model", str, DBRef]],
+            found: Dict[Any, "Model"]) -> None:
+        """ Stores the models found by id as the instances' references """
+        for instance, field_name, reference in references:
+            if instance._prefetched is None:
+                instance._prefetched = {}
+            instance._prefetched[field_name] = (
+                reference.id, found.get(reference.id))
+
 
 class ConstantField(Field[Any]):
     """ Doesn't let you change the value after setting it. """
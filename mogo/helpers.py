@@ -1,12 +1,118 @@
+import asyncio
 from collections.abc import Mapping
-from typing import Any, Optional, TypeVar
+import datetime
+import re
+from typing import Any, cast, Dict, Optional, TypeVar
+import uuid
+
+from bson.dbref import DBRef
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from bson.regex import Regex
+from bson.timestamp import Timestamp
 
 
 T = TypeVar("T")
 Document = Mapping[str, Any]
 
 
+class BlockingLoadError(Exception):
+    """ Raised instead of loading data with the synchronous connection
+    while an asyncio event loop is running (see mogo.aio).
+    """
+    pass
+
+
 def check_none(value: Optional[T]) -> T:
     if value is None:
         raise ValueError("Value is unexpectedly None.")
     return value
+
+
+def normalize_projection(projection: Any) -> Optional[Dict[str, Any]]:
+    """ Converts a pymongo projection (dict or list of keys) to a dict. """
+    if projection is None:
+        return None
+    if isinstance(projection, Mapping):
+        return cast(Dict[str, Any], projection)
+    return {key: 1 for key in projection}
+
+
+def is_inclusion_projection(
+        projection: Dict[str, Any], id_field: str = "_id") -> bool:
+    """ Whether the projection lists the keys to return, or to leave out. """
+    for key, value in projection.items():
+        if key != id_field and (isinstance(value, Mapping) or value):
+            return True
+    return False
+
+
+def get_bson_type(value: Any) -> Optional[str]:
+    """ The $type alias of the BSON type a value is stored as, if known. """
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, Int64):
+        return "long"
+    if isinstance(value, int):
+        return "int" if -2 ** 31 <= value < 2 ** 31 else "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (Mapping, DBRef)):
+        return "object"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, (bytes, uuid.UUID)):
+        return "binData"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime.datetime):
+        return "date"
+    if isinstance(value, Timestamp):
+        return "timestamp"
+    if isinstance(value, (Regex, re.Pattern)):
+        return "regex"
+    if isinstance(value, MinKey):
+        return "minKey"
+    if isinstance(value, MaxKey):
+        return "maxKey"
+    return None
+
+
+def decode_raw(value: Any) -> Any:
+    """
+    Fully decodes the RawBSONDocuments in a value (with their own codec
+    options) to dicts and lists, restoring DBRefs like a dict document
+    class does.
+    """
+    if isinstance(value, RawBSONDocument):
+        document = {key: decode_raw(item) for key, item in value.items()}
+        if isinstance(document.get("$ref"), str):
+            return DBRef(
+                document.pop("$ref"), document.pop("$id", None),
+                document.pop("$db", None), **document)
+        return document
+    if isinstance(value, list):
+        return [decode_raw(item) for item in value]
+    return value
+
+
+def check_not_blocking(message: str) -> None:
+    """
+    Raises BlockingLoadError when an asyncio event loop is running in the
+    current thread, so implicit loads don't block it.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    raise BlockingLoadError(message)
@@ -0,0 +1,74 @@
+"""
+An opt-in identity map, so that every document is represented by (at most)
+one model instance within a block of code:
+
+with mogo.identity_map():
+    first = Hero.grab(hero_id)
+    second = Hero.grab(hero_id)  # no query, and `first is second`
+
+Sessions can enable one for the duration of their `with` block with
+`mogo.session(..., identity_map=True)`.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from typing import Any, Dict, Iterator, Optional, Tuple, TYPE_CHECKING
+
+
+_IdentityKey = Tuple[str, Any]
+
+
+class IdentityMap(object):
+    """ Maps (collection full name, id) pairs to loaded model instances. """
+
+    def __init__(self) -> None:
+        self._models: Dict[_IdentityKey, Model] = {}
+
+    def get(self, collection: str, object_id: Any) -> Optional["Model"]:
+        return self._models.get((collection, object_id))
+
+    def add(self, collection: str, object_id: Any, model: "Model") -> None:
+        self._models[(collection, object_id)] = model
+
+    def discard(self, collection: str, object_id: Any) -> None:
+        self._models.pop((collection, object_id), None)
+
+    def clear_collection(self, collection: str) -> None:
+        """ Forgets every instance loaded from the collection. """
+        for key in [key for key in self._models if key[0] == collection]:
+            del self._models[key]
+
+    def clear(self) -> None:
+        self._models.clear()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+
+_current_identity_map = ContextVar(
+    "mogo_identity_map",
+    default=None)  # type: ContextVar[Optional[IdentityMap]]
+
+
+def get_identity_map() -> Optional[IdentityMap]:
+    """ Returns the active identity map, if any. """
+    return _current_identity_map.get()
+
+
+@contextmanager
+def identity_map() -> Iterator[IdentityMap]:
+    """ Activates a new identity map for the duration of the block. """
+    identities = IdentityMap()
+    token = _current_identity_map.set(identities)
+    try:
+        yield identities
+    finally:
+        _current_identity_map.reset(token)
+
+
+if TYPE_CHECKING:
+    from mogo.model import Model
+
+
+__all__ = ["identity_map", "IdentityMap"]
@@ -0,0 +1,337 @@
+"""
+Per-model query statistics and a slow query log, built on pymongo's
+command monitoring:
+
+instrumentation = mogo.instrumentation.enable(slow_query_ms=100)
+mogo.connect("my_database")  # clients created after enable() are watched
+...
+instrumentation.stats()
+# {("Hero", "find"): {"count": 3, "total_ms": 2.1, "documents": 40, ...}}
+
+Each database command is attributed to the outermost mogo method that
+sent it (e.g. Hero.grab() rather than the find_one() it calls), and a
+cursor's getMore commands to the method that created the cursor. The
+slow query log (the "mogo" logger) includes the query shape, which is
+the query with every value replaced by "?".
+
+Instead of enable(), an Instrumentation can also be passed to a single
+client, e.g. mogo.connect("my_database", event_listeners=[instrumentation]).
+"""
+
+from contextvars import ContextVar
+import functools
+import logging
+import threading
+
+import bson
+from pymongo import monitoring
+
+from typing import Any, Callable, cast, Dict, Iterator, Mapping, NamedTuple
+from typing import Optional, Tuple, TypeVar
+from typing import List  # noqa: F401
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# (model name, method name) of the outermost instrumented call
+_OperationKey = Tuple[Optional[str], str]
+
+_current_operation: ContextVar[Optional[_OperationKey]] = ContextVar(
+    "mogo_operation", default=None)
+
+# whether any Instrumentation exists, so mogo methods have to record
+# themselves as the current operation
+_enabled = False
+
+logger = logging.getLogger("mogo")
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def get_current_operation() -> Optional[_OperationKey]:
+    return _current_operation.get()
+
+
+def _get_model_name(target: Any) -> str:
+    """ The model name of a model class, instance or cursor """
+    model = getattr(target, "_model_class", None)
+    if model is None:
+        model = target if isinstance(target, type) else type(target)
+    return str(model.__name__)
+
+
+def instrumented(name: str) -> Callable[[F], F]:
+    """
+    Records the decorated model (or cursor) method as the current
+    operation, unless it was called by another instrumented method.
+    """
+    def decorator(method: F) -> F:
+        @functools.wraps(method)
+        def wrapper(target: Any, *args: Any, **kwargs: Any) -> Any:
+            if not _enabled or _current_operation.get() is not None:
+                return method(target, *args, **kwargs)
+            token = _current_operation.set((_get_model_name(target), name))
+            try:
+                return method(target, *args, **kwargs)
+            finally:
+                _current_operation.reset(token)
+        return cast(F, wrapper)
+    return decorator
+
+
+def track_documents(
+        documents: Iterator[Any],
+        operation: Optional[_OperationKey]) -> Iterator[Any]:
+    """ Records the operation while the iterator loads documents. """
+    while True:
+        token = _current_operation.set(operation)
+        try:
+            document = next(documents)
+        except StopIteration:
+            return
+        finally:
+            _current_operation.reset(token)
+        yield document
+
+
+def query_shape(query: Any) -> Any:
+    """ Replaces every value in a query (or pipeline) with "?" """
+    if isinstance(query, dict):
+        return {key: query_shape(value) for key, value in query.items()}
+    if isinstance(query, (list, tuple)):
+        if query and all(isinstance(value, dict) for value in query):
+            # $and / $or clauses and pipelines keep their structure
+            return [query_shape(value) for value in query]
+        return ["?"] if query else []
+    return "?"
+
+
+# the command argument holding the query, by command name
+_QUERY_ARGUMENTS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+# the command argument holding the list of statements with a "q" query
+_STATEMENT_ARGUMENTS = {
+    "update": "updates",
+    "delete": "deletes",
+}
+
+
+def command_shape(name: str, command: Mapping[str, Any]) -> Any:
+    """ Returns the shape of the command's query, if it has one """
+    if name in _QUERY_ARGUMENTS:
+        return query_shape(command.get(_QUERY_ARGUMENTS[name], {}))
+    if name in _STATEMENT_ARGUMENTS:
+        statements = command.get(_STATEMENT_ARGUMENTS[name]) or []
+        return [query_shape(
+            statement.get("q", {})) for statement in statements]
+    return None
+
+
+def _count_documents(reply: Mapping[str, Any]) -> int:
+    """ The number of documents returned by a command """
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch") or cursor.get("nextBatch") or []
+        return len(batch)
+    if isinstance(reply.get("values"), list):
+        return len(reply["values"])
+    if reply.get("value") is not None:
+        return 1
+    return 0
+
+
+class OperationRecord(NamedTuple):
+    """ One database command, passed to Instrumentation listeners. """
+    model: Optional[str]
+    method: str
+    command: str
+    duration_ms: float
+    documents: int
+    bytes_sent: int
+    bytes_received: int
+    shape: Any
+    failed: bool
+
+
+class OperationStats(object):
+    """ The totals for one (model, method) pair. """
+
+    __slots__ = (
+        "count", "failures", "total_ms", "max_ms", "documents",
+        "bytes_sent", "bytes_received")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.documents = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def add(self, record: OperationRecord) -> None:
+        self.count += 1
+        self.failures += int(record.failed)
+        self.total_ms += record.duration_ms
+        self.max_ms = max(self.max_ms, record.duration_ms)
+        self.documents += record.documents
+        self.bytes_sent += record.bytes_sent
+        self.bytes_received += record.bytes_received
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# the operation, query shape, bytes sent and getMore cursor id of a
+# started command
+_Started = Tuple[_OperationKey, Any, int, Optional[int]]
+
+
+class Instrumentation(monitoring.CommandListener):
+    """
+    Collects the statistics of the commands sent by the clients it is
+    registered with, and logs the commands slower than `slow_query_ms`.
+    Set `measure_bytes=True` to also record the size of the commands and
+    replies (the driver doesn't report it, so each one is encoded again).
+    Listeners are called with an OperationRecord for every command.
+    """
+
+    def __init__(
+            self,
+            slow_query_ms: Optional[float] = None,
+            measure_bytes: bool = False) -> None:
+        global _enabled
+        _enabled = True
+        self.slow_query_ms = slow_query_ms
+        self.measure_bytes = measure_bytes
+        self.listeners = []  # type: List[Callable[[OperationRecord], Any]]
+        self._stats = {}  # type: Dict[_OperationKey, OperationStats]
+        # the started commands, by connection and request id
+        self._started = {}  # type: Dict[Tuple[Any, int], _Started]
+        # the operations that created the open cursors, by cursor id
+        self._cursors = {}  # type: Dict[int, _OperationKey]
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[OperationRecord], Any]) -> None:
+        self.listeners.append(listener)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        command = event.command
+        name = event.command_name
+        cursor_id = None  # type: Optional[int]
+        operation = _current_operation.get()
+        with self._lock:
+            if name == "getMore":
+                cursor_id = command.get("getMore")
+                operation = self._cursors.get(
+                    cast(int, cursor_id), operation)
+            elif name == "killCursors":
+                for killed in command.get("cursors", []):
+                    self._cursors.pop(killed, None)
+        if operation is None:
+            operation = (None, name)
+        bytes_sent = 0
+        if self.measure_bytes:
+            bytes_sent = len(bson.encode(command))
+        started = (operation, command_shape(name, command), bytes_sent,
+                   cursor_id)  # type: _Started
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = started
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        reply = event.reply
+        bytes_received = 0
+        if self.measure_bytes:
+            bytes_received = len(bson.encode(reply))
+        started = self._finish(
+            event, _count_documents(reply), bytes_received, False)
+        cursor = reply.get("cursor")
+        if started is None or not isinstance(cursor, dict):
+            return
+        operation, _, _, requested_id = started
+        with self._lock:
+            if cursor.get("id"):
+                self._cursors[cursor["id"]] = operation
+            elif requested_id is not None:
+                # the cursor is exhausted
+                self._cursors.pop(requested_id, None)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, 0, 0, True)
+
+    def _finish(
+            self,
+            event: Any,
+            documents: int,
+            bytes_received: int,
+            failed: bool) -> Optional[_Started]:
+        """ Records a finished command, returning how it was started. """
+        with self._lock:
+            started = self._started.pop(
+                (event.connection_id, event.request_id), None)
+        if started is None:
+            return None
+        operation, shape, bytes_sent, _ = started
+        record = OperationRecord(
+            model=operation[0],
+            method=operation[1],
+            command=event.command_name,
+            duration_ms=event.duration_micros / 1000.0,
+            documents=documents,
+            bytes_sent=bytes_sent,
+            bytes_received=bytes_received,
+            shape=shape,
+            failed=failed)
+        with self._lock:
+            stats = self._stats.get(operation)
+            if stats is None:
+                stats = self._stats[operation] = OperationStats()
+            stats.add(record)
+        if self.slow_query_ms is not None and \
+                record.duration_ms >= self.slow_query_ms:
+            logger.warning(
+                "Slow query (%.1f ms): %s.%s sent %s %r",
+                record.duration_ms, record.model or "-", record.method,
+                record.command, record.shape)
+        for listener in self.listeners:
+            listener(record)
+        return started
+
+    def stats(self) -> Dict[_OperationKey, Dict[str, Any]]:
+        """ A snapshot of the totals by (model name, method name) """
+        with self._lock:
+            return {
+                operation: stats.as_dict()
+                for operation, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+def enable(
+        slow_query_ms: Optional[float] = None,
+        measure_bytes: bool = False) -> Instrumentation:
+    """
+    Creates an Instrumentation and registers it for every pymongo client
+    created afterwards (so call it before mogo.connect()).
+    """
+    instrumentation = Instrumentation(slow_query_ms, measure_bytes)
+    monitoring.register(instrumentation)
+    return instrumentation
+
+
+__all__ = [
+    "enable",
+    "Instrumentation",
+    "OperationRecord",
+    "query_shape",
+]
@@ -0,0 +1,1125 @@
+"""
+An in-memory replacement for pymongo's MongoClient, so that tests and
+benchmarks can run without a MongoDB server:
+
+from mogo.memory import MemoryClient
+
+mogo.connect("my_database", client=MemoryClient())
+# or
+with mogo.session("my_database", client=MemoryClient()):
+    ...
+
+It implements the part of pymongo's collection API that mogo uses:
+find() (with sort, skip, limit and projections), find_one(),
+insert_one/many(), replace_one(), update_one/many(), delete_one/many(),
+bulk_write(), the find_one_and_*() methods, count_documents(),
+distinct() and simple aggregation pipelines ($match, $group, $sort,
+$skip, $limit, $project, $sample and $count).
+
+Queries support dotted paths, arrays and the common operators ($eq,
+$ne, $gt, $gte, $lt, $lte, $in, $nin, $exists, $regex, $all, $size,
+$elemMatch, $mod, $not, $and, $or and $nor), and updates the common
+update operators ($set, $unset, $setOnInsert, $inc, $mul, $min, $max,
+$push, $addToSet, $pull, $pullAll, $pop, $rename and $currentDate).
+Anything else raises a NotImplementedError. Collations only change how
+strings are sorted.
+
+Documents are stored encoded as BSON, so values come back as they would
+from a server (e.g. tuples as lists) and never share state with the
+caller. Single field indexes (create_index("email")) are used for
+equality and $in queries, and unique indexes raise DuplicateKeyError.
+
+Closing a MemoryClient keeps its data, so sessions using the same
+client see each other's writes.
+"""
+
+import datetime
+import random
+import threading
+
+from mogo.update import apply_update, Document, SortSpec
+from mogo.update import _equal, _expand, _is_operator_document, _is_regex
+from mogo.update import _lookup, _matches, _MISSING, _normalize, _NUMBER
+from mogo.update import _set_path, _sort, _sort_value, _type_order
+from mogo.update import _write_error
+
+import bson
+from bson.codec_options import CodecOptions, DEFAULT_CODEC_OPTIONS
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.common import validate_ok_for_replace, validate_ok_for_update
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.errors import InvalidOperation, WriteError
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne
+from pymongo.operations import ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult
+from pymongo.results import InsertManyResult, InsertOneResult, UpdateResult
+
+from typing import Any, Callable, cast, Dict, Hashable, Iterable, List
+from typing import Mapping, NamedTuple, Optional, Sequence, Set, Union
+from typing import Tuple  # noqa: F401
+
+
+def _hashable(value: Any) -> Hashable:
+    """ A key for a value in the ids and indexes """
+    if isinstance(value, bool):
+        # True == 1 for Python, not for MongoDB
+        return ("bool", value)
+    if isinstance(value, (dict, list)):
+        return bson.encode({"v": value})
+    try:
+        hash(value)
+    except TypeError:
+        return bson.encode({"v": value})
+    return cast(Hashable, value)
+
+
+def _sort_spec(key: Any, direction: Optional[int] = None) -> SortSpec:
+    """ Normalizes the arguments of sort() to (key, direction) pairs """
+    if isinstance(key, str):
+        return [(key, 1 if direction is None else direction)]
+    if isinstance(key, Mapping):
+        return list(key.items())
+    return [
+        (item, 1) if isinstance(item, str) else (item[0], item[1])
+        for item in key]
+
+
+def _include(source: Any, parts: List[str], target: Document) -> None:
+    head = parts[0]
+    if not isinstance(source, dict) or head not in source:
+        return
+    if len(parts) == 1:
+        target[head] = source[head]
+        return
+    value = source[head]
+    if isinstance(value, dict):
+        _include(value, parts[1:], target.setdefault(head, {}))
+    elif isinstance(value, list):
+        projected = target.setdefault(head, [{} for _ in value])
+        for item, item_target in zip(value, projected):
+            _include(item, parts[1:], item_target)
+
+
+def _exclude(source: Any, parts: List[str]) -> None:
+    if isinstance(source, list):
+        for item in source:
+            _exclude(item, parts)
+    elif isinstance(source, dict) and parts[0] in source:
+        if len(parts) == 1:
+            del source[parts[0]]
+        else:
+            _exclude(source[parts[0]], parts[1:])
+
+
+def _collation(collation: Any) -> Optional[Document]:
+    """ The document of a pymongo Collation """
+    if collation is None:
+        return None
+    return dict(getattr(collation, "document", collation))
+
+
+def _projection(projection: Any) -> Optional[Document]:
+    """ Normalizes a list of fields to a projection document """
+    if projection is None:
+        return None
+    if isinstance(projection, Mapping):
+        return dict(projection)
+    return {key: 1 for key in projection}
+
+
+def _project(document: Document, projection: Optional[Document]) -> Document:
+    """ Applies an inclusion or exclusion projection (to a copy) """
+    if projection is None:
+        return document
+    for value in projection.values():
+        if isinstance(value, dict):
+            raise NotImplementedError(
+                "The in-memory collection doesn't support projection "
+                "operators.")
+    include_id = projection.get("_id", True)
+    fields = {
+        key: value for key, value in projection.items() if key != "_id"}
+    if any(fields.values()) or (not fields and include_id):
+        result = {}  # type: Document
+        if include_id and "_id" in document:
+            result["_id"] = document["_id"]
+        for key in fields:
+            _include(document, key.split("."), result)
+        return result
+    result = bson.decode(bson.encode(document))
+    for key in fields:
+        _exclude(result, key.split("."))
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+# Aggregation
+
+
+def _evaluate(document: Document, expression: Any) -> Any:
+    """ Evaluates "$field" paths, documents of them and constants """
+    if isinstance(expression, str) and expression.startswith("$"):
+        values = _lookup(document, expression[1:])
+        return values[0] if values else None
+    if isinstance(expression, dict):
+        if _is_operator_document(expression):
+            raise NotImplementedError(
+                "The in-memory collection doesn't support {}.".format(
+                    ", ".join(expression)))
+        return {
+            key: _evaluate(document, value)
+            for key, value in expression.items()}
+    return expression
+
+
+def _accumulate(operator: str, values: List[Any]) -> Any:
+    if operator == "$sum":
+        return sum(
+            value for value in values if _type_order(value) == _NUMBER)
+    if operator == "$avg":
+        numbers = [
+            value for value in values if _type_order(value) == _NUMBER]
+        return sum(numbers) / len(numbers) if numbers else None
+    if operator in ("$min", "$max"):
+        present = [value for value in values if value is not None]
+        if not present:
+            return None
+        choose = min if operator == "$min" else max
+        return choose(present, key=_sort_value)
+    if operator == "$first":
+        return values[0] if values else None
+    if operator == "$last":
+        return values[-1] if values else None
+    if operator == "$push":
+        return values
+    if operator == "$addToSet":
+        unique = []  # type: List[Any]
+        for value in values:
+            if not any(_equal(value, item) for item in unique):
+                unique.append(value)
+        return unique
+    raise NotImplementedError(
+        "The in-memory collection doesn't support {}.".format(operator))
+
+
+def _group(documents: List[Document], spec: Document) -> List[Document]:
+    """ The $group stage, with the common accumulators """
+    groups = {}  # type: Dict[Hashable, Tuple[Any, List[Document]]]
+    for document in documents:
+        group_id = _evaluate(document, spec["_id"])
+        key = _hashable(group_id)
+        if key not in groups:
+            groups[key] = (group_id, [])
+        groups[key][1].append(document)
+    results = []
+    for group_id, members in groups.values():
+        result = {"_id": group_id}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (operator, expression), = accumulator.items()
+            result[field] = _accumulate(operator, [
+                _evaluate(member, expression) for member in members])
+        results.append(result)
+    return results
+
+
+def _upsert_seed(query: Mapping[str, Any]) -> Document:
+    """ The equality conditions of a query, which an upsert inserts """
+    document = {}  # type: Document
+    for key, condition in query.items():
+        if key == "$and":
+            for clause in condition:
+                for path, value in _upsert_seed(clause).items():
+                    document[path] = value
+        elif key.startswith("$"):
+            continue
+        elif _is_operator_document(condition):
+            if "$eq" in condition:
+                _set_path(document, key, condition["$eq"])
+        elif not _is_regex(condition):
+            _set_path(document, key, condition)
+    return document
+
+
+# Storage
+
+
+class _Entry(NamedTuple):
+    """ A stored document, as BSON and decoded (for queries) """
+    order: int
+    raw: bytes
+    document: Document
+
+
+class _Index(object):
+    """ Maps the values of an index's fields to the ids of the documents """
+
+    def __init__(
+            self,
+            name: str,
+            keys: SortSpec,
+            unique: bool = False,
+            sparse: bool = False) -> None:
+        self.name = name
+        self.keys = keys
+        self.unique = unique
+        self.sparse = sparse
+        self.fields = [key for key, _ in keys]
+        self.entries = {}  # type: Dict[Hashable, Set[Hashable]]
+
+    def _keys(self, document: Document) -> Set[Hashable]:
+        if len(self.fields) == 1:
+            values = _lookup(document, self.fields[0])
+            if not values:
+                return set() if self.sparse else {_hashable(None)}
+            return {_hashable(value) for value in _expand(values)}
+        values = [_lookup(document, field) for field in self.fields]
+        if self.sparse and not any(values):
+            return set()
+        return {tuple(
+            _hashable(value[0] if value else None) for value in values)}
+
+    def check(self, document: Document, id_key: Hashable) -> None:
+        """ Raises a DuplicateKeyError if the document breaks uniqueness """
+        if not self.unique:
+            return
+        for key in self._keys(document):
+            if self.entries.get(key, set()) - {id_key}:
+                message = "E11000 duplicate key error index: {}".format(
+                    self.name)
+                raise DuplicateKeyError(
+                    message, 11000, {"errmsg": message, "code": 11000})
+
+    def add(self, document: Document, id_key: Hashable) -> None:
+        for key in self._keys(document):
+            self.entries.setdefault(key, set()).add(id_key)
+
+    def remove(self, document: Document, id_key: Hashable) -> None:
+        for key in self._keys(document):
+            ids = self.entries.get(key)
+            if ids is not None:
+                ids.discard(id_key)
+                if not ids:
+                    del self.entries[key]
+
+    def lookup(self, value: Any) -> Set[Hashable]:
+        return self.entries.get(_hashable(value), set())
+
+    def information(self) -> Document:
+        information = {"key": list(self.keys), "v": 2}  # type: Document
+        if self.unique:
+            information["unique"] = True
+        if self.sparse:
+            information["sparse"] = True
+        return information
+
+
+def _index_values(condition: Any) -> Optional[List[Any]]:
+    """ The values an equality or $in condition can be looked up by """
+    if isinstance(condition, dict):
+        if list(condition) == ["$eq"]:
+            values = [condition["$eq"]]
+        elif list(condition) == ["$in"]:
+            values = list(condition["$in"])
+        else:
+            return None
+    else:
+        values = [condition]
+    for value in values:
+        if value is None or _is_regex(value) or \
+                isinstance(value, (dict, list)):
+            return None
+    return values
+
+
+class _Storage(object):
+    """ The documents and indexes of a collection """
+
+    def __init__(self) -> None:
+        self.documents = {}  # type: Dict[Hashable, _Entry]
+        self.indexes = {}  # type: Dict[str, _Index]
+        self.lock = threading.RLock()
+        self._order = 0
+
+    def next_order(self) -> int:
+        self._order += 1
+        return self._order
+
+    def field_indexes(self) -> Dict[str, _Index]:
+        return {
+            index.fields[0]: index for index in self.indexes.values()
+            if len(index.fields) == 1}
+
+    def candidates(self, query: Mapping[str, Any]) -> List[_Entry]:
+        """
+        The entries that can match the query, using the _id and the
+        single field indexes when possible (in insertion order).
+        """
+        selected = None  # type: Optional[Set[Hashable]]
+        indexes = self.field_indexes() if self.indexes else {}
+        for field, condition in query.items():
+            if field != "_id" and field not in indexes:
+                continue
+            values = _index_values(condition)
+            if values is None:
+                continue
+            if field == "_id":
+                ids = {_hashable(value) for value in values}
+            else:
+                ids = set()
+                for value in values:
+                    ids |= indexes[field].lookup(value)
+            if selected is None or len(ids) < len(selected):
+                selected = ids
+        if selected is None:
+            return list(self.documents.values())
+        entries = [
+            self.documents[id_key] for id_key in selected
+            if id_key in self.documents]
+        entries.sort(key=lambda entry: entry.order)
+        return entries
+
+    def put(self, id_key: Hashable, raw: bytes, document: Document) -> None:
+        """ Inserts or replaces a document, keeping the indexes current """
+        previous = self.documents.get(id_key)
+        for index in self.indexes.values():
+            index.check(document, id_key)
+        for index in self.indexes.values():
+            if previous is not None:
+                index.remove(previous.document, id_key)
+            index.add(document, id_key)
+        order = self.next_order() if previous is None else previous.order
+        self.documents[id_key] = _Entry(order, raw, document)
+
+    def remove(self, id_key: Hashable) -> None:
+        entry = self.documents.pop(id_key)
+        for index in self.indexes.values():
+            index.remove(entry.document, id_key)
+
+
+class MemoryClient(object):
+    """ Keeps databases in memory, with the interface of a MongoClient. """
+
+    def __init__(
+            self,
+            document_class: Any = dict,
+            tz_aware: bool = False,
+            tzinfo: Optional[datetime.tzinfo] = None) -> None:
+        self.codec_options = CodecOptions(
+            document_class=document_class, tz_aware=tz_aware,
+            tzinfo=tzinfo)  # type: CodecOptions[Any]
+        self._databases = {}  # type: Dict[str, Dict[str, _Storage]]
+        self._lock = threading.Lock()
+
+    def _storage(self, database: str, collection: str) -> _Storage:
+        with self._lock:
+            collections = self._databases.setdefault(database, {})
+            storage = collections.get(collection)
+            if storage is None:
+                storage = collections[collection] = _Storage()
+            return storage
+
+    def get_database(
+            self,
+            name: str,
+            codec_options: "Optional[CodecOptions[Any]]" = None,
+            **kwargs: Any) -> "MemoryDatabase":
+        return MemoryDatabase(self, name, codec_options or self.codec_options)
+
+    def __getitem__(self, name: str) -> "MemoryDatabase":
+        return self.get_database(name)
+
+    def list_database_names(self) -> List[str]:
+        with self._lock:
+            return [
+                name for name, collections in self._databases.items()
+                if collections]
+
+    def drop_database(self, name_or_database: Any) -> None:
+        name = getattr(name_or_database, "name", name_or_database)
+        with self._lock:
+            self._databases.pop(name, None)
+
+    def close(self) -> None:
+        """ Does nothing, the data is kept for the next session. """
+
+
+class MemoryDatabase(object):
+
+    def __init__(
+            self,
+            client: MemoryClient,
+            name: str,
+            codec_options: "CodecOptions[Any]") -> None:
+        self.client = client
+        self.name = name
+        self.codec_options = codec_options
+
+    def get_collection(
+            self,
+            name: str,
+            codec_options: "Optional[CodecOptions[Any]]" = None,
+            **kwargs: Any) -> "MemoryCollection":
+        return MemoryCollection(
+            self, name, codec_options or self.codec_options)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, MemoryDatabase):
+            return NotImplemented
+        return self.client is other.client and self.name == other.name
+
+    def __hash__(self) -> int:
+        return hash((id(self.client), self.name))
+
+    def __getitem__(self, name: str) -> "MemoryCollection":
+        return self.get_collection(name)
+
+    def list_collection_names(self) -> List[str]:
+        with self.client._lock:
+            collections = self.client._databases.get(self.name, {})
+            return list(collections)
+
+    def drop_collection(self, name_or_collection: Any) -> None:
+        name = getattr(name_or_collection, "name", name_or_collection)
+        with self.client._lock:
+            self.client._databases.get(self.name, {}).pop(name, None)
+
+
+class MemoryCollection(object):
+    """ A collection stored in memory, with the interface of pymongo's. """
+
+    def __init__(
+            self,
+            database: MemoryDatabase,
+            name: str,
+            codec_options: "CodecOptions[Any]" = DEFAULT_CODEC_OPTIONS
+            ) -> None:
+        self.database = database
+        self.name = name
+        self.full_name = "{}.{}".format(database.name, name)
+        self.codec_options = codec_options
+
+    @property
+    def _storage(self) -> _Storage:
+        return self.database.client._storage(self.database.name, self.name)
+
+    def __getitem__(self, name: str) -> "MemoryCollection":
+        return self.database["{}.{}".format(self.name, name)]
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, MemoryCollection):
+            return NotImplemented
+        return self.database == other.database and self.name == other.name
+
+    def __hash__(self) -> int:
+        return hash((self.database, self.name))
+
+    def with_options(
+            self,
+            codec_options: "Optional[CodecOptions[Any]]" = None,
+            **kwargs: Any) -> "MemoryCollection":
+        return MemoryCollection(
+            self.database, self.name, codec_options or self.codec_options)
+
+    def _decode(self, raw: bytes) -> Any:
+        return bson.decode(raw, codec_options=self.codec_options)
+
+    def _output(self, document: Document) -> Any:
+        """ Encodes and decodes a (projected) document for the caller """
+        return self._decode(bson.encode(document))
+
+    def _select(
+            self,
+            query: Optional[Mapping[str, Any]],
+            sort: Optional[SortSpec] = None,
+            skip: int = 0,
+            limit: int = 0,
+            collation: Optional[Document] = None) -> List[_Entry]:
+        """ The entries matching the query, sorted, skipped and limited """
+        query = _normalize(query or {})
+        with self._storage.lock:
+            entries = [
+                entry for entry in self._storage.candidates(query)
+                if _matches(entry.document, query)]
+        if sort:
+            _sort(entries, sort, lambda entry: entry.document, collation)
+        end = skip + limit if limit else None
+        return entries[skip:end]
+
+    def _find_documents(
+            self,
+            query: Optional[Mapping[str, Any]],
+            projection: Optional[Document],
+            sort: Optional[SortSpec],
+            skip: int,
+            limit: int,
+            collation: Optional[Document] = None) -> List[Any]:
+        entries = self._select(query, sort, skip, abs(limit), collation)
+        if projection is None:
+            return [self._decode(entry.raw) for entry in entries]
+        return [
+            self._output(_project(entry.document, projection))
+            for entry in entries]
+
+    def find(self, *args: Any, **kwargs: Any) -> "MemoryCursor":
+        return MemoryCursor(self, *args, **kwargs)
+
+    def find_one(
+            self,
+            filter: Optional[Any] = None,
+            *args: Any,
+            **kwargs: Any) -> Optional[Any]:
+        if filter is not None and not isinstance(filter, Mapping):
+            filter = {"_id": filter}
+        kwargs["limit"] = -1
+        for document in self.find(filter, *args, **kwargs):
+            return document
+        return None
+
+    def _insert(self, document: Any) -> Any:
+        if "_id" not in document and not isinstance(
+                document, RawBSONDocument):
+            # like pymongo, the id is added to the caller's document
+            document["_id"] = ObjectId()
+        raw = bson.encode(document, codec_options=self.codec_options)
+        stored = bson.decode(raw)
+        id_key = _hashable(stored["_id"])
+        storage = self._storage
+        with storage.lock:
+            if id_key in storage.documents:
+                message = "E11000 duplicate key error index: _id_"
+                raise DuplicateKeyError(
+                    message, 11000, {"errmsg": message, "code": 11000})
+            storage.put(id_key, raw, stored)
+        return stored["_id"]
+
+    def insert_one(self, document: Any, **kwargs: Any) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    def insert_many(
+            self,
+            documents: Iterable[Any],
+            ordered: bool = True,
+            **kwargs: Any) -> InsertManyResult:
+        documents = list(documents)
+        self.bulk_write(
+            [InsertOne(document) for document in documents], ordered)
+        return InsertManyResult(
+            [document["_id"] for document in documents], True)
+
+    def _replace(self, entry: _Entry, replacement: Mapping[str, Any]) -> bool:
+        """ Replaces the document, returning whether it changed """
+        document = dict(replacement)
+        object_id = entry.document["_id"]
+        if "_id" in document and not _equal(
+                _normalize(document["_id"]), object_id):
+            raise _write_error(
+                "After applying the update, the (immutable) field '_id' "
+                "was found to have been altered", 66)
+        document.pop("_id", None)
+        return self._store(entry, dict({"_id": object_id}, **document))
+
+    def _store(self, entry: _Entry, document: Mapping[str, Any]) -> bool:
+        raw = bson.encode(document, codec_options=self.codec_options)
+        if raw == entry.raw:
+            return False
+        self._storage.put(
+            _hashable(entry.document["_id"]), raw, bson.decode(raw))
+        return True
+
+    def _update(self, entry: _Entry, update: Mapping[str, Any]) -> bool:
+        document = bson.decode(entry.raw)
+        apply_update(document, _normalize(update))
+        return self._store(entry, document)
+
+    def _upsert(
+            self,
+            query: Mapping[str, Any],
+            update: Mapping[str, Any],
+            replace: bool) -> Any:
+        """ Inserts the document for an update that matched nothing """
+        document = _upsert_seed(_normalize(query))
+        if replace:
+            seed_id = document.get("_id", _MISSING)
+            document = dict(update)
+            if seed_id is not _MISSING and "_id" not in document:
+                document["_id"] = seed_id
+        else:
+            apply_update(document, _normalize(update), inserting=True)
+        return self._insert(document)
+
+    def _write(
+            self,
+            query: Mapping[str, Any],
+            update: Mapping[str, Any],
+            upsert: bool,
+            replace: bool,
+            many: bool) -> UpdateResult:
+        matched = modified = 0
+        with self._storage.lock:
+            entries = self._select(query, limit=0 if many else 1)
+            for entry in entries:
+                matched += 1
+                if replace:
+                    modified += self._replace(entry, update)
+                else:
+                    modified += self._update(entry, update)
+            raw_result = {
+                "n": matched,
+                "nModified": modified,
+                "ok": 1.0,
+                "updatedExisting": matched > 0,
+            }  # type: Document
+            if not matched and upsert:
+                raw_result["upserted"] = self._upsert(query, update, replace)
+                raw_result["n"] = 1
+        return UpdateResult(raw_result, True)
+
+    def replace_one(
+            self,
+            filter: Mapping[str, Any],
+            replacement: Mapping[str, Any],
+            upsert: bool = False,
+            **kwargs: Any) -> UpdateResult:
+        validate_ok_for_replace(replacement)
+        return self._write(filter, replacement, upsert, True, False)
+
+    def update_one(
+            self,
+            filter: Mapping[str, Any],
+            update: Mapping[str, Any],
+            upsert: bool = False,
+            **kwargs: Any) -> UpdateResult:
+        validate_ok_for_update(update)
+        return self._write(filter, update, upsert, False, False)
+
+    def update_many(
+            self,
+            filter: Mapping[str, Any],
+            update: Mapping[str, Any],
+            upsert: bool = False,
+            **kwargs: Any) -> UpdateResult:
+        validate_ok_for_update(update)
+        return self._write(filter, update, upsert, False, True)
+
+    def _delete(self, query: Mapping[str, Any], many: bool) -> DeleteResult:
+        storage = self._storage
+        with storage.lock:
+            entries = self._select(query, limit=0 if many else 1)
+            for entry in entries:
+                storage.remove(_hashable(entry.document["_id"]))
+        return DeleteResult({"n": len(entries), "ok": 1.0}, True)
+
+    def delete_one(
+            self, filter: Mapping[str, Any], **kwargs: Any) -> DeleteResult:
+        return self._delete(filter, False)
+
+    def delete_many(
+            self, filter: Mapping[str, Any], **kwargs: Any) -> DeleteResult:
+        return self._delete(filter, True)
+
+    def bulk_write(
+            self,
+            requests: Sequence[Any],
+            ordered: bool = True,
+            **kwargs: Any) -> BulkWriteResult:
+        """ Applies the write operations, collecting their results """
+        result = _BulkResult()
+        for index, request in enumerate(requests):
+            try:
+                result.apply(self, index, request)
+            except (DuplicateKeyError, WriteError) as error:
+                result.errors.append({
+                    "index": index,
+                    "code": error.code,
+                    "errmsg": str(error),
+                    "op": getattr(request, "_doc", None),
+                })
+                if ordered:
+                    break
+        if result.errors:
+            raise BulkWriteError(result.as_dict())
+        return BulkWriteResult(result.as_dict(), True)
+
+    def _find_and_modify(
+            self,
+            filter: Mapping[str, Any],
+            projection: Any,
+            sort: Any,
+            after: bool,
+            modify: Callable[[Optional[_Entry]], Any]) -> Optional[Any]:
+        """
+        Modifies the first matching document (see find_one_and_update()),
+        returning it as it was before or after.
+        """
+        sort_spec = None if sort is None else _sort_spec(sort)
+        projection = _projection(projection)
+        with self._storage.lock:
+            entries = self._select(filter, sort_spec, limit=1)
+            if not entries:
+                upserted_id = modify(None)
+                if upserted_id is None or not after:
+                    return None
+                return self.find_one({"_id": upserted_id}, projection)
+            entry = entries[0]
+            modify(entry)
+            if not after:
+                return self._output(_project(entry.document, projection))
+            return self.find_one({"_id": entry.document["_id"]}, projection)
+
+    def find_one_and_update(
+            self,
+            filter: Mapping[str, Any],
+            update: Mapping[str, Any],
+            projection: Any = None,
+            sort: Any = None,
+            upsert: bool = False,
+            return_document: bool = False,
+            **kwargs: Any) -> Optional[Any]:
+        validate_ok_for_update(update)
+
+        def modify(entry: Optional[_Entry]) -> Optional[Any]:
+            if entry is not None:
+                return self._update(entry, update)
+            return self._upsert(filter, update, False) if upsert else None
+        return self._find_and_modify(
+            filter, projection, sort, return_document, modify)
+
+    def find_one_and_replace(
+            self,
+            filter: Mapping[str, Any],
+            replacement: Mapping[str, Any],
+            projection: Any = None,
+            sort: Any = None,
+            upsert: bool = False,
+            return_document: bool = False,
+            **kwargs: Any) -> Optional[Any]:
+        validate_ok_for_replace(replacement)
+
+        def modify(entry: Optional[_Entry]) -> Optional[Any]:
+            if entry is not None:
+                return self._replace(entry, replacement)
+            return self._upsert(filter, replacement, True) if upsert else None
+        return self._find_and_modify(
+            filter, projection, sort, return_document, modify)
+
+    def find_one_and_delete(
+            self,
+            filter: Mapping[str, Any],
+            projection: Any = None,
+            sort: Any = None,
+            **kwargs: Any) -> Optional[Any]:
+        storage = self._storage
+
+        def modify(entry: Optional[_Entry]) -> None:
+            if entry is not None:
+                storage.remove(_hashable(entry.document["_id"]))
+        return self._find_and_modify(filter, projection, sort, False, modify)
+
+    def count_documents(
+            self,
+            filter: Mapping[str, Any],
+            skip: int = 0,
+            limit: int = 0,
+            **kwargs: Any) -> int:
+        return len(self._select(filter, skip=skip, limit=limit))
+
+    def estimated_document_count(self, **kwargs: Any) -> int:
+        return len(self._storage.documents)
+
+    def distinct(
+            self,
+            key: str,
+            filter: Optional[Mapping[str, Any]] = None,
+            **kwargs: Any) -> List[Any]:
+        values = []  # type: List[Any]
+        seen = set()  # type: Set[Hashable]
+        for entry in self._select(filter):
+            for value in _lookup(entry.document, key):
+                for item in value if isinstance(value, list) else [value]:
+                    item_key = _hashable(item)
+                    if item_key not in seen:
+                        seen.add(item_key)
+                        values.append(item)
+        distinct = self._output(
+            {"values": values})["values"]  # type: List[Any]
+        return distinct
+
+    def aggregate(
+            self,
+            pipeline: Sequence[Mapping[str, Any]],
+            **kwargs: Any) -> "MemoryCommandCursor":
+        """ Runs a pipeline of $match, $sort, $skip, $limit, ... stages """
+        documents = [
+            bson.decode(entry.raw) for entry in self._select(None)
+        ]  # type: List[Document]
+        for stage in pipeline:
+            (name, argument), = stage.items()
+            if name == "$match":
+                argument = _normalize(argument)
+                documents = [
+                    document for document in documents
+                    if _matches(document, argument)]
+            elif name == "$sort":
+                _sort(documents, _sort_spec(argument))
+            elif name == "$skip":
+                documents = documents[argument:]
+            elif name == "$limit":
+                documents = documents[:argument]
+            elif name == "$project":
+                projection = _projection(argument)
+                documents = [
+                    _project(document, projection) for document in documents]
+            elif name == "$sample":
+                documents = random.sample(
+                    documents, min(argument["size"], len(documents)))
+            elif name == "$group":
+                documents = _group(documents, argument)
+            elif name == "$count":
+                documents = [{argument: len(documents)}] if documents else []
+            else:
+                raise NotImplementedError(
+                    "The in-memory collection doesn't support the {} "
+                    "stage.".format(name))
+        return MemoryCommandCursor([
+            self._output(document) for document in documents])
+
+    def create_index(
+            self,
+            keys: Any,
+            unique: bool = False,
+            sparse: bool = False,
+            name: Optional[str] = None,
+            **kwargs: Any) -> str:
+        """ Indexes the documents by one or more fields """
+        spec = _sort_spec(keys)
+        name = name or "_".join(
+            "{}_{}".format(key, direction) for key, direction in spec)
+        storage = self._storage
+        with storage.lock:
+            if name not in storage.indexes:
+                index = _Index(name, spec, unique, sparse)
+                for id_key, entry in storage.documents.items():
+                    index.check(entry.document, id_key)
+                    index.add(entry.document, id_key)
+                storage.indexes[name] = index
+        return name
+
+    def drop_index(self, index_or_name: Any) -> None:
+        name = index_or_name
+        if not isinstance(name, str):
+            spec = _sort_spec(index_or_name)
+            name = "_".join(
+                "{}_{}".format(key, direction) for key, direction in spec)
+        with self._storage.lock:
+            self._storage.indexes.pop(name, None)
+
+    def drop_indexes(self, **kwargs: Any) -> None:
+        with self._storage.lock:
+            self._storage.indexes.clear()
+
+    def index_information(self) -> Dict[str, Document]:
+        information = {"_id_": {"key": [("_id", 1)], "v": 2}}
+        with self._storage.lock:
+            for name, index in self._storage.indexes.items():
+                information[name] = index.information()
+        return information
+
+    def drop(self, **kwargs: Any) -> None:
+        self.database.drop_collection(self.name)
+
+
+class _BulkResult(object):
+    """ The counts of a bulk_write() """
+
+    def __init__(self) -> None:
+        self.inserted = self.matched = self.modified = self.removed = 0
+        self.upserted = []  # type: List[Document]
+        self.errors = []  # type: List[Document]
+
+    def apply(
+            self,
+            collection: MemoryCollection,
+            index: int,
+            request: Any) -> None:
+        if isinstance(request, InsertOne):
+            collection._insert(request._doc)
+            self.inserted += 1
+            return
+        if isinstance(request, (DeleteOne, DeleteMany)):
+            self.removed += collection._delete(
+                request._filter, isinstance(request, DeleteMany)).deleted_count
+            return
+        if isinstance(request, (ReplaceOne, UpdateOne, UpdateMany)):
+            if not isinstance(request._doc, Mapping):
+                raise NotImplementedError(
+                    "The in-memory collection doesn't support pipeline "
+                    "updates.")
+            result = collection._write(
+                request._filter, request._doc, bool(request._upsert),
+                isinstance(request, ReplaceOne),
+                isinstance(request, UpdateMany))
+            if result.upserted_id is not None:
+                self.upserted.append({
+                    "index": index, "_id": result.upserted_id})
+            else:
+                self.matched += result.matched_count
+            self.modified += result.modified_count
+            return
+        raise NotImplementedError(
+            "The in-memory collection doesn't support {!r}.".format(request))
+
+    def as_dict(self) -> Document:
+        return {
+            "writeErrors": self.errors,
+            "writeConcernErrors": [],
+            "nInserted": self.inserted,
+            "nUpserted": len(self.upserted),
+            "nMatched": self.matched,
+            "nModified": self.modified,
+            "nRemoved": self.removed,
+            "upserted": self.upserted,
+        }
+
+
+class MemoryCursor(object):
+    """ Like pymongo's cursor, runs the query when it is iterated over. """
+
+    def __init__(
+            self,
+            collection: MemoryCollection,
+            filter: Optional[Mapping[str, Any]] = None,
+            projection: Any = None,
+            skip: int = 0,
+            limit: int = 0,
+            sort: Any = None,
+            collation: Any = None,
+            **kwargs: Any) -> None:
+        self.collection = collection
+        self._filter = filter
+        self._projection = _projection(projection)
+        self._skip = skip
+        self._limit = limit
+        self._sort = None if sort is None else _sort_spec(sort)
+        self._collation = _collation(collation)
+        self._documents = None  # type: Optional[List[Any]]
+        self.retrieved = 0
+
+    def _check_options(self) -> None:
+        if self._documents is not None:
+            raise InvalidOperation("cannot set options after executing query")
+
+    def sort(
+            self,
+            key_or_list: Any,
+            direction: Optional[int] = None) -> "MemoryCursor":
+        self._check_options()
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "MemoryCursor":
+        self._check_options()
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "MemoryCursor":
+        self._check_options()
+        self._limit = limit
+        return self
+
+    def collation(self, collation: Any) -> "MemoryCursor":
+        """ Only changes the order of strings (see _sort_value()) """
+        self._check_options()
+        self._collation = _collation(collation)
+        return self
+
+    def _ignored(self, *args: Any, **kwargs: Any) -> "MemoryCursor":
+        self._check_options()
+        return self
+
+    # options that don't change the results of an in-memory query
+    hint = batch_size = max_time_ms = comment = allow_disk_use = _ignored
+
+    def __iter__(self) -> "MemoryCursor":
+        return self
+
+    def __next__(self) -> Any:
+        if self._documents is None:
+            self._documents = self.collection._find_documents(
+                self._filter, self._projection, self._sort, self._skip,
+                self._limit, self._collation)
+        if self.retrieved >= len(self._documents):
+            raise StopIteration
+        document = self._documents[self.retrieved]
+        self.retrieved += 1
+        return document
+
+    next = __next__
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        self._check_options()
+        if isinstance(index, slice):
+            if index.step is not None or (index.start or 0) < 0 or (
+                    index.stop is not None and index.stop < 0):
+                raise IndexError("Cursor instances only support slices "
+                                 "with positive start and stop indexes")
+            cursor = self.clone()
+            cursor._skip = self._skip + (index.start or 0)
+            if index.stop is not None:
+                cursor._limit = max(index.stop - (index.start or 0), 0)
+            return cursor
+        if index < 0:
+            raise IndexError(
+                "Cursor instances do not support negative indices")
+        for document in self.clone().skip(self._skip + index).limit(-1):
+            return document
+        raise IndexError("no such item for Cursor instance")
+
+    def clone(self) -> "MemoryCursor":
+        cursor = MemoryCursor(
+            self.collection, self._filter, self._projection, self._skip,
+            self._limit)
+        cursor._sort = self._sort
+        cursor._collation = self._collation
+        return cursor
+
+    def rewind(self) -> "MemoryCursor":
+        self._documents = None
+        self.retrieved = 0
+        return self
+
+    def close(self) -> None:
+        self._documents = []
+        self.retrieved = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._documents is None or \
+            self.retrieved < len(self._documents)
+
+    def distinct(self, key: str) -> List[Any]:
+        return self.collection.distinct(key, self._filter)
+
+
+class MemoryCommandCursor(object):
+    """ The results of aggregate() """
+
+    def __init__(self, documents: List[Any]) -> None:
+        self._documents = iter(documents)
+
+    def __iter__(self) -> "MemoryCommandCursor":
+        return self
+
+    def __next__(self) -> Any:
+        return next(self._documents)
+
+    next = __next__
+
+    def close(self) -> None:
+        self._documents = iter([])
+
+
+__all__ = ["MemoryClient"]
@@ -34,29 +34,46 @@ class UserAccount(Model):
 import inspect
 import logging
 import warnings
+from types import MappingProxyType
 
 import mogo
+from mogo.cache import caches_enabled, invalidate
+from mogo.cache import DocumentCache, QueryCache  # noqa: F401
 from mogo.connection import Connection, Session
 from mogo.decorators import notinstancemethod
 from mogo.cursor import Cursor
 from mogo.field import Field, EmptyRequiredField
-from mogo.helpers import check_none, Document
+from mogo.helpers import check_none, check_not_blocking, decode_raw
+from mogo.helpers import Document
+from mogo.helpers import is_inclusion_projection, normalize_projection
+from mogo.identity import get_identity_map
+from mogo.instrumentation import instrumented
 
 from bson.dbref import DBRef
 from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo import InsertOne, ReplaceOne, ReturnDocument, UpdateOne
 from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, WriteError
 from pymongo.results import DeleteResult, UpdateResult
 
 import typing
-from typing import Any, Callable, cast, Dict, Iterator
-from typing import Optional, Sequence, Tuple, Type, TypeVar, Union
+from typing import Any, Callable, cast, Dict, Iterator, List, Mapping
+from typing import FrozenSet, Optional, Sequence, Tuple, Type, TypeVar
+from typing import Union
 
 
 M = TypeVar("M", bound="Model")
 P = TypeVar("P", bound="PolyModel")
+R = TypeVar("R")
 
 
 _UpdateCallable = Callable[..., UpdateResult]
+# the model's (synchronous) collection, or its collection in mogo.aio
+_AnyCollection = Union[Collection[Document], "AsyncCollection[Document]"]
+# pymongo arguments, and the projection among them
+_ProjectionArguments = Tuple[
+    Tuple[Any, ...], Dict[str, Any], Optional[Dict[str, Any]]]
 
 
 class BiContextualUpdate(object):
@@ -75,6 +92,89 @@ class BiContextualUpdate(object):
             return obj._instance_update
 
 
+class AtomicUpdates(object):
+    """
+    The atomic update operators of a model class or instance (see
+    Model.atomic). Called on an instance, they take the fields to update;
+    called on the class, the query first (and multi=True to update every
+    match).
+    """
+
+    def __init__(self, modify: Callable[..., UpdateResult]) -> None:
+        self._modify = modify
+
+    def inc(self, *args: Any, **kwargs: Any) -> UpdateResult:
+        return self._modify("$inc", *args, **kwargs)
+
+    def push(self, *args: Any, **kwargs: Any) -> UpdateResult:
+        return self._modify("$push", *args, **kwargs)
+
+    def add_to_set(self, *args: Any, **kwargs: Any) -> UpdateResult:
+        return self._modify("$addToSet", *args, **kwargs)
+
+    def pull(self, *args: Any, **kwargs: Any) -> UpdateResult:
+        return self._modify("$pull", *args, **kwargs)
+
+    def min(self, *args: Any, **kwargs: Any) -> UpdateResult:
+        return self._modify("$min", *args, **kwargs)
+
+    def max(self, *args: Any, **kwargs: Any) -> UpdateResult:
+        return self._modify("$max", *args, **kwargs)
+
+
+class AtomicAccessor(object):
+    """ Returns the atomic update operators of a model class or instance """
+
+    def __get__(
+            self,
+            obj: Optional[M],
+            otype: Optional[Type[M]] = None) -> AtomicUpdates:
+        if obj is None:
+            if otype is None:
+                raise Exception("Neither model nor instance provided.")
+            return AtomicUpdates(otype._class_modify)
+        return AtomicUpdates(obj._instance_modify)
+
+
+class AsyncAccessor(object):
+    """ Returns the awaitable API for a model class or instance (mogo.aio) """
+
+    @typing.overload
+    def __get__(
+            self,
+            obj: None,
+            otype: Type[M]) -> "AsyncModelManager[M]": ...
+
+    @typing.overload
+    def __get__(
+            self,
+            obj: M,
+            otype: Optional[Type[M]] = None) -> "AsyncInstanceManager[M]": ...
+
+    def __get__(
+            self,
+            obj: Optional[M],
+            otype: Optional[Type[M]] = None) -> \
+            Union["AsyncModelManager[M]", "AsyncInstanceManager[M]"]:
+        # imported here to keep PyMongo's asyncio API optional
+        from mogo.aio import AsyncInstanceManager, AsyncModelManager
+        if obj is None:
+            if otype is None:
+                raise Exception("Neither model nor instance provided.")
+            return AsyncModelManager(otype)
+        return AsyncInstanceManager(obj)
+
+
+# the changed keys of unmodified instances
+_UNCHANGED = frozenset()  # type: FrozenSet[str]
+
+
+# the attribute of pymongo clients holding their Model.use() classes by
+# (database, model). Since the classes reference the client through their
+# collections, a module level mapping would keep every client alive.
+_WRAPPED_MODELS = "_mogo_wrapped_models"
+
+
 class InvalidUpdateCall(Exception):
     """ Raised whenever update is called on a new model """
     pass
@@ -87,6 +187,31 @@ class UnknownField(Exception):
     pass
 
 
+class PartialDocumentError(Exception):
+    """ Raised when replacing a document that was only partially loaded. """
+    pass
+
+
+class VersionConflictError(Exception):
+    """ Raised when a versioned model is written after its document was
+    modified (or deleted) by someone else since it was loaded.
+    """
+    pass
+
+
+class BulkSaveError(Exception):
+    """ Raised by save_many when some of the models could not be written.
+    `errors` holds (model, write error document) pairs.
+    """
+
+    def __init__(
+            self,
+            message: str,
+            errors: Sequence[Tuple["Model", Dict[str, Any]]]) -> None:
+        super().__init__(message)
+        self.errors = list(errors)
+
+
 class NewModelClass(type):
     """ Metaclass for inheriting field lists """
 
@@ -94,13 +219,15 @@ class NewModelClass(type):
             cls,
             name: str,
             bases: Tuple[type, ...],
-            attributes: Dict[str, Any]) -> Type[M]:
-        # Emptying fields by default
-        attributes["__fields"] = {}
+            attributes: Dict[str, Any],
+            slots: bool = False) -> Type[M]:
+        if slots:
+            # instances only have the storage slots of Model
+            attributes.setdefault("__slots__", ())
         new_model = cast(
             Type[M],
             super().__new__(cls, name, bases, attributes))  # type: Type[M]
-        # pre-populate fields
+        # compile the field schema
         new_model._update_fields()
         if hasattr(new_model, "_child_models"):
             new_model._child_models = {}
@@ -110,6 +237,7 @@ class NewModelClass(type):
         """ Catching new field additions to classes """
         super().__setattr__(name, value)
         if isinstance(value, Field):
+            value.__set_name__(cast(Type[Model], cls), name)
             # Update the fields, because they have changed
             cast(Type[Model], cls)._update_fields()
 
@@ -128,16 +256,54 @@ class Model(metaclass=NewModelClass):
         print result.password
     """
 
+    # The per-instance state. Subclasses get a __dict__ for their own
+    # attributes, unless they are declared with `slots=True`.
+    __slots__ = (
+        "_pymongo_data", "_changed_keys", "_prefetched", "_projection",
+        "_asynchronous", "__weakref__")
+
+    # a dict, or a RawBSONDocument for unmodified LAZY_DECODING models
+    _pymongo_data: Optional[Document]
+    # storage keys touched since the last load / save, or None when the
+    # next save must write the whole document
+    _changed_keys: Optional[FrozenSet[str]]
+    # ReferenceField results resolved by Cursor.prefetch(), by storage key
+    _prefetched: Optional[Dict[str, Tuple[Any, Optional["Model"]]]]
+    # the projection used to load a partial document (None when complete)
+    _projection: Optional[Dict[str, Any]]
+    # whether the instance was loaded with mogo.aio, so implicit loads
+    # must not block the event loop
+    _asynchronous: bool
+
     _id_field = "_id"  # type: str
     _id_type = ObjectId  # type: Any
     _name = None  # type: Optional[str]
-    _pymongo_data: Optional[dict[str, Any]] = None
     _collection: Optional[Collection[Document]] = None
     _child_models = None  # type: Optional[Dict[Any, Type["PolyModel"]]]
-    _init_okay = False  # type: bool
-    __fields = None  # type: Optional[Dict[int, str]]
+    # the compiled field schema, see _update_fields()
+    __fields = None  # type: Optional[Mapping[int, str]]
+    __schema = None  # type: Optional[Mapping[str, Field[Any]]]
+    __defaults = ()  # type: Tuple[Tuple[str, Field[Any]], ...]
 
     AUTO_CREATE_FIELDS = None  # type: Optional[bool]
+    # Compute defaults when the field is first read (or the model is saved
+    # and the field is required) instead of on construction.
+    LAZY_DEFAULTS = None  # type: Optional[bool]
+    # Load documents as RawBSONDocuments, which are only decoded when read
+    # and only converted to a dict when the model is modified (or a nested
+    # document or list, which could be modified, is read).
+    LAZY_DECODING = False  # type: bool
+    # Caches the results of identical queries (see mogo.cache).
+    QUERY_CACHE = None  # type: Optional[QueryCache]
+    # Caches documents for lookups by id (see mogo.cache).
+    DOCUMENT_CACHE = None  # type: Optional[DocumentCache]
+    # The key of a version number which save() and update() increment and
+    # check, raising VersionConflictError instead of overwriting changes
+    # made since the model was loaded.
+    VERSION_FIELD = None  # type: Optional[str]
+
+    # the asyncio API, e.g. `await Model.aio.find_one()` (see mogo.aio)
+    aio = AsyncAccessor()
 
     # DEPRECATED
     @classmethod
@@ -149,19 +315,36 @@ class Model(metaclass=NewModelClass):
     # Dict-compatibility methods
 
     def get(self: M, key: str, default: Optional[Any] = None) -> Optional[Any]:
-        return check_none(self._pymongo_data).get(key, default)
+        if self._projection is not None:
+            self._load_missing(key)
+        value = check_none(self._pymongo_data).get(key, default)
+        if type(self._pymongo_data) is not dict:
+            value = self._decode_nested(key, value)
+        self._track_mutable(key, value)
+        return value
 
     def copy(self: M) -> Dict[str, Any]:
-        return check_none(self._pymongo_data).copy()
+        data = check_none(self._pymongo_data)
+        if type(data) is dict:
+            return data.copy()
+        return dict(data)
 
     def __setitem__(self: M, key: str, value: Any) -> None:
-        check_none(self._pymongo_data).__setitem__(key, value)
+        self._get_writable_data().__setitem__(key, value)
+        self._mark_changed(key)
 
     def __getitem__(self: M, key: str) -> Any:
-        return check_none(self._pymongo_data).__getitem__(key)
-
-    def __delitem__(self: M, key: str) -> Any:
-        return check_none(self._pymongo_data).__delitem__(key)
+        if self._projection is not None:
+            self._load_missing(key)
+        value = check_none(self._pymongo_data).__getitem__(key)
+        if type(self._pymongo_data) is not dict:
+            value = self._decode_nested(key, value)
+        self._track_mutable(key, value)
+        return value
+
+    def __delitem__(self: M, key: str) -> None:
+        self._get_writable_data().__delitem__(key)
+        self._mark_changed(key)
 
     def __contains__(self: M, item: str) -> bool:
         return check_none(self._pymongo_data).__contains__(item)
@@ -182,22 +365,40 @@ class Model(metaclass=NewModelClass):
 
     @classmethod
     def use(cls: Type[M], session: Session) -> Type[M]:
-        """ Wraps the class to use a specific connection session """
+        """
+        Wraps the class to use a specific connection session. The wrapped
+        class is created once per model, client and database, so sessions
+        sharing a client (e.g. one per request) reuse it.
+        """
+        connection = session.connection
+        if connection is None:
+            raise Exception("No connection for session.")
+        client = check_none(connection.connection)
+        wrapped_models = getattr(
+            client, _WRAPPED_MODELS,
+            None)  # type: Optional[Dict[Tuple[Optional[str], type], type]]
+        if wrapped_models is None:
+            wrapped_models = {}
+            setattr(client, _WRAPPED_MODELS, wrapped_models)
+        key = (connection._database, cls)
+        wrapped = wrapped_models.get(key)
+        if wrapped is not None:
+            return cast(Type[M], wrapped)
+
         # have to ignore type here because mypy isn't able to follow the
         # dynamic base presented by `cls` (e.g. Type[M])
         class Wrapped(cls):  # type: ignore
-            pass
+            __slots__ = ()
 
         Wrapped.__name__ = cls.__name__
-        connection = session.connection
-        if connection is None:
-            raise Exception("No connection for session.")
         collection = connection.get_collection(
             Wrapped._get_name())  # type: Collection[Any]
         Wrapped._collection = collection
+        wrapped_models[key] = Wrapped
         return Wrapped
 
     @classmethod
+    @instrumented("create")
     def create(cls: Type[M], **kwargs: Any) -> M:
         """ Create a new model and save it. """
         if hasattr(cls, "new"):
@@ -211,33 +412,109 @@ class Model(metaclass=NewModelClass):
         """ Creates an instance of the model, without saving it. """
         super().__init__()
         self._pymongo_data = {}
+        self._changed_keys = None
+        self._prefetched = None
+        self._projection = None
+        self._asynchronous = False
         # compute once
         create_fields = self._auto_create_fields
         is_new_instance = self._id_field not in kwargs
+        schema = self._get_schema()
         for field, value in kwargs.items():
             if is_new_instance:
-                if field in self._fields.values():
+                if field in schema:
                     # Running validation, if the field exists
-                    setattr(self, field, value)
+                    schema[field].__set__(self, value)
                 else:
                     if not create_fields:
                         raise UnknownField("Unknown field {}".format(field))
                     self.add_field(field, Field())
+                    schema = self._get_schema()
                     setattr(self, field, value)
             else:
                 self[field] = value
 
-        for field_name in self._fields.values():
-            attr = getattr(self.__class__, field_name)
-            self._fields[attr.id] = field_name
+        self._apply_defaults()
 
-            # set the default
-            attr._set_default(self, field_name)
+    @classmethod
+    def from_document(
+            cls: Type[M],
+            document: Document,
+            projection: Optional[Dict[str, Any]] = None) -> M:
+        """
+        Trusted load path for documents returned by MongoDB. The document
+        is adopted as the instance's storage without copying keys, running
+        field validation or materializing defaults (defaults are still
+        applied on first attribute access). The model's __init__ is NOT
+        called. With an active identity map, an already loaded instance for
+        the same document is returned instead.
+
+        If the document was loaded with a `projection`, the instance is
+        marked as partial: keys left out are fetched on first access, and
+        it can only be saved with $set / $unset updates.
+        """
+        return cls._load_document(document, projection)
 
     @classmethod
-    def _get_fields(cls: Type[M]) -> Dict[int, str]:
+    def _load_document(
+            cls: Type[M],
+            document: Document,
+            projection: Optional[Dict[str, Any]] = None,
+            namespace: Optional[str] = None) -> M:
+        """
+        Implements from_document. `namespace` is the full name of the
+        collection the document was loaded from (used for the identity
+        map), and defaults to the model's collection.
+        """
+        identities = get_identity_map()
+        if identities is None:
+            return cls._hydrate(document, projection)
+        object_id = document.get(cls._id_field)
+        if object_id is None:
+            return cls._hydrate(document, projection)
+        namespace = namespace or cls._get_collection().full_name
+        existing = identities.get(namespace, object_id)
+        if isinstance(existing, cls):
+            return existing
+        instance = cls._hydrate(document, projection)
+        identities.add(namespace, object_id, instance)
+        return instance
+
+    @classmethod
+    def _hydrate(
+            cls: Type[M],
+            document: Document,
+            projection: Optional[Dict[str, Any]]) -> M:
+        model_class = cls._get_model_class(document)
+        instance = object.__new__(model_class)
+        instance._pymongo_data = document
+        instance._changed_keys = _UNCHANGED
+        instance._prefetched = None
+        instance._projection = projection
+        instance._asynchronous = False
+        return instance
+
+    @classmethod
+    def _get_model_class(cls: Type[M], document: Document) -> Type[M]:
+        """ Returns the class that should represent the document. """
+        return cls
+
+    @classmethod
+    def _update_search_spec(
+            cls: Type[M], spec: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """ Hook for restricting queries (see PolyModel). """
+        return spec or {}
+
+    @classmethod
+    def _get_fields(cls: Type[M]) -> Mapping[int, str]:
+        """ Maps the id of each field to its attribute name """
         return check_none(cls.__fields)
 
+    @classmethod
+    def _get_schema(cls: Type[M]) -> Mapping[str, "Field[Any]"]:
+        """ Maps attribute names to fields """
+        return check_none(cls.__schema)
+
     @property
     def _auto_create_fields(self: M) -> bool:
         if self.AUTO_CREATE_FIELDS is not None:
@@ -245,18 +522,40 @@ class Model(metaclass=NewModelClass):
         return mogo.AUTO_CREATE_FIELDS
 
     @property
-    def _fields(self: M) -> Dict[int, str]:
+    def _lazy_defaults(self: M) -> bool:
+        if self.LAZY_DEFAULTS is not None:
+            return self.LAZY_DEFAULTS
+        return mogo.LAZY_DEFAULTS
+
+    def _apply_defaults(self: M) -> None:
+        """ Stores the defaults, unless they are computed on first access """
+        if self._lazy_defaults:
+            return
+        for field_name, field in self.__defaults:
+            field._set_default(self, field_name)
+
+    @property
+    def _fields(self: M) -> Mapping[int, str]:
         return self._get_fields()
 
     @classmethod
     def _update_fields(cls: Type[M]) -> None:
-        """ (Re)update the list of fields """
-        cls.__fields = {}
-        for attr_key in dir(cls):
-            attr = getattr(cls, attr_key)
-            if not isinstance(attr, Field):
-                continue
-            cls.__fields[attr.id] = attr_key
+        """ (Re)compiles the fields of the class and its subclasses """
+        attributes = {}  # type: Dict[str, Any]
+        for klass in reversed(cls.__mro__):
+            attributes.update(vars(klass))
+        schema = {
+            key: value for key, value in attributes.items()
+            if isinstance(value, Field)}
+        cls.__schema = MappingProxyType(schema)
+        cls.__fields = MappingProxyType(
+            {field.id: key for key, field in schema.items()})
+        # (storage name, field) of the fields set on construction
+        cls.__defaults = tuple(
+            (field._get_field_name(cls), field)
+            for field in schema.values() if field._has_default())
+        for subclass in cls.__subclasses__():
+            subclass._update_fields()
 
     @classmethod
     def add_field(
@@ -265,8 +564,8 @@ class Model(metaclass=NewModelClass):
             new_field_descriptor: Any) -> None:
         """ Adds a new field to the class """
         assert isinstance(new_field_descriptor, Field)
+        # the metaclass updates the schema
         setattr(cls, field_name, new_field_descriptor)
-        cls._update_fields()
 
     def _get_id(self: M) -> Optional[Any]:
         """
@@ -277,24 +576,688 @@ class Model(metaclass=NewModelClass):
         """
         return self.get(self._id_field)
 
-    def save(self: M, *args: Any, **kwargs: Any) -> Any:
-        """ Passthru to PyMongo's save after checking values """
+    def _get_writable_data(self: M) -> Dict[str, Any]:
+        """ Returns the storage dict, decoding a raw BSON document first. """
+        data = check_none(self._pymongo_data)
+        if type(data) is not dict:
+            data = decode_raw(data)
+            self._pymongo_data = data
+        return cast(Dict[str, Any], data)
+
+    def _decode_nested(self: M, key: str, value: Any) -> Any:
+        """
+        Decodes the nested documents and lists of a raw BSON document when
+        they are handed out. DBRefs leave the document raw, while other
+        values could be changed in place, so the document is decoded.
+        """
+        if not isinstance(value, (RawBSONDocument, list)):
+            return value
+        if isinstance(value, RawBSONDocument) and "$ref" in value:
+            return decode_raw(value)
+        if key not in check_none(self._pymongo_data):
+            # the default of get()
+            return value
+        return self._get_writable_data()[key]
+
+    def _track_mutable(self: M, key: str, value: Any) -> None:
+        """
+        Lists and dicts handed out by the model can be changed in place,
+        so they are conservatively treated as changed.
+        """
+        if isinstance(value, (list, dict)):
+            self._mark_changed(key)
+
+    def _mark_changed(self: M, key: str) -> None:
+        # the sets are immutable, so unchanged models share the empty one
+        changed = self._changed_keys
+        if changed is not None and key not in changed:
+            self._changed_keys = changed.union((key,))
+
+    def _reset_changes(self: M) -> None:
+        """ Marks the instance as matching the stored document. """
+        self._changed_keys = _UNCHANGED
+
+    def _get_changes(self: M) -> Dict[str, Dict[str, Any]]:
+        """
+        Builds a $set / $unset modifier from the changed keys (which also
+        increments the version of versioned models).
+        """
+        data = check_none(self._pymongo_data)
+        set_values = {}  # type: Dict[str, Any]
+        unset_values = {}  # type: Dict[str, Any]
+        for key in check_none(self._changed_keys):
+            if key == self.VERSION_FIELD:
+                continue
+            if key in data:
+                set_values[key] = data[key]
+            else:
+                unset_values[key] = ""
+        modifier = {}  # type: Dict[str, Dict[str, Any]]
+        if set_values:
+            modifier["$set"] = set_values
+        if unset_values:
+            modifier["$unset"] = unset_values
+        return self._add_version_increment(modifier)
+
+    def _is_missing(self: M, key: str) -> bool:
+        """ Whether the key was left out of a partially loaded document. """
+        projection = self._projection
+        if projection is None or key == self._id_field:
+            return False
+        if is_inclusion_projection(projection, self._id_field):
+            return key not in projection
+        return key in projection and not projection[key]
+
+    def _is_partial(self: M, key: str) -> bool:
+        """
+        Whether only some paths of the key were loaded (or left out), e.g.
+        "address" after only("address.city").
+        """
+        projection = self._projection
+        if projection is None:
+            return False
+        prefix = key + "."
+        return any(name.startswith(prefix) for name in projection)
+
+    def _load_missing(self: M, key: str) -> None:
+        """
+        Fetches the rest of a partially loaded document if `key` was left
+        out of it (or only partially loaded). Keys changed locally since
+        loading are kept.
+        """
+        if not self._is_partial(key) and (
+                key in check_none(self._pymongo_data) or
+                not self._is_missing(key)):
+            return
+        projection = check_none(self._projection)
+        if is_inclusion_projection(projection, self._id_field):
+            # all but the keys that were loaded completely
+            remaining = {
+                name: 0 for name in projection
+                if name != self._id_field and "." not in name
+            } or None  # type: Optional[Dict[str, Any]]
+        else:
+            remaining = {name.split(".", 1)[0]: 1 for name in projection}
+        partial = set(
+            name.split(".", 1)[0] for name in projection if "." in name)
+        self._check_not_blocking(
+            "Cannot load '{}' of a partially loaded {} in a running event "
+            "loop.".format(key, self.__class__.__name__))
+        document = self._get_collection().find_one(
+            {self._id_field: self._get_id()}, remaining)
+        self._projection = None
+        if document is None:
+            return
+        data = self._get_writable_data()
+        changed = self._changed_keys or _UNCHANGED
+        for name, value in document.items():
+            if name not in changed and (name not in data or name in partial):
+                data[name] = value
+
+    def _check_not_blocking(self: M, message: str) -> None:
+        """
+        Raises BlockingLoadError instead of implicitly loading data for an
+        instance loaded with mogo.aio while its event loop is running.
+        """
+        if self._asynchronous:
+            check_not_blocking(message)
+
+    def _check_replaceable(self: M) -> None:
+        if self._projection is not None:
+            raise PartialDocumentError(
+                "Cannot replace a partially loaded document.")
+
+    def _needs_replace(self: M) -> bool:
+        """ Whether the next save must send the entire document. """
+        return self._changed_keys is None or \
+            self._id_field in self._changed_keys
+
+    @instrumented("save")
+    def save(
+            self: M,
+            *args: Any,
+            replace: bool = False,
+            **kwargs: Any) -> Any:
+        """
+        Passthru to PyMongo's save after checking values. Documents
+        loaded from the database only send the keys that changed since
+        they were loaded (as $set / $unset) unless `replace` is True.
+        """
         coll = self._get_collection()
         self._check_required()
         if "safe" in kwargs:
             warn_about_keyword_deprecation("safe")
             del kwargs["safe"]
         object_id = self._get_id()
+        version = self._get_next_version()
         if object_id is None:
-            result = coll.insert_one(self.copy())
+            result = coll.insert_one(self._get_versioned_copy(version))
             object_id = result.inserted_id
             self.__setitem__(self._id_field, object_id)
+        elif replace or self._needs_replace():
+            self._check_replaceable()
+            spec = self._get_write_spec()
+            update_result = coll.replace_one(
+                spec, self._get_versioned_copy(version),
+                upsert=self._may_upsert(spec))
+            self._check_version(update_result)
         else:
-            spec = {self._id_field: object_id}
-            coll.replace_one(spec, self.copy(), upsert=True)
+            modifier = self._get_changes()
+            if not modifier:
+                version = None
+            else:
+                spec = self._get_write_spec()
+                update_result = coll.update_one(spec, modifier)
+                self._check_version(update_result)
+                self._check_updated(update_result)
+                if self._needs_restore(update_result):
+                    coll.replace_one(spec, self.copy(), upsert=True)
+        self._set_version(version)
+        self._documents_changed(coll.full_name)
+        self._reset_changes()
+        self._remember()
+        self._cache_document(coll)
         return object_id
 
+    def _needs_restore(self: M, result: UpdateResult) -> bool:
+        """
+        Whether the changes matched nothing because the document was
+        deleted since it was loaded, so it must be inserted again (with
+        the rest of its keys), just like a replacement would. Versioned
+        and partial documents must exist.
+        """
+        return self.VERSION_FIELD is None and self._projection is None \
+            and not result.matched_count
+
+    def _check_updated(self: M, result: UpdateResult) -> None:
+        """ Raises if the changes of a partial document matched nothing. """
+        if self._projection is not None and not result.matched_count:
+            raise PartialDocumentError(
+                "Cannot save a partially loaded document that was deleted.")
+
+    # Optimistic concurrency for models with a VERSION_FIELD
+
+    def _get_next_version(self: M) -> Optional[int]:
+        """ The version of the next write, or None if unversioned. """
+        if self.VERSION_FIELD is None:
+            return None
+        return int(self.get(self.VERSION_FIELD) or 0) + 1
+
+    def _set_version(self: M, version: Optional[int]) -> None:
+        """ Stores the version of a successful write locally. """
+        if version is not None:
+            data = self._get_writable_data()
+            data[check_none(self.VERSION_FIELD)] = version
+
+    def _get_versioned_copy(
+            self: M, version: Optional[int]) -> Dict[str, Any]:
+        document = self.copy()
+        if version is not None:
+            document[check_none(self.VERSION_FIELD)] = version
+        return document
+
+    def _get_write_spec(self: M) -> Dict[str, Any]:
+        """
+        The filter for writes to the instance's document, which only
+        matches the loaded version of versioned models. (None matches the
+        documents that were saved before the model was versioned.)
+        """
+        spec = {self._id_field: self._get_id()}
+        if self.VERSION_FIELD is not None:
+            spec[self.VERSION_FIELD] = self.get(self.VERSION_FIELD)
+        return spec
+
+    def _may_upsert(self: M, spec: Dict[str, Any]) -> bool:
+        """
+        Whether a replacement may insert the document. Versioned documents
+        that were saved before must still exist.
+        """
+        return self.VERSION_FIELD is None or spec[self.VERSION_FIELD] is None
+
+    def _check_version(self: M, result: UpdateResult) -> None:
+        """ Raises VersionConflictError if a versioned write missed. """
+        if self.VERSION_FIELD is not None and not (
+                result.matched_count or result.upserted_id is not None):
+            raise self._get_version_conflict()
+
+    def _get_version_conflict(self: M) -> VersionConflictError:
+        return VersionConflictError(
+            "{} {!r} was modified or deleted since it was loaded.".format(
+                self.__class__.__name__, self._get_id()))
+
+    @classmethod
+    def _add_version_increment(
+            cls: Type[M],
+            modifier: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """ Adds the version increment to a (non-empty) modifier. """
+        if cls.VERSION_FIELD is not None and modifier:
+            increments = dict(modifier.get("$inc", {}))
+            increments[cls.VERSION_FIELD] = 1
+            modifier["$inc"] = increments
+        return modifier
+
+    @classmethod
+    def _get_versioned_update(cls: Type[M], update: Any) -> Any:
+        """
+        Adds the version increment to an update document (or pipeline)
+        passed to the collection, unless it already writes the
+        VERSION_FIELD.
+        """
+        version_field = cls.VERSION_FIELD
+        if version_field is None or not update:
+            return update
+        if isinstance(update, list):
+            current = {"$ifNull": ["$" + version_field, 0]}
+            return update + [
+                {"$set": {version_field: {"$add": [current, 1]}}}]
+        if not isinstance(update, Mapping) or not all(
+                key.startswith("$") for key in update):
+            # not an update document (which pymongo rejects)
+            return update
+        for fields in update.values():
+            if isinstance(fields, Mapping) and version_field in fields:
+                return update
+        return cls._add_version_increment(dict(update))
+
+    @classmethod
+    def _get_update_arguments(
+            cls: Type[M],
+            args: Tuple[Any, ...],
+            kwargs: Dict[str, Any]) -> Tuple[Tuple[Any, ...], Dict[str, Any]]:
+        """ Versions the update among update_one() / many() arguments """
+        if len(args) > 1:
+            args = (args[0], cls._get_versioned_update(args[1])) + args[2:]
+        elif "update" in kwargs:
+            kwargs = dict(
+                kwargs, update=cls._get_versioned_update(kwargs["update"]))
+        return args, kwargs
+
+    @classmethod
+    def _get_versioned_replacement(
+            cls: Type[M],
+            spec: Optional[Dict[str, Any]],
+            replacement: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sets the next version in a replacement that doesn't have one, when
+        the spec matches a single version. Otherwise the document is stored
+        as given, and one without a version is treated like a document
+        saved before the model was versioned.
+        """
+        version_field = cls.VERSION_FIELD
+        if version_field is None or version_field in replacement or \
+                spec is None or version_field not in spec:
+            return replacement
+        version = spec[version_field]
+        if version is not None and (
+                isinstance(version, bool) or not isinstance(version, int)):
+            return replacement
+        return dict(replacement, **{version_field: (version or 0) + 1})
+
     @classmethod
+    def _keep_version(
+            cls: Type[M],
+            projection: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Keeps the VERSION_FIELD in a projection, so that partial versioned
+        documents are written with the version they were loaded with
+        (instead of lazily loading the current one).
+        """
+        if cls.VERSION_FIELD is None or projection is None:
+            return projection
+        projection = dict(projection)
+        if is_inclusion_projection(projection, cls._id_field):
+            projection[cls.VERSION_FIELD] = 1
+            return projection
+        projection.pop(cls.VERSION_FIELD, None)
+        return projection or None
+
+    @classmethod
+    def _get_projection_arguments(
+            cls: Type[M],
+            position: int,
+            args: Tuple[Any, ...],
+            kwargs: Dict[str, Any]) -> _ProjectionArguments:
+        """
+        Finds the projection in pymongo arguments (positional at
+        `position`, or keyword) and returns the arguments with the
+        VERSION_FIELD kept in it, and the projection.
+        """
+        if len(args) > position:
+            projection = cls._keep_version(
+                normalize_projection(args[position]))
+            args = args[:position] + (projection,) + args[position + 1:]
+        elif kwargs.get("projection") is not None:
+            projection = cls._keep_version(
+                normalize_projection(kwargs["projection"]))
+            kwargs = dict(kwargs, projection=projection)
+        else:
+            projection = None
+        return args, kwargs, projection
+
+    # The identity map helpers take the full name of the collection
+    # (`namespace`) when it isn't the model's (synchronous) collection.
+
+    def _remember(self: M, namespace: Optional[str] = None) -> None:
+        """ Adds the instance to the active identity map, if any. """
+        identities = get_identity_map()
+        object_id = self._get_id()
+        if identities is not None and object_id is not None:
+            namespace = namespace or self._get_collection().full_name
+            identities.add(namespace, object_id, self)
+
+    def _forget(self: M, namespace: Optional[str] = None) -> None:
+        """ Removes the instance from the active identity map, if any. """
+        identities = get_identity_map()
+        if identities is not None:
+            namespace = namespace or self._get_collection().full_name
+            identities.discard(namespace, self._get_id())
+
+    def _cache_document(self: M, collection: _AnyCollection) -> None:
+        """ Stores the saved document in the DOCUMENT_CACHE, if any. """
+        cache = self.DOCUMENT_CACHE
+        if cache is None:
+            return
+        if self._projection is not None:
+            # only complete documents are cached
+            cache.delete(collection.full_name, self._get_id())
+        else:
+            cache.set(
+                collection.full_name, self._get_id(),
+                check_none(self._pymongo_data), collection.codec_options)
+
+    @classmethod
+    def _cache_loaded(
+            cls: Type[M],
+            collection: _AnyCollection,
+            document: Document,
+            projection: Optional[Dict[str, Any]]) -> None:
+        """
+        Stores a document returned by the database in the DOCUMENT_CACHE,
+        if any. The document itself is cached, since the instance it loads
+        may be an (already loaded) instance with unsaved changes.
+        """
+        cache = cls.DOCUMENT_CACHE
+        if cache is not None and projection is None:
+            cache.set(
+                collection.full_name, document.get(cls._id_field),
+                document, collection.codec_options)
+
+    def _uncache_document(self: M, namespace: Optional[str] = None) -> None:
+        """ Removes the instance's document from the DOCUMENT_CACHE. """
+        cache = self.DOCUMENT_CACHE
+        if cache is not None:
+            namespace = namespace or self._get_collection().full_name
+            cache.delete(namespace, self._get_id())
+
+    @classmethod
+    def _documents_changed(
+            cls: Type[M], namespace: Optional[str] = None) -> None:
+        """
+        Called after every write to the collection, so that cached query
+        results are not reused.
+        """
+        if caches_enabled():
+            invalidate(namespace or cls._get_collection().full_name)
+
+    @classmethod
+    def _collection_changed(
+            cls: Type[M], namespace: Optional[str] = None) -> None:
+        """
+        Called after writes that may have changed any document in the
+        collection, so that previously loaded instances are not reused.
+        """
+        cls._documents_changed(namespace)
+        if cls.DOCUMENT_CACHE is not None:
+            namespace = namespace or cls._get_collection().full_name
+            cls.DOCUMENT_CACHE.clear(namespace)
+        identities = get_identity_map()
+        if identities is not None:
+            namespace = namespace or cls._get_collection().full_name
+            identities.clear_collection(namespace)
+
+    @classmethod
+    def _get_identity(
+            cls: Type[M],
+            args: Sequence[Any],
+            kwargs: Dict[str, Any],
+            namespace: Optional[str] = None) -> Optional[M]:
+        """
+        Returns the instance from the active identity map when the query
+        only matches on the id.
+        """
+        identities = get_identity_map()
+        if identities is None:
+            return None
+        object_id = cls._get_id_query(args, kwargs)
+        if object_id is None:
+            return None
+        namespace = namespace or cls._get_collection().full_name
+        found = identities.get(namespace, object_id)
+        if isinstance(found, cls):
+            return found
+        return None
+
+    @classmethod
+    def _get_id_query(
+            cls: Type[M],
+            args: Sequence[Any],
+            kwargs: Dict[str, Any]) -> Optional[Any]:
+        """
+        Returns the id when the find_one() arguments only match on the id
+        (and load the complete document), otherwise None.
+        """
+        if kwargs or len(args) != 1:
+            return None
+        spec = args[0]
+        if not isinstance(spec, dict) or list(spec) != [cls._id_field]:
+            return None
+        object_id = spec[cls._id_field]
+        if isinstance(object_id, (dict, list)):
+            return None
+        return object_id
+
+    @classmethod
+    def _get_cached(
+            cls: Type[M],
+            args: Sequence[Any],
+            kwargs: Dict[str, Any],
+            collection: Optional[_AnyCollection] = None) -> Optional[M]:
+        """
+        Returns the instance from the DOCUMENT_CACHE when the query only
+        matches on the id (in the model's collection by default).
+        """
+        cache = cls.DOCUMENT_CACHE
+        if cache is None:
+            return None
+        object_id = cls._get_id_query(args, kwargs)
+        if object_id is None:
+            return None
+        if collection is None:
+            collection = cls._get_collection()
+        document = cache.get(
+            collection.full_name, object_id, collection.codec_options)
+        if document is None:
+            return None
+        for key, value in cls._update_search_spec({}).items():
+            # e.g. a PolyModel's document, but of another child model
+            if document.get(key) != value:
+                return None
+        return cls._load_document(document, None, collection.full_name)
+
+    @classmethod
+    def _find_by_ids(cls: Type[M], ids: Sequence[Any]) -> Dict[Any, M]:
+        """
+        Loads the instances for the ids (with one query), using and
+        filling the DOCUMENT_CACHE if any.
+        """
+        found = {}  # type: Dict[Any, M]
+        missing = ids
+        cache = cls.DOCUMENT_CACHE
+        if cache is not None:
+            missing = []
+            for object_id in ids:
+                cached = cls._get_cached([{cls._id_field: object_id}], {})
+                if cached is None:
+                    missing.append(object_id)
+                else:
+                    found[object_id] = cached
+        if missing:
+            collection = cls._get_collection()
+            query = {cls._id_field: {"$in": list(missing)}}
+            for document in cls.find(query).raw():
+                model = cls._load_document(
+                    document, None, collection.full_name)
+                found[model._get_id()] = model
+                cls._cache_loaded(collection, document, None)
+        return found
+
+    @classmethod
+    @instrumented("save_many")
+    def save_many(
+            cls: Type[M],
+            models: Sequence[M],
+            ordered: bool = False,
+            batch_size: int = 1000) -> List[Any]:
+        """
+        Saves many models with one bulk_write per `batch_size` models. New
+        models are inserted, existing ones are replaced or updated just
+        like save() would. Returns the ids of the models in order.
+        Raises BulkSaveError (after all batches have been attempted, or at
+        the first failing batch if `ordered`) listing the failed models.
+        Models with a VERSION_FIELD are saved one at a time, since bulk
+        writes don't report which updates matched no document.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer.")
+        for model in models:
+            if not isinstance(model, cls):
+                raise TypeError(
+                    "Cannot save {!r} with {}.save_many()".format(
+                        model, cls.__name__))
+        for model in models:
+            model._check_required()
+            if model._get_id() is not None and model._needs_replace():
+                model._check_replaceable()
+        if cls.VERSION_FIELD is not None:
+            return cls._save_each(models, ordered)
+        coll = cls._get_collection()
+        errors = []  # type: List[Tuple[Model, Dict[str, Any]]]
+        for start in range(0, len(models), batch_size):
+            operations = []  # type: List[Any]
+            pending = []  # type: List[Tuple[M, Optional[Dict[str, Any]]]]
+            for model in models[start:start + batch_size]:
+                object_id = model._get_id()
+                if object_id is None:
+                    document = model.copy()
+                    operations.append(InsertOne(document))
+                    pending.append((model, document))
+                    continue
+                spec = {model._id_field: object_id}
+                if model._needs_replace():
+                    operations.append(
+                        ReplaceOne(spec, model.copy(), upsert=True))
+                else:
+                    modifier = model._get_changes()
+                    if not modifier:
+                        model._reset_changes()
+                        continue
+                    operations.append(UpdateOne(spec, modifier))
+                pending.append((model, None))
+            if not operations:
+                continue
+
+            failed = {}  # type: Dict[int, Dict[str, Any]]
+            # with ordered writes nothing after the first error is applied
+            applied = len(pending)
+            try:
+                details = coll.bulk_write(
+                    operations, ordered=ordered
+                ).bulk_api_result  # type: Mapping[str, Any]
+            except BulkWriteError as error:
+                details = error.details
+                for write_error in details.get("writeErrors", []):
+                    failed[write_error["index"]] = write_error
+                if ordered and failed:
+                    applied = min(failed)
+            finally:
+                cls._documents_changed(coll.full_name)
+
+            written = [
+                index for index in range(applied) if index not in failed and
+                not isinstance(operations[index], InsertOne)]
+            if details.get("nMatched", 0) + details.get("nUpserted", 0) < \
+                    len(written):
+                cls._restore_deleted(coll, [
+                    pending[index][0] for index in written
+                    if isinstance(operations[index], UpdateOne)])
+
+            for index, (model, inserted) in enumerate(pending[:applied + 1]):
+                if index in failed:
+                    errors.append((model, failed[index]))
+                elif index < applied:
+                    if inserted is not None:
+                        model[model._id_field] = inserted["_id"]
+                    model._reset_changes()
+                    model._remember()
+                    model._cache_document(coll)
+            if ordered and failed:
+                break
+
+        if errors:
+            raise BulkSaveError(
+                "{} of {} models could not be saved.".format(
+                    len(errors), len(models)),
+                errors)
+        return [model._get_id() for model in models]
+
+    @classmethod
+    def _restore_deleted(
+            cls: Type[M],
+            coll: "Collection[Any]",
+            models: Sequence[M]) -> None:
+        """
+        Inserts the documents of the models whose changes matched nothing
+        in save_many() again (see _needs_restore()).
+        """
+        models = [model for model in models if model._projection is None]
+        if not models:
+            return
+        existing = [
+            document[cls._id_field] for document in coll.find(
+                {cls._id_field: {"$in": [
+                    model._get_id() for model in models]}},
+                {cls._id_field: 1})]
+        for model in models:
+            object_id = model._get_id()
+            if object_id not in existing:
+                coll.replace_one(
+                    {cls._id_field: object_id}, model.copy(), upsert=True)
+
+    @classmethod
+    def _save_each(
+            cls: Type[M], models: Sequence[M], ordered: bool) -> List[Any]:
+        """ save_many() for versioned models """
+        errors = []  # type: List[Tuple[Model, Dict[str, Any]]]
+        for model in models:
+            try:
+                model.save()
+            except VersionConflictError as error:
+                errors.append((model, {"errmsg": str(error), "error": error}))
+            except WriteError as error:
+                errors.append((model, dict(error.details or {})))
+            else:
+                continue
+            if ordered:
+                break
+        if errors:
+            raise BulkSaveError(
+                "{} of {} models could not be saved.".format(
+                    len(errors), len(models)),
+                errors)
+        return [model._get_id() for model in models]
+
+    @classmethod
+    @instrumented("update")
     def _class_update(
             cls: Type[M], *args: Any, **kwargs: Any) -> UpdateResult:
         """ Direct passthru to PyMongo's update. """
@@ -302,25 +1265,51 @@ class Model(metaclass=NewModelClass):
             warn_about_keyword_deprecation("safe")
             del kwargs["safe"]
         coll = cls._get_collection()  # type: Collection[Any]
-        if "multi" in kwargs and kwargs.pop("multi") is True:
-            return coll.update_many(*args, **kwargs)
-        return coll.update_one(*args, **kwargs)
-
+        args, kwargs = cls._get_update_arguments(args, kwargs)
+        try:
+            if "multi" in kwargs and kwargs.pop("multi") is True:
+                return coll.update_many(*args, **kwargs)
+            return coll.update_one(*args, **kwargs)
+        finally:
+            cls._collection_changed()
+
+    @instrumented("update")
     def _instance_update(self: M, **kwargs: Any) -> UpdateResult:
         """ Wraps keyword arguments with setattr and then uses PyMongo's
         update call.
          """
+        version = self._get_next_version()
+        spec, body = self._prepare_instance_update(kwargs)
+        coll = self._get_collection()
+        result = coll.update_one(
+            spec, self._add_version_increment({"$set": body}))
+        self._check_version(result)
+        self._set_version(version)
+        self._documents_changed(coll.full_name)
+        self._uncache_document(coll.full_name)
+        if self._changed_keys is not None:
+            self._changed_keys = self._changed_keys.difference(body)
+        return result
+
+    def _prepare_instance_update(
+            self: M,
+            kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Sets and checks the values, then returns the spec and the $set body
+        for an instance update.
+        """
         object_id = self._get_id()
         if not object_id:
             raise InvalidUpdateCall("Cannot call update on an unsaved model")
-        spec = {self._id_field: object_id}
+        spec = self._get_write_spec()
         if "safe" in kwargs:
             del kwargs["safe"]
             warn_about_keyword_deprecation("safe")
         body = {}
         checks = []
+        schema = self._get_schema()
         for key, value in kwargs.items():
-            if key in self._fields.values():
+            if key in schema:
                 setattr(self, key, value)
             else:
                 logging.warning("No field for {}".format(key))
@@ -330,29 +1319,130 @@ class Model(metaclass=NewModelClass):
             # Field names in collection.
             field = getattr(self.__class__, key)
             field_name = field._get_field_name(self)
+            if field_name == self.VERSION_FIELD:
+                continue
             # setting the body key to the pymongo value
             body[field_name] = self[field_name]
         self._check_required(*checks)
-        coll = self._get_collection()
-        return coll.update_one(spec, {"$set": body})
+        return spec, body
 
     update = BiContextualUpdate()
 
+    # Atomic updates, translating attribute names to the stored keys:
+    # hero.atomic.inc(views=1) sends {"$inc": {"views": 1}} for the hero
+    # and loads the new value, and Hero.atomic.inc({"name": "Mal"},
+    # views=1) updates the matching document (or all of them, with
+    # multi=True).
+    atomic = AtomicAccessor()
+
+    @classmethod
+    def _build_modifier(
+            cls: Type[M],
+            operator: str,
+            kwargs: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Converts the keywords of an atomic update to a modifier on the
+        storage names. Names without a field (e.g. dotted paths) are used
+        as they are.
+        """
+        if not kwargs:
+            raise ValueError(
+                "{} requires at least one field".format(operator))
+        schema = cls._get_schema()
+        fields = {}
+        for key, value in kwargs.items():
+            if isinstance(value, Model):
+                value = value.get_ref()
+            field = schema.get(key)
+            if field is not None:
+                key = field._get_field_name(cls)
+            fields[key] = value
+        return {operator: fields}
+
+    @classmethod
+    @instrumented("update")
+    def _class_modify(
+            cls: Type[M],
+            operator: str,
+            spec: Dict[str, Any],
+            multi: bool = False,
+            **kwargs: Any) -> UpdateResult:
+        """ Runs an atomic update on the documents matching the spec. """
+        modifier = cls._add_version_increment(
+            cls._build_modifier(operator, kwargs))
+        coll = cls._get_collection()  # type: Collection[Any]
+        spec = cls._update_search_spec(dict(spec))
+        try:
+            if multi:
+                return coll.update_many(spec, modifier)
+            return coll.update_one(spec, modifier)
+        finally:
+            cls._collection_changed()
+
+    @instrumented("update")
+    def _instance_modify(
+            self: M, operator: str, **kwargs: Any) -> UpdateResult:
+        """
+        Runs an atomic update on the instance's document, and loads the
+        updated values of the keys it changed (unless they were left out
+        of a partially loaded document, which loads them when read).
+        """
+        if not self._get_id():
+            raise InvalidUpdateCall("Cannot call update on an unsaved model")
+        modifier = self._add_version_increment(
+            self._build_modifier(operator, kwargs))
+        keys = set()
+        for fields in modifier.values():
+            for path in fields:
+                key = path.split(".", 1)[0]
+                if key in self or not self._is_missing(key):
+                    keys.add(key)
+        coll = self._get_collection()  # type: Collection[Any]
+        document = coll.find_one_and_update(
+            self._get_write_spec(), modifier,
+            projection={key: 1 for key in keys} or {self._id_field: 1},
+            return_document=ReturnDocument.AFTER)
+        # shaped like the lastErrorObject of findAndModify
+        result = UpdateResult({
+            "n": int(document is not None),
+            "updatedExisting": document is not None}, acknowledged=True)
+        self._check_version(result)
+        self._documents_changed(coll.full_name)
+        self._uncache_document(coll.full_name)
+        if document is None:
+            return result
+        if isinstance(document, RawBSONDocument):
+            document = decode_raw(document)
+        data = self._get_writable_data()
+        for key in keys:
+            if key in document:
+                data[key] = document[key]
+            else:
+                data.pop(key, None)
+        if self._changed_keys is not None:
+            self._changed_keys = self._changed_keys.difference(keys)
+        return result
+
     def _check_required(self: M, *field_args: str) -> None:
         """ Ensures that all required fields are set. """
-        field_names = list(field_args)  # type: Sequence[str]
-        if not field_names:
-            field_names = list(self._fields.values())
+        schema = self._get_schema()
+        field_names = field_args or tuple(schema)  # type: Sequence[str]
         for field_name in field_names:
             # check that required attributes have been set before,
             # or are currently being set
-            field = cast("Field[Any]", getattr(self.__class__, field_name))
+            field = schema.get(field_name) or cast(
+                "Field[Any]", getattr(self.__class__, field_name))
             storage_name = field._get_field_name(self)
-            if storage_name not in self:
-                if field._is_required():
+            if storage_name in self or self._is_missing(storage_name):
+                # keys left out by a projection are still stored
+                continue
+            if field._is_required():
+                if not field._has_default():
                     raise EmptyRequiredField(
                         "'{}' is required but empty".format(field_name))
+                field._set_default(self, storage_name)
 
+    @instrumented("delete")
     def delete(self: M, *args: Any, **kwargs: Any) -> DeleteResult:
         """
         Uses the id in the collection.remove method.
@@ -361,8 +1451,12 @@ class Model(metaclass=NewModelClass):
         if not self._get_id():
             raise ValueError('No id has been set, so removal is impossible.')
         coll = self._get_collection()
-        return coll.delete_one(
+        result = coll.delete_one(
             {self._id_field: self._get_id()}, *args, **kwargs)
+        self._documents_changed(coll.full_name)
+        self._uncache_document(coll.full_name)
+        self._forget()
+        return result
 
     # Using notinstancemethod for classmethods which would
     # have dire, unintended consequences if used on an
@@ -370,6 +1464,7 @@ class Model(metaclass=NewModelClass):
     # a single document.)
     @notinstancemethod
     @classmethod
+    @instrumented("remove")
     def remove(cls: Type[M], *args: Any, **kwargs: Any) -> DeleteResult:
         """ Just a wrapper around the collection's remove. """
         if not args:
@@ -382,17 +1477,24 @@ class Model(metaclass=NewModelClass):
             raise ValueError(
                 'remove() requires a query when called with keyword arguments')
         coll = cls._get_collection()
-        if "multi" in kwargs and kwargs.pop("multi") is True:
-            return coll.delete_many(*args, **kwargs)
-        else:
-            return coll.delete_one(*args, **kwargs)
+        try:
+            if "multi" in kwargs and kwargs.pop("multi") is True:
+                return coll.delete_many(*args, **kwargs)
+            else:
+                return coll.delete_one(*args, **kwargs)
+        finally:
+            cls._collection_changed()
 
     @notinstancemethod
     @classmethod
+    @instrumented("drop")
     def drop(cls: Type[M], *args: Any, **kwargs: Any) -> Any:
         """ Just a wrapper around the collection's drop. """
         coll = cls._get_collection()
-        return coll.drop(*args, **kwargs)
+        try:
+            return coll.drop(*args, **kwargs)
+        finally:
+            cls._collection_changed()
 
     # This is designed so that the end user can still use 'id' as a Field
     # if desired. All internal use should use model._get_id()
@@ -409,6 +1511,7 @@ class Model(metaclass=NewModelClass):
     _id = id
 
     @classmethod
+    @instrumented("find_one")
     def find_one(cls: Type[M], *args: Any, **kwargs: Any) -> Optional[M]:
         """
         Just a wrapper for collection.find_one(). Uses all
@@ -424,15 +1527,117 @@ class Model(metaclass=NewModelClass):
         if "timeout" in kwargs:
             warn_about_keyword_deprecation("timeout")
             del kwargs["timeout"]
+        identity = cls._get_identity(args, kwargs)
+        if identity is not None:
+            return identity
+        cached = cls._get_cached(args, kwargs)
+        if cached is not None:
+            return cached
         coll = cls._get_collection()  # type: Collection[Any]
+        args, kwargs, projection = cls._get_projection_arguments(
+            1, args, kwargs)
         find_result = coll.find_one(
             *args, **kwargs)  # type: Optional[Dict[str, Any]]
         result = None  # type: Optional[M]
         if find_result is not None:
-            result = cls(**find_result)
+            result = cls.from_document(find_result, projection)
+            cls._cache_loaded(coll, find_result, projection)
         return result
 
     @classmethod
+    @instrumented("find_one_and_update")
+    def find_one_and_update(
+            cls: Type[M],
+            spec: Optional[Dict[str, Any]],
+            update: Dict[str, Any],
+            *args: Any,
+            **kwargs: Any) -> Optional[M]:
+        """
+        Wrapper for collection.find_one_and_update(), returning the
+        document as it was before the update (or after it, with
+        return_document=ReturnDocument.AFTER) as a model.
+        """
+        update = cls._get_versioned_update(update)
+        return cls._find_and_modify(
+            "find_one_and_update", spec, (update,) + args, kwargs)
+
+    @classmethod
+    @instrumented("find_one_and_replace")
+    def find_one_and_replace(
+            cls: Type[M],
+            spec: Optional[Dict[str, Any]],
+            replacement: Dict[str, Any],
+            *args: Any,
+            **kwargs: Any) -> Optional[M]:
+        """
+        Wrapper for collection.find_one_and_replace(), returning the
+        document as it was before the replacement (or after it, with
+        return_document=ReturnDocument.AFTER) as a model.
+        """
+        replacement = cls._get_versioned_replacement(spec, replacement)
+        return cls._find_and_modify(
+            "find_one_and_replace", spec, (replacement,) + args, kwargs)
+
+    @classmethod
+    @instrumented("find_one_and_delete")
+    def find_one_and_delete(
+            cls: Type[M],
+            spec: Optional[Dict[str, Any]],
+            *args: Any,
+            **kwargs: Any) -> Optional[M]:
+        """
+        Wrapper for collection.find_one_and_delete(), returning the deleted
+        document as a model.
+        """
+        return cls._find_and_modify("find_one_and_delete", spec, args, kwargs)
+
+    @classmethod
+    def _find_and_modify(
+            cls: Type[M],
+            method: str,
+            spec: Optional[Dict[str, Any]],
+            args: Tuple[Any, ...],
+            kwargs: Dict[str, Any],
+            inserted_id: Optional[Any] = None) -> Optional[M]:
+        """
+        Runs one of the collection's find_one_and_*() methods. When only
+        `inserted_id` may have been written (see search_or_create()),
+        returning another document doesn't count as a write.
+        """
+        coll = cls._get_collection()  # type: Collection[Any]
+        spec = cls._update_search_spec(dict(spec or {}))
+        # the projection follows the update / replacement, if any
+        position = 0 if method == "find_one_and_delete" else 1
+        args, kwargs, projection = cls._get_projection_arguments(
+            position, args, kwargs)
+        document = getattr(coll, method)(
+            spec, *args, **kwargs)  # type: Optional[Dict[str, Any]]
+        object_id = None
+        if document is not None:
+            object_id = document.get(cls._id_field)
+        written = inserted_id is None or object_id == inserted_id
+        if written:
+            cls._documents_changed(coll.full_name)
+        if document is None:
+            return None
+
+        current = method != "find_one_and_delete" and bool(
+            kwargs.get("return_document"))
+        if written:
+            identities = get_identity_map()
+            if identities is not None:
+                identities.discard(coll.full_name, object_id)
+            if cls.DOCUMENT_CACHE is not None:
+                cls.DOCUMENT_CACHE.delete(coll.full_name, object_id)
+        if not current:
+            # the document is not in the database anymore (as returned)
+            return cls._hydrate(document, projection)
+        if written:
+            cls._cache_loaded(coll, document, projection)
+        return cls._load_document(document, projection, coll.full_name)
+
+    @classmethod
+    @instrumented("find")
     def find(cls: Type[M], *args: Any, **kwargs: Any) -> Cursor[M]:
         """
         A wrapper for the pymongo cursor. Uses all the
@@ -453,18 +1658,61 @@ class Model(metaclass=NewModelClass):
 
     @notinstancemethod
     @classmethod
+    @instrumented("aggregate")
     def aggregate(
             cls: Type[M],
             pipeline: Sequence[Dict[str, Any]],
             **kwargs: Any) -> Iterator[Document]:
         return cls._get_collection().aggregate(pipeline, **kwargs)
 
+    @typing.overload  # noqa: F811
+    @classmethod
+    def parallel_scan(  # noqa: F811
+        cls: Type[M], spec: Optional[Dict[str, Any]] = None,
+        workers: int = 4, executor: str = "thread",
+        callback: None = None,
+        batch_size: int = 1000) -> Iterator[M]: ...
+
+    @typing.overload  # noqa: F811
+    @classmethod
+    def parallel_scan(  # noqa: F811
+        cls: Type[M], spec: Optional[Dict[str, Any]] = None,
+        workers: int = 4, executor: str = "thread", *,
+        callback: Callable[[List[M]], R],
+        batch_size: int = 1000) -> Iterator[R]: ...
+
+    @classmethod  # noqa: F811
+    def parallel_scan(  # noqa: F811
+            cls: Type[M],
+            spec: Optional[Dict[str, Any]] = None,
+            workers: int = 4,
+            executor: str = "thread",
+            callback: Optional[Callable[[List[M]], R]] = None,
+            batch_size: int = 1000) -> Union[Iterator[M], Iterator[R]]:
+        """
+        Scans the documents matching the spec with `workers` cursors in
+        parallel, each reading its own range of ids. Yields the models (in
+        no particular order), or with a callback, calls it with each batch
+        of models and yields its results instead. The "process" executor
+        requires a callback, and both it and the model must be picklable.
+        """
+        from mogo.parallel import parallel_scan
+        return parallel_scan(
+            cls, spec, workers, executor, callback, batch_size)
+
     @classmethod
+    @instrumented("search")
     def search(cls: Type[M], **kwargs: Any) -> Cursor[M]:
         """
         Helper method that wraps keywords to dict and automatically
         turns instances into DBRefs.
         """
+        return cls.find(cls._build_search_spec(kwargs))
+
+    @classmethod
+    def _build_search_spec(
+            cls: Type[M], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """ Converts search() keywords to a query on the storage names """
         query = {}
         for key, value in kwargs.items():
             if isinstance(value, Model):
@@ -476,24 +1724,66 @@ class Model(metaclass=NewModelClass):
                 key = field._get_field_name(cls)
 
             query[key] = value
-        return cls.find(query)
+        return query
 
     @classmethod
+    @instrumented("search_or_create")
     def search_or_create(cls: Type[M], **kwargs: Any) -> M:
-        "search for an instance that matches kwargs or make one with __init__"
-        cursor = cls.search(**kwargs)  # type: Cursor[M]
-        obj = cursor.first()  # type: Optional[M]
-        if obj is not None:
-            return obj
-        return cls.create(**kwargs)
+        """
+        Returns the instance matching the keywords (as in search()), or
+        creates it like create() does, in a single upsert. The new
+        document (with its defaults) is only written by $setOnInsert, so
+        an existing document is left unchanged. Concurrent calls can only
+        create duplicates when the keywords aren't covered by a unique
+        index. Keywords that don't make a valid model (e.g. a lookup on
+        some of the required fields, or on an element of a list) are
+        searched first, and only validated if nothing matches. So are the
+        keywords of models overriding save() or create(), which are still
+        called to create the model.
+        """
+        model = None  # type: Optional[M]
+        if not cls._overrides_saving():
+            try:
+                if hasattr(cls, "new"):
+                    model = cls.new(**kwargs)
+                else:
+                    model = cls(**kwargs)
+                check_none(model)._check_required()
+            except (EmptyRequiredField, TypeError, ValueError):
+                model = None
+        if model is None:
+            found = cls.search(**kwargs).first()  # type: Optional[M]
+            if found is not None:
+                return found
+            return cls.create(**kwargs)
+        document = model._get_versioned_copy(model._get_next_version())
+        if model._get_id() is None:
+            # generated here to tell whether the document was inserted
+            document[cls._id_field] = ObjectId()
+        result = cls._find_and_modify(
+            "find_one_and_update",
+            cls._build_search_spec(kwargs),
+            ({"$setOnInsert": document},),
+            {"upsert": True, "return_document": ReturnDocument.AFTER},
+            inserted_id=document[cls._id_field])
+        return check_none(result)
 
     @classmethod
+    def _overrides_saving(cls: Type[M]) -> bool:
+        """ Whether the class overrides the save() or create() methods. """
+        return cls.save is not Model.save or \
+            getattr(cls.create, "__func__") is not \
+            getattr(Model.create, "__func__")
+
+    @classmethod
+    @instrumented("first")
     def first(cls: Type[M], **kwargs: Any) -> Optional[M]:
         """ Helper for returning Blah.search(foo=bar).first(). """
         result = cls.search(**kwargs)  # type: Cursor[M]
         return result.first()
 
     @classmethod
+    @instrumented("grab")
     def grab(cls: Type[M], object_id: Any) -> Optional[M]:
         """ A shortcut to retrieve one object by its id. """
         if not isinstance(object_id, cls._id_type):
@@ -516,6 +1806,7 @@ class Model(metaclass=NewModelClass):
         return cls._get_collection().drop_indexes(*args, **kwargs)
 
     @classmethod
+    @instrumented("distinct")
     def distinct(cls: Type[M], key: str) -> list[Any]:
         """ Wrapper for collection distinct() """
         return cls.find().distinct(key)
@@ -527,10 +1818,15 @@ class Model(metaclass=NewModelClass):
         """ Connects and caches the collection connection object. """
         if cls._collection is not None:
             # Use collection provided by Session, if available.
-            return cls._collection
-
-        conn = Connection.instance()
-        return conn.get_collection(cls._get_name())
+            collection = cls._collection
+        else:
+            conn = Connection.instance()
+            collection = conn.get_collection(cls._get_name())
+        if cls.LAZY_DECODING:
+            codec_options = collection.codec_options.with_options(
+                document_class=RawBSONDocument)
+            return collection.with_options(codec_options=codec_options)
+        return collection
 
     @classmethod
     def _get_name(cls: Type[M]) -> str:
@@ -566,11 +1862,13 @@ class Model(metaclass=NewModelClass):
 
     # Friendly wrappers around collection
     @classmethod
+    @instrumented("count")
     def count(cls: Type[M]) -> int:
         return cls.find().count()
 
     @notinstancemethod
     @classmethod
+    @instrumented("count_documents")
     def count_documents(
             cls: Type[M],
             filter: Dict[str, Any],
@@ -614,21 +1912,34 @@ class PolyModel(Model):
 
     def __new__(cls: Type[P], **kwargs: Any) -> P:
         """ Creates a model of the appropriate type """
+        return super().__new__(cls._get_model_class(kwargs))
+
+    @classmethod
+    def _get_model_class(cls: Type[P], document: Document) -> Type[P]:
+        """ Looks up the registered child class for the document """
         # use the base model by default
         create_class = cls
         key_field = getattr(cls, cls.get_child_key(), None)
-        key = kwargs.get(cls.get_child_key())
+        key = document.get(cls.get_child_key())
         if cls._child_models is not None:
             if not key and key_field:
                 key = key_field._get_default()
             if key in cls._child_models:
                 create_class = cast(Type[P], cls._child_models[key])
-        return super().__new__(create_class)
+        return create_class
 
     @classmethod
     def get_child_key(cls: Type[P]) -> str:
         raise NotImplementedError("`get_child_key() -> str` not implemented.")
 
+    def _apply_defaults(self: P) -> None:
+        super()._apply_defaults()
+        # the child key is always stored, so that the document is loaded
+        # as the same class
+        field = self._get_schema().get(self.get_child_key())
+        if field is not None:
+            field._set_default(self, field._get_field_name(self))
+
     # the following need double noqa: comments because Flake8 performs the
     # check at different levels depending on the version of Python...
 
@@ -700,6 +2011,12 @@ class PolyModel(Model):
             *args: Any,
             **kwargs: Any) -> Optional[P]:
         """ Add key to search params for single result """
+        identity = cls._get_identity((spec,) + args, kwargs)
+        if identity is not None:
+            return identity
+        cached = cls._get_cached((spec,) + args, kwargs)
+        if cached is not None:
+            return cached
         spec = cls._update_search_spec(spec)
         return super().find_one(spec, *args, **kwargs)
 
@@ -743,4 +2060,9 @@ def warn_about_keyword_deprecation(keyword: str) -> None:
         DeprecationWarning)
 
 
+if typing.TYPE_CHECKING:
+    from mogo.aio import AsyncInstanceManager, AsyncModelManager  # noqa: F401
+    from pymongo.asynchronous.collection import AsyncCollection  # noqa: F401
+
+
 __all__ = ["Model", "PolyModel"]
@@ -0,0 +1,226 @@
+"""
+Parallel full collection scans (see Model.parallel_scan). The documents
+matching a query are split into `_id` ranges by sampling the collection,
+and each range is read by its own cursor on a thread or process pool.
+"""
+
+from concurrent.futures import as_completed, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import queue
+import threading
+
+from mogo.connection import Connection
+
+from pymongo.collection import Collection
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from typing import Type, TypeVar, TYPE_CHECKING, Union
+
+
+M = TypeVar("M", bound="Model")
+R = TypeVar("R")
+
+# sampled ids per range, to even out the size of the ranges
+SAMPLES_PER_RANGE = 20
+
+EXECUTORS = ("thread", "process")
+
+
+def split_ranges(
+        collection: "Collection[Any]",
+        spec: Dict[str, Any],
+        count: int,
+        id_field: str = "_id") -> List[Dict[str, Any]]:
+    """
+    Returns up to `count` queries on consecutive id ranges that together
+    cover the documents matching the spec. Ids are only compared with ids
+    of the same type, so the last range also holds the ids of other types
+    than the sampled ones.
+    """
+    if count < 2:
+        return [spec]
+    pipeline = [
+        {"$match": spec},
+        {"$sample": {"size": count * SAMPLES_PER_RANGE}},
+        {"$project": {id_field: 1}},
+    ]
+    try:
+        ids = sorted({
+            document[id_field] for document in collection.aggregate(pipeline)})
+    except TypeError:
+        # ids of different types can't be split by sorting them
+        return [spec]
+    bounds = sorted({ids[len(ids) * index // count] for index in range(
+        1, count)}) if ids else []
+    ranges = []  # type: List[Dict[str, Any]]
+    lower = None  # type: Any
+    for bound in bounds + [None]:
+        id_range = {}  # type: Dict[str, Any]
+        if bound is None:
+            if lower is not None:
+                id_range["$not"] = {"$lt": lower}
+        else:
+            if lower is not None:
+                id_range["$gte"] = lower
+            id_range["$lt"] = bound
+        predicate = {id_field: id_range} if id_range else {}
+        if spec and predicate:
+            ranges.append({"$and": [spec, predicate]})
+        else:
+            ranges.append(spec or predicate)
+        lower = bound
+    return ranges
+
+
+def _batches(models: Iterable[M], batch_size: int) -> Iterator[List[M]]:
+    iterator = iter(models)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class _Failure(object):
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+_FINISHED = object()
+
+
+def scan_threads(
+        model: Type[M],
+        ranges: List[Dict[str, Any]],
+        workers: int,
+        batch_size: int,
+        callback: Optional[Callable[[List[M]], Any]] = None) -> Iterator[Any]:
+    """
+    Reads the ranges on a thread pool, yielding each batch of models (or
+    the callback's result for it) as soon as it is available.
+    """
+    results = queue.Queue(maxsize=workers * 2)  # type: queue.Queue[Any]
+    stopped = threading.Event()
+
+    def put(item: Any) -> None:
+        # gives up once the consumer is gone, so workers can't block
+        while not stopped.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def scan(spec: Dict[str, Any]) -> None:
+        try:
+            for batch in _batches(model.find(spec), batch_size):
+                if stopped.is_set():
+                    return
+                put(batch if callback is None else callback(batch))
+        except BaseException as error:
+            put(_Failure(error))
+        finally:
+            put(_FINISHED)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for spec in ranges:
+            executor.submit(scan, spec)
+        remaining = len(ranges)
+        while remaining:
+            item = results.get()
+            if item is _FINISHED:
+                remaining -= 1
+            elif isinstance(item, _Failure):
+                raise item.error
+            else:
+                yield item
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True)
+
+
+def _connect_worker(database: str, uri: str, kwargs: Dict[str, Any]) -> None:
+    """ Replaces the connection inherited by (or missing in) a process """
+    Connection.connect(database, uri, **kwargs)
+
+
+def _scan_range(
+        model: Type[M],
+        spec: Dict[str, Any],
+        batch_size: int,
+        callback: Callable[[List[M]], R]) -> List[R]:
+    return [
+        callback(batch) for batch in _batches(model.find(spec), batch_size)]
+
+
+def scan_processes(
+        model: Type[M],
+        ranges: List[Dict[str, Any]],
+        workers: int,
+        batch_size: int,
+        callback: Callable[[List[M]], R]) -> Iterator[R]:
+    """
+    Reads the ranges on a process pool, each process with its own
+    connection, yielding the callback's results for each range as soon as
+    the range is done. The model and callback must be picklable.
+    """
+    connect_args = Connection.instance()._connect_args
+    assert connect_args is not None
+    initializer = _connect_worker  # type: Callable[..., None]
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=initializer,
+            initargs=connect_args) as executor:
+        futures = [
+            executor.submit(_scan_range, model, spec, batch_size, callback)
+            for spec in ranges]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def parallel_scan(
+        model: Type[M],
+        spec: Optional[Dict[str, Any]] = None,
+        workers: int = 4,
+        executor: str = "thread",
+        callback: Optional[Callable[[List[M]], R]] = None,
+        batch_size: int = 1000) -> Union[Iterator[M], Iterator[R]]:
+    """ The implementation of Model.parallel_scan() """
+    if executor not in EXECUTORS:
+        raise ValueError("executor must be one of {}.".format(EXECUTORS))
+    if workers < 1 or batch_size < 1:
+        raise ValueError("workers and batch_size must be positive integers.")
+    # PolyModels scan (and sample) their own documents only
+    spec = model._update_search_spec(dict(spec or {}))
+    ranges = split_ranges(
+        model._get_collection(), spec, workers, model._id_field)
+    if executor == "process":
+        if callback is None:
+            raise ValueError("Process scans require a callback.")
+        if Connection.instance()._connect_args is None:
+            raise ValueError(
+                "Process scans require a server connection from "
+                "mogo.connect().")
+        if model._collection is not None:
+            raise ValueError("Process scans cannot use session models.")
+        return scan_processes(model, ranges, workers, batch_size, callback)
+    if callback is None:
+        return (
+            instance for batch in scan_threads(
+                model, ranges, workers, batch_size)
+            for instance in batch)
+    return scan_threads(model, ranges, workers, batch_size, callback)
+
+
+if TYPE_CHECKING:
+    from mogo.model import Model  # noqa: F401
+
+
+__all__ = ["parallel_scan", "split_ranges"]
@@ -0,0 +1,226 @@
+"""
+Optional counters for the time spent in mogo itself (rather than in the
+driver), per model class and field:
+
+mogo.profiling.enable()
+...
+mogo.stats()
+# {("Hero", "name", "set"): {"calls": 1000, "total_ms": 1.9}, ...}
+mogo.reset_stats()
+mogo.profiling.disable()
+
+Model.__init__, PolyModel.__new__, Field.__get__ and Field.__set__ are
+timed, as well as the get, set and coerce callbacks of the fields, and
+the loading of documents returned by the database: Model.from_document
+and Model._hydrate (which builds the instances of every loading path,
+from_document included). The timings are inclusive: a field's "get"
+includes its "get_callback", and "__init__" includes setting the
+fields. enable() replaces the methods
+with timed versions and disable() restores them, so mogo is unchanged
+while profiling is disabled.
+"""
+
+from time import perf_counter_ns
+
+from mogo.field import Field
+from mogo.model import Model, PolyModel
+
+from typing import Any, Callable, cast, Dict, Iterator, Optional, Tuple
+from typing import Type
+from typing import List  # noqa: F401
+
+
+# (model name, field name or None, operation)
+_StatsKey = Tuple[str, Optional[str], str]
+
+# [calls, nanoseconds] by key
+_counters = {}  # type: Dict[_StatsKey, List[int]]
+# the original class attributes replaced by enable()
+_originals = {}  # type: Dict[Tuple[type, str], Any]
+
+
+def _record(key: _StatsKey, started: int) -> None:
+    elapsed = perf_counter_ns() - started
+    counter = _counters.get(key)
+    if counter is None:
+        counter = _counters[key] = [0, 0]
+    counter[0] += 1
+    counter[1] += elapsed
+
+
+def _field_name(field: Field[Any], instance: Model) -> str:
+    return field._bound_name or field._get_field_name(instance)
+
+
+def _profile_get(original: Callable[..., Any]) -> Callable[..., Any]:
+    def __get__(
+            self: Field[Any],
+            instance: Optional[Model],
+            klass: Optional[Type[Model]] = None) -> Any:
+        if instance is None:
+            return original(self, instance, klass)
+        started = perf_counter_ns()
+        try:
+            return original(self, instance, klass)
+        finally:
+            _record((
+                type(instance).__name__, _field_name(self, instance), "get"),
+                started)
+    return __get__
+
+
+def _profile_set(original: Callable[..., Any]) -> Callable[..., Any]:
+    def __set__(self: Field[Any], instance: Model, value: Any) -> None:
+        started = perf_counter_ns()
+        try:
+            original(self, instance, value)
+        finally:
+            _record((
+                type(instance).__name__, _field_name(self, instance), "set"),
+                started)
+    return __set__
+
+
+def _profile_get_callback(
+        original: Callable[..., Any]) -> Callable[..., Any]:
+    def get_callback(
+            self: Field[Any], instance: Model, value: Any) -> Any:
+        started = perf_counter_ns()
+        try:
+            return original(self, instance, value)
+        finally:
+            _record((
+                type(instance).__name__, _field_name(self, instance),
+                "get_callback"), started)
+    return get_callback
+
+
+def _profile_compile_setter(
+        original: Callable[..., Any]) -> Callable[..., Any]:
+    def _compile_setter(
+            self: Field[Any],
+            field_name: str) -> Callable[[Model, Any], None]:
+        """ Mirrors Field._compile_setter, timing the callbacks """
+        value_type = self.value_type
+        coerce_callback, set_callback = self._get_setter_callbacks()
+        check_value_type = self._check_value_type
+        name = self._bound_name or field_name
+
+        def setter(instance: Model, value: Any) -> None:
+            model_name = type(instance).__name__
+            if value is not None and value_type is not None and \
+                    not isinstance(value, value_type):
+                started = perf_counter_ns()
+                value = coerce_callback(value)
+                _record((model_name, name, "coerce_callback"), started)
+                check_value_type(value, field_name)
+            if set_callback is not None:
+                started = perf_counter_ns()
+                value = set_callback(instance, value)
+                _record((model_name, name, "set_callback"), started)
+            instance[field_name] = value
+
+        return setter
+    return _compile_setter
+
+
+def _profile_init(original: Callable[..., Any]) -> Callable[..., Any]:
+    def __init__(self: Model, **kwargs: Any) -> None:
+        started = perf_counter_ns()
+        try:
+            original(self, **kwargs)
+        finally:
+            _record((type(self).__name__, None, "__init__"), started)
+    return __init__
+
+
+def _profile_new(original: Callable[..., Any]) -> Callable[..., Any]:
+    def __new__(cls: Type[PolyModel], **kwargs: Any) -> PolyModel:
+        started = perf_counter_ns()
+        try:
+            return cast(PolyModel, original(cls, **kwargs))
+        finally:
+            _record((cls.__name__, None, "__new__"), started)
+    return __new__
+
+
+def _profile_load(original: Callable[..., Any]) -> Callable[..., Any]:
+    def load(cls: Type[Model], *args: Any) -> Model:
+        started = perf_counter_ns()
+        try:
+            return cast(Model, original(cls, *args))
+        finally:
+            _record((cls.__name__, None, original.__name__), started)
+    load.__name__ = original.__name__
+    return load
+
+
+_PATCHES = [
+    (Field, "__get__", _profile_get),
+    (Field, "__set__", _profile_set),
+    (Field, "get_callback", _profile_get_callback),
+    (Field, "_compile_setter", _profile_compile_setter),
+    (Model, "__init__", _profile_init),
+    (PolyModel, "__new__", _profile_new),
+    (Model, "from_document", _profile_load),
+    (Model, "_hydrate", _profile_load),
+]  # type: List[Tuple[type, str, Callable[[Callable[..., Any]], Any]]]
+
+
+def _model_classes(model: Type[Model] = Model) -> Iterator[Type[Model]]:
+    yield model
+    for subclass in model.__subclasses__():
+        yield from _model_classes(subclass)
+
+
+def _reset_setters() -> None:
+    """ Recompiles the field setters (with or without timing) """
+    for model in _model_classes():
+        for value in vars(model).values():
+            if isinstance(value, Field):
+                value._reset_setter()
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    """ Starts timing mogo's methods and callbacks. """
+    if is_enabled():
+        return
+    for owner, name, profile in _PATCHES:
+        original = vars(owner)[name]
+        _originals[(owner, name)] = original
+        if isinstance(original, classmethod):
+            setattr(owner, name, classmethod(profile(original.__func__)))
+            continue
+        if isinstance(original, staticmethod):
+            original = original.__func__
+        setattr(owner, name, profile(original))
+    _reset_setters()
+
+
+def disable() -> None:
+    """ Restores the original methods. The counters are kept. """
+    for (owner, name), original in _originals.items():
+        setattr(owner, name, original)
+    _originals.clear()
+    _reset_setters()
+
+
+def stats() -> Dict[_StatsKey, Dict[str, Any]]:
+    """
+    A snapshot of the calls and total time (in milliseconds) by model name,
+    field name (None for the model methods) and operation.
+    """
+    return {
+        key: {"calls": calls, "total_ms": nanoseconds / 1e6}
+        for key, (calls, nanoseconds) in list(_counters.items())}
+
+
+def reset_stats() -> None:
+    _counters.clear()
+
+
+__all__ = ["stats", "reset_stats"]
@@ -0,0 +1,521 @@
+"""
+Applies MongoDB update documents ($set, $inc, $push, ...) to local
+documents, as the server would, for MemoryClient (see mogo.memory). It
+also has the BSON ordering and the query matching that $push's $sort and
+$pull need.
+"""
+
+import datetime
+import re
+
+import bson
+from bson.objectid import ObjectId
+from bson.regex import Regex
+from pymongo.errors import WriteError
+
+from mogo.helpers import get_bson_type
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping
+from typing import Optional, Tuple
+
+
+Document = Dict[str, Any]
+SortSpec = List[Tuple[str, int]]
+
+# the sort order of the BSON types
+_NULL, _NUMBER, _STRING, _OBJECT, _ARRAY, _BINARY, _OBJECT_ID, _BOOLEAN, \
+    _DATE, _OTHER = range(1, 11)
+
+# the $type aliases of the BSON type codes
+_TYPE_CODES = {
+    1: "double", 2: "string", 3: "object", 4: "array", 5: "binData",
+    7: "objectId", 8: "bool", 9: "date", 10: "null", 11: "regex",
+    14: "symbol", 16: "int", 17: "timestamp", 18: "long", 19: "decimal",
+    -1: "minKey", 127: "maxKey"}  # type: Dict[int, str]
+_NUMBER_TYPES = ("double", "int", "long", "decimal")
+
+
+def _normalize(value: Any) -> Any:
+    """ Converts a value to what the server would store (and validates it) """
+    return bson.decode(bson.encode({"v": value}))["v"]
+
+
+def _lookup(document: Any, path: str) -> List[Any]:
+    """ The values at a dotted path, descending into arrays """
+    values = [document]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                found.extend(
+                    item[part] for item in value
+                    if isinstance(item, dict) and part in item)
+        values = found
+    return values
+
+
+def _expand(values: Iterable[Any]) -> Iterator[Any]:
+    """ The values, and the items of the values that are arrays """
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def _type_order(value: Any) -> int:
+    if value is None:
+        return _NULL
+    if isinstance(value, bool):
+        return _BOOLEAN
+    if isinstance(value, (int, float)):
+        return _NUMBER
+    if isinstance(value, str):
+        return _STRING
+    if isinstance(value, dict):
+        return _OBJECT
+    if isinstance(value, list):
+        return _ARRAY
+    if isinstance(value, bytes):
+        return _BINARY
+    if isinstance(value, ObjectId):
+        return _OBJECT_ID
+    if isinstance(value, datetime.datetime):
+        return _DATE
+    return _OTHER
+
+
+def _sort_value(value: Any, collation: Optional[Document] = None) -> Any:
+    """
+    A key sorting values by type, then value. A collation (other than
+    "simple") approximates a locale's order for strings: case insensitive,
+    with lower case first unless the strength is below 3.
+    """
+    order = _type_order(value)
+    if order in (_NULL, _OBJECT, _OTHER):
+        return (order, bson.encode({"v": value}) if order != _NULL else 0)
+    if order == _ARRAY:
+        return (order, [_sort_value(item, collation) for item in value])
+    if order == _STRING and collation is not None and \
+            collation.get("locale", "simple") != "simple":
+        if collation.get("strength", 3) < 3:
+            return (order, value.casefold())
+        return (order, value.casefold(), value.swapcase())
+    return (order, value)
+
+
+def _compare(value: Any, other: Any) -> Optional[int]:
+    """ Compares values of the same BSON type, or returns None """
+    if _type_order(value) != _type_order(other):
+        return None
+    first, second = _sort_value(value), _sort_value(other)
+    return int(first > second) - int(first < second)
+
+
+def _equal(value: Any, other: Any) -> bool:
+    return _type_order(value) == _type_order(other) and bool(value == other)
+
+
+def _is_regex(value: Any) -> bool:
+    return isinstance(value, (Regex, re.Pattern))
+
+
+def _regex_matches(pattern: Any, values: Iterable[Any]) -> bool:
+    if isinstance(pattern, Regex):
+        pattern = pattern.try_compile()
+    return any(
+        isinstance(value, str) and pattern.search(value) is not None
+        for value in _expand(values))
+
+
+def _is_operator_document(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(
+        key.startswith("$") for key in condition)
+
+
+def _match_equal(values: List[Any], condition: Any) -> bool:
+    if _is_regex(condition):
+        return _regex_matches(condition, values)
+    if condition is None and not values:
+        # null matches missing fields
+        return True
+    return any(_equal(value, condition) for value in _expand(values))
+
+
+def _match_comparison(
+        values: List[Any],
+        condition: Any,
+        accept: Callable[[int], bool]) -> bool:
+    for value in _expand(values):
+        result = _compare(value, condition)
+        if result is not None and accept(result):
+            return True
+    return False
+
+
+def _match_element(item: Any, condition: Document) -> bool:
+    if _is_operator_document(condition):
+        return _match_condition([item], condition)
+    return isinstance(item, dict) and _matches(item, condition)
+
+
+def _match_operator(
+        values: List[Any],
+        operator: str,
+        argument: Any,
+        condition: Document) -> bool:
+    if operator == "$eq":
+        return _match_equal(values, argument)
+    if operator == "$ne":
+        return not _match_equal(values, argument)
+    if operator == "$gt":
+        return _match_comparison(values, argument, lambda result: result > 0)
+    if operator == "$gte":
+        return _match_comparison(values, argument, lambda result: result >= 0)
+    if operator == "$lt":
+        return _match_comparison(values, argument, lambda result: result < 0)
+    if operator == "$lte":
+        return _match_comparison(values, argument, lambda result: result <= 0)
+    if operator == "$in":
+        return any(_match_equal(values, item) for item in argument)
+    if operator == "$nin":
+        return not any(_match_equal(values, item) for item in argument)
+    if operator == "$exists":
+        return bool(values) == bool(argument)
+    if operator == "$regex":
+        flags = 0
+        for option in condition.get("$options", ""):
+            flags |= {"i": re.I, "m": re.M, "s": re.S, "x": re.X}[option]
+        if isinstance(argument, Regex):
+            argument = argument.pattern
+        if isinstance(argument, re.Pattern):
+            flags |= argument.flags
+            argument = argument.pattern
+        return _regex_matches(re.compile(argument, flags), values)
+    if operator == "$options":
+        # handled by $regex
+        return True
+    if operator == "$all":
+        return bool(argument) and all(
+            _match_element(item, item["$elemMatch"])
+            if isinstance(item, dict) and "$elemMatch" in item
+            else any(
+                _match_equal([value], item) for value in _expand(values))
+            for item in argument)
+    if operator == "$size":
+        return any(
+            isinstance(value, list) and len(value) == argument
+            for value in values)
+    if operator == "$elemMatch":
+        return any(
+            isinstance(value, list) and any(
+                _match_element(item, argument) for item in value)
+            for value in values)
+    if operator == "$mod":
+        divisor, remainder = argument
+        return any(
+            _type_order(value) == _NUMBER and
+            int(value) % divisor == remainder
+            for value in _expand(values))
+    if operator == "$type":
+        aliases = argument if isinstance(argument, list) else [argument]
+        names = []  # type: List[Any]
+        for alias in aliases:
+            alias = _TYPE_CODES.get(alias, alias)
+            names.extend(_NUMBER_TYPES if alias == "number" else [alias])
+        return any(
+            get_bson_type(value) in names for value in _expand(values))
+    if operator == "$not":
+        if _is_regex(argument):
+            return not _regex_matches(argument, values)
+        return not _match_condition(values, argument)
+    raise NotImplementedError(
+        "The in-memory collection doesn't support {}.".format(operator))
+
+
+def _match_condition(values: List[Any], condition: Any) -> bool:
+    """ Whether the values at a path match the query's condition """
+    if _is_operator_document(condition):
+        return all(
+            _match_operator(values, operator, argument, condition)
+            for operator, argument in condition.items())
+    return _match_equal(values, condition)
+
+
+def _matches(document: Document, query: Mapping[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(_matches(document, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(document, clause) for clause in condition):
+                return False
+        elif key == "$nor":
+            if any(_matches(document, clause) for clause in condition):
+                return False
+        elif key == "$comment":
+            continue
+        elif key.startswith("$"):
+            raise NotImplementedError(
+                "The in-memory collection doesn't support {}.".format(key))
+        elif not _match_condition(_lookup(document, key), condition):
+            return False
+    return True
+
+
+def _sort_key(
+        path: str,
+        direction: int,
+        collation: Optional[Document]) -> Callable[[Document], Any]:
+    def key(document: Document) -> Any:
+        values = _lookup(document, path)
+        if not values:
+            return _sort_value(None)
+        value = values[0]
+        if isinstance(value, list) and value:
+            # arrays sort by their smallest (or largest) item
+            items = [_sort_value(item, collation) for item in value]
+            return min(items) if direction > 0 else max(items)
+        return _sort_value(value, collation)
+    return key
+
+
+def _sort(
+        items: List[Any],
+        sort: SortSpec,
+        get_document: Callable[[Any], Document] = lambda item: item,
+        collation: Optional[Document] = None) -> None:
+    for path, direction in reversed(sort):
+        if direction not in (1, -1):
+            raise NotImplementedError(
+                "The in-memory collection only sorts by 1 or -1.")
+        key = _sort_key(path, direction, collation)
+        items.sort(
+            key=lambda item: key(get_document(item)), reverse=direction < 0)
+
+
+# Updates
+
+
+class _Missing(object):
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+_MISSING = _Missing()
+
+
+def _write_error(message: str, code: int) -> WriteError:
+    return WriteError(message, code, {"errmsg": message, "code": code})
+
+
+def _child(container: Any, part: str) -> Any:
+    """ The value of a document's key or an array's index """
+    if isinstance(container, dict):
+        return container.get(part, _MISSING)
+    if isinstance(container, list) and part.isdigit() and \
+            int(part) < len(container):
+        return container[int(part)]
+    return _MISSING
+
+
+def _put(container: Any, part: str, value: Any) -> None:
+    if isinstance(container, list):
+        if not part.isdigit():
+            raise _write_error(
+                "Cannot create field {!r} in an array".format(part), 28)
+        index = int(part)
+        if index >= len(container):
+            container.extend([None] * (index + 1 - len(container)))
+        container[index] = value
+    else:
+        container[part] = value
+
+
+def _walk(document: Document, path: str, create: bool) -> Tuple[Any, str]:
+    """ The container of a dotted path's last part, and that part """
+    parts = path.split(".")
+    container = document  # type: Any
+    for part in parts[:-1]:
+        child = _child(container, part)
+        if child is _MISSING or child is None:
+            if not create:
+                return None, parts[-1]
+            child = {}
+            _put(container, part, child)
+        elif not isinstance(child, (dict, list)):
+            if create:
+                raise _write_error(
+                    "Cannot create field {!r} in element {!r}".format(
+                        parts[-1], child), 28)
+            return None, parts[-1]
+        container = child
+    return container, parts[-1]
+
+
+def _get_path(document: Document, path: str) -> Any:
+    container, part = _walk(document, path, False)
+    return _child(container, part)
+
+
+def _set_path(document: Document, path: str, value: Any) -> None:
+    container, part = _walk(document, path, True)
+    _put(container, part, value)
+
+
+def _unset_path(document: Document, path: str) -> None:
+    container, part = _walk(document, path, False)
+    if isinstance(container, dict):
+        container.pop(part, None)
+    elif _child(container, part) is not _MISSING:
+        # MongoDB leaves a null in arrays
+        container[int(part)] = None
+
+
+def _array_at(document: Document, path: str, operator: str) -> List[Any]:
+    """ The array at the path, created if it is missing """
+    current = _get_path(document, path)
+    if current is _MISSING or current is None:
+        current = []
+        _set_path(document, path, current)
+    if not isinstance(current, list):
+        raise _write_error(
+            "{} requires an array for the field {!r}".format(operator, path),
+            2)
+    return current
+
+
+def _number_at(document: Document, path: str, operator: str) -> Any:
+    current = _get_path(document, path)
+    if current is _MISSING:
+        return 0
+    if _type_order(current) != _NUMBER:
+        raise _write_error(
+            "Cannot apply {} to a value of non-numeric type at {!r}".format(
+                operator, path), 14)
+    return current
+
+
+def _each(argument: Any) -> List[Any]:
+    if isinstance(argument, dict) and "$each" in argument:
+        return list(argument["$each"])
+    return [argument]
+
+
+def _push(document: Document, path: str, argument: Any) -> None:
+    array = _array_at(document, path, "$push")
+    values = _each(argument)
+    modifiers = argument if isinstance(argument, dict) and \
+        "$each" in argument else {}
+    position = modifiers.get("$position")
+    if position is None:
+        array.extend(values)
+    else:
+        if position < 0:
+            position = max(len(array) + position, 0)
+        array[position:position] = values
+    if "$sort" in modifiers:
+        sort = modifiers["$sort"]
+        if isinstance(sort, dict):
+            _sort(array, list(sort.items()))
+        else:
+            array.sort(key=_sort_value, reverse=sort < 0)
+    if "$slice" in modifiers:
+        limit = modifiers["$slice"]
+        array[:] = array[:limit] if limit >= 0 else array[limit:]
+
+
+def _pull_matches(item: Any, condition: Any) -> bool:
+    if _is_operator_document(condition):
+        return _match_condition([item], condition)
+    if isinstance(condition, dict) and isinstance(item, dict):
+        return _matches(item, condition)
+    return _equal(item, condition)
+
+
+def _apply_operator(
+        document: Document,
+        operator: str,
+        path: str,
+        argument: Any) -> None:
+    if operator == "$set":
+        _set_path(document, path, argument)
+    elif operator == "$unset":
+        _unset_path(document, path)
+    elif operator == "$inc":
+        _set_path(
+            document, path, _number_at(document, path, operator) + argument)
+    elif operator == "$mul":
+        _set_path(
+            document, path, _number_at(document, path, operator) * argument)
+    elif operator in ("$min", "$max"):
+        current = _get_path(document, path)
+        wanted = -1 if operator == "$min" else 1
+        if current is _MISSING or \
+                (_sort_value(argument) > _sort_value(current)) - \
+                (_sort_value(argument) < _sort_value(current)) == wanted:
+            _set_path(document, path, argument)
+    elif operator == "$push":
+        _push(document, path, argument)
+    elif operator == "$addToSet":
+        array = _array_at(document, path, operator)
+        for value in _each(argument):
+            if not any(_equal(item, value) for item in array):
+                array.append(value)
+    elif operator == "$pull":
+        array = _array_at(document, path, operator)
+        array[:] = [item for item in array if not _pull_matches(
+            item, argument)]
+    elif operator == "$pullAll":
+        array = _array_at(document, path, operator)
+        array[:] = [item for item in array if not any(
+            _equal(item, value) for value in argument)]
+    elif operator == "$pop":
+        array = _array_at(document, path, operator)
+        if array:
+            array.pop(0 if argument < 0 else -1)
+    elif operator == "$rename":
+        value = _get_path(document, path)
+        if value is not _MISSING:
+            _unset_path(document, path)
+            _set_path(document, argument, value)
+    elif operator == "$currentDate":
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if isinstance(argument, dict) and \
+                argument.get("$type") == "timestamp":
+            _set_path(document, path, bson.Timestamp(now, 1))
+        else:
+            _set_path(document, path, _normalize(now))
+    else:
+        raise NotImplementedError(
+            "The in-memory collection doesn't support {}.".format(operator))
+
+
+def apply_update(
+        document: Document,
+        update: Mapping[str, Any],
+        inserting: bool = False) -> None:
+    """
+    Applies an update document (e.g. {"$set": ...}) in place, raising a
+    WriteError where the server would (mogo.Model uses it to update the
+    local values of models after atomic updates).
+    """
+    for operator, fields in update.items():
+        if operator == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set_path(document, path, value)
+            continue
+        for path, argument in fields.items():
+            if path == "_id" or path.startswith("_id."):
+                raise _write_error(
+                    "Performing an update on the path '_id' would modify "
+                    "the immutable field '_id'", 66)
+            _apply_operator(document, operator, path, argument)
+
+
+__all__ = ["apply_update"]
@@ -0,0 +1,210 @@
+""" Tests for the asyncio API. """
+
+import unittest
+
+import mogo
+from mogo import aio, ASC, DESC, Field, Model, PolyModel, ReferenceField
+from mogo import DocumentCache
+from mogo.helpers import BlockingLoadError
+from mogo.model import VersionConflictError
+
+from typing import Any, cast
+
+
+DBNAME = "_mogotest"
+ALTDB = "_mogotest2"
+
+
+class Crew(Model):
+    name = Field[str](str)
+    rank = Field[int](int, default=0)
+
+
+class Ship(Model):
+    name = Field[str](str)
+    captain = ReferenceField(Crew)
+
+
+class Cargo(PolyModel):
+    kind = Field[str](str, default="cargo")
+
+    @classmethod
+    def get_child_key(cls) -> str:
+        return "kind"
+
+
+@Cargo.register
+class Contraband(Cargo):
+    kind = Field[str](str, default="contraband")
+
+
+class TestAsyncAPI(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self._conn = aio.connect(DBNAME)
+
+    async def asyncTearDown(self) -> None:
+        await self._conn.drop_database(DBNAME)
+        await self._conn.drop_database(ALTDB)
+        await self._conn.close()
+
+    def sync_collection(self, name: str) -> Any:
+        connection = mogo.connect(DBNAME)
+        self.addCleanup(connection.close)
+        return connection[DBNAME][name]
+
+    async def test_save_and_find_one(self) -> None:
+        crew = Crew(name="Mal")
+        crew_id = await crew.aio.save()
+        self.assertEqual(crew_id, crew.id)
+        found = await Crew.aio.find_one({"name": "Mal"})
+        self.assertIsNotNone(found)
+        self.assertEqual(crew, found)
+        self.assertIsNone(await Crew.aio.find_one({"name": "Wash"}))
+
+    async def test_save_only_sends_changes(self) -> None:
+        crew = await Crew.aio.create(name="Zoe")
+        self.sync_collection("crew").update_one(
+            {"_id": crew.id}, {"$set": {"ship": "Serenity"}})
+        crew.rank = 2
+        await crew.aio.save()
+        document = await Crew.aio.get_collection().find_one({"_id": crew.id})
+        self.assertEqual(
+            {"_id": crew.id, "name": "Zoe", "rank": 2, "ship": "Serenity"},
+            document)
+
+    async def test_cursor_iteration_and_modifiers(self) -> None:
+        for rank, name in enumerate(["Mal", "Zoe", "Wash", "Jayne"]):
+            await Crew.aio.create(name=name, rank=rank)
+        cursor = Crew.aio.find({}).order(rank=DESC)
+        names = [crew.name async for crew in cursor]
+        self.assertEqual(["Jayne", "Wash", "Zoe", "Mal"], names)
+        page = await Crew.aio.find({}).order(rank=ASC).skip(1).limit(2) \
+            .to_list()
+        self.assertEqual(["Zoe", "Wash"], [crew.name for crew in page])
+        self.assertEqual(2, await Crew.aio.search(rank={"$gt": 1}).count())
+        first = cast(Crew, await Crew.aio.first(name="Wash"))
+        self.assertEqual(2, first.rank)
+        self.assertEqual(first, await Crew.aio.grab(str(first.id)))
+
+    async def test_update_and_remove(self) -> None:
+        crew = await Crew.aio.create(name="Kaylee")
+        await crew.aio.update(rank=3)
+        self.assertEqual(3, crew.rank)
+        await Crew.aio.update(
+            {"_id": crew.id}, {"$set": {"name": "Kaylee Frye"}})
+        reloaded = cast(Crew, await Crew.aio.grab(crew.id))
+        self.assertEqual("Kaylee Frye", reloaded.name)
+        self.assertEqual(3, reloaded.rank)
+
+        other = await Crew.aio.create(name="Simon")
+        await other.aio.delete()
+        self.assertEqual(1, await Crew.aio.count_documents({}))
+        with self.assertRaises(ValueError):
+            await Crew.aio.remove()
+        await Crew.aio.remove({}, multi=True)
+        self.assertEqual(0, await Crew.aio.count_documents({}))
+
+    async def test_versioned_writes_raise_on_conflicts(self) -> None:
+        class Versioned(Model):
+            VERSION_FIELD = "_version"
+            rank = Field[int](int, default=0)
+
+        versioned = await Versioned.aio.create()
+        stale = cast(Versioned, await Versioned.aio.grab(versioned.id))
+        await versioned.aio.update(rank=1)
+        versioned.rank = 2
+        await versioned.aio.save()
+        self.assertEqual(3, versioned["_version"])
+        stale.rank = 3
+        with self.assertRaises(VersionConflictError):
+            await stale.aio.save()
+        with self.assertRaises(VersionConflictError):
+            await stale.aio.update(rank=4)
+        await Versioned.aio.update(
+            {"_id": versioned.id}, {"$set": {"rank": 5}})
+        with self.assertRaises(VersionConflictError):
+            await versioned.aio.update(rank=6)
+
+    async def test_prefetch_references(self) -> None:
+        captain = await Crew.aio.create(name="Mal")
+        await Ship.aio.create(name="Serenity", captain=captain)
+        await Ship.aio.create(name="Shuttle", captain=captain)
+        ships = await Ship.aio.find({}).prefetch("captain").to_list()
+        self.assertEqual(2, len(ships))
+        for ship in ships:
+            self.assertEqual(captain, ship.captain)
+        self.assertIs(ships[0].captain, ships[1].captain)
+        with self.assertRaises(ValueError):
+            Ship.aio.find({}).prefetch("name")
+
+    async def test_document_cache_is_refreshed_and_used(self) -> None:
+        class Cached(Model):
+            DOCUMENT_CACHE = DocumentCache()
+            name = Field[str](str)
+
+        cache = Cached.DOCUMENT_CACHE
+        cached = await Cached.aio.create(name="Inara")
+        cached.name = "Inara Serra"
+        await cached.aio.save()
+        misses = cache.misses
+        found = cast(Cached, await Cached.aio.grab(cached.id))
+        self.assertEqual("Inara Serra", found.name)
+        self.assertEqual((1, misses), (cache.hits, cache.misses))
+
+    async def test_implicit_loads_raise_instead_of_blocking(self) -> None:
+        captain = await Crew.aio.create(name="Mal", rank=1)
+        ship = await Ship.aio.create(name="Serenity", captain=captain)
+        loaded = cast(Ship, await Ship.aio.grab(ship.id))
+        with self.assertRaises(BlockingLoadError):
+            loaded.captain
+        partial = cast(Crew, await Crew.aio.find_one({}, {"name": 1}))
+        self.assertEqual("Mal", partial.name)
+        with self.assertRaises(BlockingLoadError):
+            partial.rank
+        # models loaded synchronously still load synchronously
+        self.sync_collection("ship")
+        synchronous = cast(Ship, Ship.grab(ship.id))
+        self.assertEqual(captain.id, cast(Crew, synchronous.captain).id)
+        partial = cast(Crew, Crew.find_one({}, {"name": 1}))
+        self.assertEqual(1, partial.rank)
+
+    async def test_polymodel_queries(self) -> None:
+        await Cargo.aio.create()
+        contraband = await Contraband.aio.create()
+        self.assertEqual(2, len(await Cargo.aio.find({}).to_list()))
+        found = await Contraband.aio.find({}).to_list()
+        self.assertEqual([contraband], found)
+        self.assertIsInstance(
+            await Cargo.aio.grab(contraband.id), Contraband)
+        self.assertEqual(
+            ["contraband"], await Contraband.aio.distinct("kind"))
+
+    async def test_identity_map_is_shared_with_sync_api(self) -> None:
+        crew = await Crew.aio.create(name="Book")
+        with mogo.identity_map():
+            first = await Crew.aio.grab(crew.id)
+            self.assertIs(first, await Crew.aio.grab(crew.id))
+            self.assertIs(first, (await Crew.aio.find({}).to_list())[0])
+            await Crew.aio.update(
+                {"_id": crew.id}, {"$set": {"name": "Shepherd"}})
+            reloaded = cast(Crew, await Crew.aio.grab(crew.id))
+            self.assertIsNot(first, reloaded)
+            self.assertEqual("Shepherd", reloaded.name)
+
+    async def test_session_uses_its_own_connection(self) -> None:
+        async with aio.session(ALTDB, identity_map=True) as session:
+            manager = Crew.aio.use(session)
+            crew = await manager.create(name="River")
+            self.assertIs(crew, await manager.grab(crew.id))
+            self.assertIsNone(await Crew.aio.grab(crew.id))
+            client = cast(
+                aio.AsyncConnection, session.connection).connection
+            self.assertIsNotNone(client)
+        self.assertIsNone(mogo.identity.get_identity_map())
+
+    async def test_find_requires_spec_with_keyword_arguments(self) -> None:
+        with self.assertRaises(ValueError):
+            Crew.aio.find(name="Mal")
+        with self.assertRaises(ValueError):
+            await Crew.aio.find_one(name="Mal")
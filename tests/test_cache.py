@@ -0,0 +1,119 @@
+import unittest
+from unittest import mock
+
+from bson.objectid import ObjectId
+from mogo.cache import CacheBackend, DictCacheBackend, DocumentCache
+from mogo.cache import get_generation, invalidate, LocalCacheBackend
+from mogo.cache import QueryCache
+
+from typing import Any, Dict  # noqa: F401
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_query_cache_counts_hits_and_misses(self) -> None:
+        cache = QueryCache()
+        self.assertIsNone(cache.get("db.a", "key"))
+        cache.set("db.a", "key", 5, get_generation("db.a"))
+        self.assertEqual(5, cache.get("db.a", "key"))
+        self.assertEqual(
+            {"hits": 1, "misses": 1, "size": 1, "max_size": 1000},
+            cache.stats())
+        cache.reset_stats()
+        self.assertEqual((0, 0), (cache.hits, cache.misses))
+
+    def test_query_cache_evicts_least_recently_used(self) -> None:
+        cache = QueryCache(max_size=2)
+        for key in ("one", "two"):
+            cache.set("db.b", key, key, get_generation("db.b"))
+        cache.get("db.b", "one")
+        cache.set("db.b", "three", "three", get_generation("db.b"))
+        self.assertEqual(2, len(cache))
+        self.assertEqual("one", cache.get("db.b", "one"))
+        self.assertIsNone(cache.get("db.b", "two"))
+
+    def test_query_cache_expires_entries_after_ttl(self) -> None:
+        cache = QueryCache(ttl=10)
+        with mock.patch("mogo.cache.time.monotonic", return_value=100):
+            cache.set("db.c", "key", "value", get_generation("db.c"))
+        with mock.patch("mogo.cache.time.monotonic", return_value=109):
+            self.assertEqual("value", cache.get("db.c", "key"))
+        with mock.patch("mogo.cache.time.monotonic", return_value=110):
+            self.assertIsNone(cache.get("db.c", "key"))
+        self.assertEqual(0, len(cache))
+
+    def test_invalidate_expires_entries_of_the_collection(self) -> None:
+        first = QueryCache()
+        second = QueryCache()
+        for cache in (first, second):
+            cache.set("db.d", "key", "d", get_generation("db.d"))
+            cache.set("db.e", "other", "e", get_generation("db.e"))
+        invalidate("db.d")
+        for cache in (first, second):
+            self.assertIsNone(cache.get("db.d", "key"))
+            self.assertEqual("e", cache.get("db.e", "other"))
+
+    def test_query_cache_skips_results_older_than_a_write(self) -> None:
+        cache = QueryCache()
+        generation = get_generation("db.f")
+        invalidate("db.f")
+        cache.set("db.f", "key", "stale", generation)
+        self.assertIsNone(cache.get("db.f", "key"))
+
+    def test_query_cache_rejects_invalid_sizes(self) -> None:
+        with self.assertRaises(ValueError):
+            QueryCache(max_size=0)
+        with self.assertRaises(ValueError):
+            QueryCache(ttl=0)
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def test_document_cache_returns_copies_by_id(self) -> None:
+        cache = DocumentCache(backend=DictCacheBackend())
+        object_id = ObjectId()
+        document = {"_id": object_id, "tags": ["a"]}  # type: Dict[str, Any]
+        self.assertIsNone(cache.get("db.a", object_id))
+        cache.set("db.a", object_id, document)
+        document["tags"].append("b")
+        cached = cache.get("db.a", object_id)
+        self.assertEqual({"_id": object_id, "tags": ["a"]}, cached)
+        self.assertIsNot(cached, cache.get("db.a", object_id))
+        self.assertEqual({"hits": 2, "misses": 1}, cache.stats())
+
+    def test_document_cache_keys_ids_by_type(self) -> None:
+        cache = DocumentCache(backend=DictCacheBackend())
+        cache.set("db.b", 1, {"_id": 1})
+        self.assertIsNone(cache.get("db.b", "1"))
+        self.assertIsNone(cache.get("db.other", 1))
+        self.assertEqual({"_id": 1}, cache.get("db.b", 1))
+
+    def test_document_cache_deletes_and_clears(self) -> None:
+        backend = DictCacheBackend()
+        cache = DocumentCache(backend=backend)
+        for namespace in ("db.c", "db.c2"):
+            for object_id in (1, 2):
+                cache.set(namespace, object_id, {"_id": object_id})
+        cache.delete("db.c", 1)
+        self.assertIsNone(cache.get("db.c", 1))
+        cache.clear("db.c")
+        self.assertIsNone(cache.get("db.c", 2))
+        self.assertEqual(2, len(backend.values))
+
+    def test_local_cache_backend_evicts_least_recently_used(self) -> None:
+        backend = LocalCacheBackend(max_size=2)
+        backend.set("a", b"a")
+        backend.set("b", b"b")
+        backend.get("a")
+        backend.set("c", b"c")
+        self.assertEqual(2, len(backend))
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(b"a", backend.get("a"))
+        backend.delete_prefix("a")
+        self.assertIsNone(backend.get("a"))
+        with self.assertRaises(ValueError):
+            LocalCacheBackend(max_size=0)
+
+    def test_cache_backend_requires_an_implementation(self) -> None:
+        with self.assertRaises(NotImplementedError):
+            DocumentCache(backend=CacheBackend()).get("db.d", 1)
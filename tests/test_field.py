@@ -190,3 +190,46 @@ class MogoFieldTests(unittest.TestCase):
 
         with self.assertRaises(TypeError):
             TestCoerceModel2(percent=2)
+
+    def test_field_public_callback_overrides_are_called(self) -> None:
+
+        class UpperField(Field[str]):
+            value_type = str
+
+            def coerce_callback(self, value: Any) -> str:
+                return str(value)
+
+            def set_callback(
+                    self, instance: Model, value: Optional[str]) -> Any:
+                return value.upper() if value is not None else None
+
+        class TestOverrideModel(Model):
+            name = UpperField()
+
+        model = TestOverrideModel(name="mal")
+        self.assertEqual("MAL", model["name"])
+        model.name = 5
+        self.assertEqual("5", model["name"])
+
+    def test_field_defaults_use_the_stored_field_name(self) -> None:
+
+        class TestDefaultModel(Model):
+            abbreviated = Field[str](str, field_name="abrv", default="a")
+
+        self.assertEqual({"abrv": "a"}, TestDefaultModel().copy())
+        model = TestDefaultModel(abbreviated="lorem")
+        self.assertEqual({"abrv": "lorem"}, model.copy())
+        self.assertEqual("lorem", model.abbreviated)
+
+    def test_shared_field_stores_values_under_each_attribute(self) -> None:
+        shared = Field[int](int, coerce_callback=int)
+
+        class SharedModel(Model):
+            one = shared
+            two = shared
+
+        model = SharedModel()
+        model.one = 1
+        model.two = "2"
+        name = SharedModel._get_fields()[shared.id]
+        self.assertEqual({name: 2}, model.copy())
@@ -0,0 +1,142 @@
+""" Tests for the opt-in identity map. """
+
+import unittest
+
+import mogo
+from mogo import connect, DictCacheBackend, DocumentCache, Field, Model
+from mogo import PolyModel, ReferenceField
+from mogo.connection import Connection
+from mogo.identity import get_identity_map
+
+from typing import cast
+from typing import Any, Callable, List  # noqa: F401
+
+
+DBNAME = "_mogotest"
+ALTDB = "_mogotest2"
+
+
+class Hero(Model):
+    name = Field[str](str)
+
+
+class Villain(PolyModel):
+    role = Field[str](str, default="villain")
+
+    @classmethod
+    def get_child_key(cls) -> str:
+        return "role"
+
+
+@Villain.register
+class Henchman(Villain):
+    role = Field[str](str, default="henchman")
+
+
+class TestIdentityMap(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._conn = connect(DBNAME)
+
+    def tearDown(self) -> None:
+        self._conn.drop_database(DBNAME)
+        self._conn.drop_database(ALTDB)
+        self._conn.close()
+
+    def remove_behind_mogos_back(self, hero: Hero) -> None:
+        Hero._get_collection().delete_one({"_id": hero.id})
+
+    def test_identity_map_is_inactive_by_default(self) -> None:
+        self.assertIsNone(get_identity_map())
+        hero = Hero.create(name="Mal")
+        self.assertIsNot(Hero.grab(hero.id), Hero.grab(hero.id))
+
+    def test_repeated_loads_return_the_same_instance(self) -> None:
+        hero = Hero.create(name="Mal")
+        with mogo.identity_map() as identities:
+            first = Hero.grab(hero.id)
+            self.assertIsNotNone(first)
+            self.assertEqual(1, len(identities))
+            self.remove_behind_mogos_back(hero)
+            self.assertIs(first, Hero.grab(hero.id))
+            self.assertIs(first, Hero.find_one({"_id": hero.id}))
+        self.assertIsNone(get_identity_map())
+        self.assertIsNone(Hero.grab(hero.id))
+
+    def test_cursor_results_reuse_loaded_instances(self) -> None:
+        Hero.create(name="Mal")
+        Hero.create(name="Zoe")
+        with mogo.identity_map():
+            first = list(Hero.find({}))
+            second = list(Hero.find({}))
+            for hero1, hero2 in zip(first, second):
+                self.assertIs(hero1, hero2)
+
+    def test_saved_instances_are_served_from_the_map(self) -> None:
+        with mogo.identity_map():
+            hero = Hero.create(name="Wash")
+            self.remove_behind_mogos_back(hero)
+            self.assertIs(hero, Hero.grab(hero.id))
+
+    def test_delete_removes_instance_from_the_map(self) -> None:
+        hero = Hero.create(name="Book")
+        with mogo.identity_map():
+            loaded = Hero.grab(hero.id)
+            cast(Hero, loaded).delete()
+            self.assertIsNone(Hero.grab(hero.id))
+
+    def test_class_updates_clear_the_collection_from_the_map(self) -> None:
+        hero = Hero.create(name="Jayne")
+        with mogo.identity_map():
+            loaded = cast(Hero, Hero.grab(hero.id))
+            Hero.update({"_id": hero.id}, {"$set": {"name": "Vera"}})
+            reloaded = cast(Hero, Hero.grab(hero.id))
+            self.assertIsNot(loaded, reloaded)
+            self.assertEqual("Vera", reloaded.name)
+
+    def test_polymodel_lookups_respect_child_classes(self) -> None:
+        henchman = Henchman.create()
+        villain = Villain.create()
+        with mogo.identity_map():
+            loaded = Villain.grab(henchman.id)
+            self.assertIsInstance(loaded, Henchman)
+            self.assertIs(loaded, Henchman.grab(henchman.id))
+            self.assertIsNotNone(Villain.grab(villain.id))
+            self.assertIsNone(Henchman.grab(villain.id))
+
+    def test_document_cache_ignores_unsaved_changes(self) -> None:
+        class Ship(Model):
+            name = Field[str](str)
+
+        class Crew(Model):
+            ship = ReferenceField(Ship)
+
+        ship = Ship.create(name="Serenity")
+        Crew.create(ship=ship)
+        loads = [
+            lambda: Ship.find_one({"name": "Serenity"}),
+            lambda: list(Crew.find({}).prefetch("ship")),
+            lambda: Ship.find_one_and_update(
+                {"_id": ship.id}, {"$set": {"size": 1}}, return_document=True),
+        ]  # type: List[Callable[[], Any]]
+        for load in loads:
+            with mogo.identity_map():
+                loaded = cast(Ship, Ship.grab(ship.id))
+                loaded.name = "Unsaved"
+                Ship.DOCUMENT_CACHE = DocumentCache(
+                    backend=DictCacheBackend())
+                load()
+            self.assertEqual("Serenity", cast(Ship, Ship.grab(ship.id)).name)
+            self.assertEqual(1, Ship.DOCUMENT_CACHE.hits)
+
+    def test_session_enables_identity_map_for_with_block(self) -> None:
+        with mogo.session(ALTDB, identity_map=True) as session:
+            identities = get_identity_map()
+            self.assertIs(session.identity_map, identities)
+            SessionHero = Hero.use(session)
+            hero = SessionHero.create(name="Kaylee")
+            self.assertIs(hero, SessionHero.grab(hero.id))
+            collection = cast(
+                Connection, session.connection).get_collection("hero")
+            self.assertEqual(1, collection.count_documents({}))
+        self.assertIsNone(get_identity_map())
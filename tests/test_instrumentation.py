@@ -0,0 +1,146 @@
+import unittest
+from unittest import mock
+
+from mogo import Field, Model
+from mogo.instrumentation import get_current_operation, instrumented
+from mogo.instrumentation import Instrumentation
+from mogo.instrumentation import OperationRecord  # noqa: F401
+from mogo.instrumentation import query_shape
+
+from typing import Any, Callable, Dict, List, Optional  # noqa: F401
+
+
+class Gadget(Model):
+    name = Field[str](str)
+
+    @classmethod
+    @instrumented("outer")
+    def outer(cls) -> Any:
+        return cls.inner()
+
+    @classmethod
+    @instrumented("inner")
+    def inner(cls) -> Any:
+        return get_current_operation()
+
+    @classmethod
+    @instrumented("search")
+    def run(cls, function: Callable[[], Any]) -> Any:
+        return function()
+
+
+def started(
+        name: str,
+        command: Dict[str, Any],
+        request_id: int = 1) -> Any:
+    return mock.Mock(
+        command_name=name, command=command, request_id=request_id,
+        connection_id=("localhost", 27017))
+
+
+def succeeded(
+        name: str,
+        reply: Dict[str, Any],
+        request_id: int = 1,
+        duration_micros: int = 1500) -> Any:
+    return mock.Mock(
+        command_name=name, reply=reply, request_id=request_id,
+        connection_id=("localhost", 27017), duration_micros=duration_micros)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.instrumentation = Instrumentation(slow_query_ms=10)
+
+    def test_instrumented_records_the_outermost_method(self) -> None:
+        self.assertEqual(("Gadget", "outer"), Gadget.outer())
+        self.assertEqual(("Gadget", "inner"), Gadget.inner())
+        self.assertIsNone(get_current_operation())
+        with mock.patch("mogo.instrumentation._enabled", False):
+            self.assertIsNone(Gadget.outer())
+
+    def test_query_shape_replaces_values(self) -> None:
+        self.assertEqual(
+            {"name": "?", "age": {"$gt": "?"}, "tags": {"$in": ["?"]},
+             "$or": [{"a": "?"}, {"b": "?"}]},
+            query_shape({
+                "name": "Mal", "age": {"$gt": 30},
+                "tags": {"$in": ["a", "b"]},
+                "$or": [{"a": 1}, {"b": 2}]}))
+
+    def test_instrumentation_records_stats_by_model_method(self) -> None:
+        records = []  # type: List[OperationRecord]
+        self.instrumentation.add_listener(records.append)
+        Gadget.run(lambda: self.instrumentation.started(
+            started("find", {"find": "gadget", "filter": {"name": "a"}})))
+        self.instrumentation.succeeded(succeeded("find", {"cursor": {
+            "id": 42, "firstBatch": [{"_id": 1}, {"_id": 2}]}}))
+        # getMores are attributed to the method that created the cursor
+        self.instrumentation.started(
+            started("getMore", {"getMore": 42}, request_id=2))
+        self.instrumentation.succeeded(succeeded(
+            "getMore", {"cursor": {"id": 0, "nextBatch": [{"_id": 3}]}},
+            request_id=2))
+        self.instrumentation.started(
+            started("insert", {"insert": "other"}, request_id=3))
+        self.instrumentation.failed(mock.Mock(
+            command_name="insert", request_id=3,
+            connection_id=("localhost", 27017), duration_micros=500))
+
+        stats = self.instrumentation.stats()
+        search = stats[("Gadget", "search")]
+        self.assertEqual(2, search["count"])
+        self.assertEqual(3, search["documents"])
+        self.assertEqual(3.0, search["total_ms"])
+        self.assertEqual(0, search["bytes_sent"])
+        self.assertEqual(0, search["bytes_received"])
+        self.assertEqual(1, stats[(None, "insert")]["failures"])
+        self.assertEqual(
+            ["find", "getMore", "insert"],
+            [record.command for record in records])
+        self.assertEqual({"name": "?"}, records[0].shape)
+        self.assertEqual({}, self.instrumentation._cursors)
+
+        self.instrumentation.reset()
+        self.assertEqual({}, self.instrumentation.stats())
+
+    def test_instrumentation_measures_bytes_on_request(self) -> None:
+        instrumentation = Instrumentation(measure_bytes=True)
+        instrumentation.started(
+            started("find", {"find": "gadget", "filter": {"name": "a"}}))
+        instrumentation.succeeded(succeeded("find", {"cursor": {
+            "id": 0, "firstBatch": [{"_id": 1}]}}))
+        stats = instrumentation.stats()[(None, "find")]
+        self.assertGreater(stats["bytes_sent"], 0)
+        self.assertGreater(stats["bytes_received"], 0)
+
+    def test_instrumentation_logs_slow_queries(self) -> None:
+        self.instrumentation.started(started(
+            "update", {"update": "gadget", "updates": [
+                {"q": {"_id": 1}, "u": {"$set": {"name": "b"}}}]}))
+        with self.assertLogs("mogo", level="WARNING") as logs:
+            self.instrumentation.succeeded(succeeded(
+                "update", {"n": 1}, duration_micros=25000))
+        self.assertEqual(1, len(logs.output))
+        self.assertIn("25.0 ms", logs.output[0])
+        self.assertIn("[{'_id': '?'}]", logs.output[0])
+
+    def test_cursors_remember_the_method_that_created_them(self) -> None:
+        collection = mock.MagicMock()
+        collection.find.return_value = iter([{"_id": 1, "name": "a"}])
+        with mock.patch.object(
+                Gadget, "_get_collection", return_value=collection):
+            cursor = Gadget.search(name="a")
+            self.assertEqual(("Gadget", "search"), cursor._operation)
+            self.assertEqual(("Gadget", "find"), Gadget.find({})._operation)
+            operations = []  # type: List[Optional[Any]]
+
+            def next_document(pymongo_cursor: Any) -> Dict[str, Any]:
+                operations.append(get_current_operation())
+                return {"_id": 1}
+
+            collection.find.return_value = mock.MagicMock(
+                __next__=next_document)
+            Gadget.find({}).first()
+            self.assertEqual([("Gadget", "find")], operations)
@@ -0,0 +1,325 @@
+import re
+import unittest
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.collation import Collation
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from pymongo.operations import DeleteOne, InsertOne, UpdateOne
+
+import mogo
+from mogo import Field, Model
+from mogo.connection import Connection
+from mogo.memory import MemoryClient, MemoryCollection
+
+from typing import Any, Dict, List  # noqa: F401
+
+
+class Sailor(Model):
+    name = Field[str](str)
+    rank = Field[int](int)
+
+
+class TestMemoryCollection(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = MemoryClient()
+        self.collection = self.client["db"]["crew"]
+        self.collection.insert_many([
+            {"_id": 1, "name": "Mal", "age": 40, "tags": ["captain"]},
+            {"_id": 2, "name": "Zoe", "age": 33, "tags": ["mate", "pilot"]},
+            {"_id": 3, "name": "Wash", "age": 35, "ship": {"role": "pilot"}},
+            {"_id": 4, "name": "Jayne", "tags": []},
+        ])
+
+    def get(self, object_id: Any) -> Dict[str, Any]:
+        document = self.collection.find_one(object_id)
+        assert document is not None
+        return dict(document)
+
+    def names(self, query: Dict[str, Any], **kwargs: Any) -> List[str]:
+        return [doc["name"] for doc in self.collection.find(query, **kwargs)]
+
+    def test_find_supports_query_operators(self) -> None:
+        self.assertEqual(["Mal", "Wash"], self.names({"age": {"$gte": 35}}))
+        self.assertEqual(["Zoe"], self.names({"tags": "pilot"}))
+        self.assertEqual(["Wash"], self.names({"ship.role": "pilot"}))
+        self.assertEqual(["Jayne"], self.names({"age": None}))
+        self.assertEqual(["Jayne"], self.names({"age": {"$exists": False}}))
+        self.assertEqual(
+            ["Mal", "Jayne"], self.names({"_id": {"$in": [1, 4, 5]}}))
+        self.assertEqual(
+            ["Zoe", "Jayne"], self.names({"_id": {"$nin": [1, 3]}}))
+        self.assertEqual(["Jayne"], self.names({"tags": {"$size": 0}}))
+        self.assertEqual(
+            ["Mal", "Zoe"],
+            self.names({"$or": [{"age": 40}, {"tags": "mate"}]}))
+        self.assertEqual(
+            ["Wash"], self.names({"name": re.compile("^w", re.I)}))
+        self.assertEqual(
+            ["Mal", "Zoe", "Jayne"],
+            self.names({"name": {"$not": {"$regex": "^W"}}}))
+        self.assertEqual(
+            ["Zoe"], self.names({"tags": {"$all": ["pilot", "mate"]}}))
+        self.assertEqual(["Mal"], self.names({"age": {"$mod": [4, 0]}}))
+
+    def test_find_does_not_compare_across_types(self) -> None:
+        self.collection.insert_one({"_id": 5, "name": "River", "age": "17"})
+        self.assertEqual(["River"], self.names({"age": {"$gt": "1"}}))
+        self.assertEqual([], self.names({"age": True}))
+
+    def test_find_sorts_skips_limits_and_projects(self) -> None:
+        cursor = self.collection.find({}, {"name": 1}).sort(
+            "age", -1).skip(1).limit(2)
+        self.assertEqual(
+            [{"_id": 3, "name": "Wash"}, {"_id": 2, "name": "Zoe"}],
+            list(cursor))
+        documents = self.collection.find(
+            {"_id": 3}, projection={"ship.role": 1, "_id": 0})
+        self.assertEqual([{"ship": {"role": "pilot"}}], list(documents))
+        documents = self.collection.find(
+            {"_id": 3}, projection={"ship": 0, "age": 0})
+        self.assertEqual([{"_id": 3, "name": "Wash"}], list(documents))
+        # missing fields sort first
+        self.assertEqual(
+            ["Jayne", "Zoe", "Wash", "Mal"], self.names({}, sort=[("age", 1)]))
+
+    def test_cursor_supports_indexes_and_slices(self) -> None:
+        cursor = self.collection.find().sort("_id")
+        self.assertEqual("Zoe", cursor[1]["name"])
+        self.assertEqual(
+            ["Zoe", "Wash"], [doc["name"] for doc in cursor[1:3]])
+        with self.assertRaises(IndexError):
+            cursor[10]
+
+    def test_cursor_sorts_strings_by_collation(self) -> None:
+        self.collection.insert_many([{"name": "mal"}, {"name": "zoe"}])
+        cursor = self.collection.find({"age": None, "_id": {"$ne": 4}})
+        cursor.collation(Collation(locale="en_US")).sort("name")
+        self.assertEqual(
+            ["mal", "zoe"], [document["name"] for document in cursor])
+        self.assertEqual(
+            ["Jayne", "mal", "Mal", "Wash", "zoe", "Zoe"],
+            self.names({}, sort=[("name", 1)], collation={"locale": "en"}))
+
+    def test_returned_documents_are_copies(self) -> None:
+        document = self.collection.find_one({"_id": 2})
+        assert document is not None
+        document["tags"].append("changed")
+        self.assertEqual(
+            ["mate", "pilot"], self.get(2)["tags"])
+        self.collection.insert_one({"_id": 5, "values": (1, 2)})
+        self.assertEqual([1, 2], self.get(5)["values"])
+
+    def test_insert_adds_ids_and_rejects_duplicates(self) -> None:
+        document = {"name": "Kaylee"}  # type: Dict[str, Any]
+        result = self.collection.insert_one(document)
+        self.assertIsInstance(document["_id"], ObjectId)
+        self.assertEqual(document["_id"], result.inserted_id)
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.insert_one({"_id": 1})
+        with self.assertRaises(BulkWriteError):
+            self.collection.insert_many([{"_id": 6}, {"_id": 1}])
+        self.assertEqual(1, self.collection.count_documents({"_id": 6}))
+
+    def test_update_operators(self) -> None:
+        self.collection.update_one({"_id": 1}, {
+            "$set": {"ship.name": "Serenity"},
+            "$inc": {"age": 1},
+            "$push": {"tags": {"$each": ["browncoat"]}},
+            "$unset": {"name": ""},
+        })
+        self.collection.update_one({"_id": 2}, {
+            "$addToSet": {"tags": "mate"},
+            "$pull": {"tags": "pilot"},
+            "$max": {"age": 30},
+            "$min": {"rank": 2},
+            "$rename": {"name": "alias"},
+        })
+        self.assertEqual(
+            {"_id": 1, "age": 41, "tags": ["captain", "browncoat"],
+             "ship": {"name": "Serenity"}},
+            self.collection.find_one(1))
+        self.assertEqual(
+            {"_id": 2, "alias": "Zoe", "age": 33, "tags": ["mate"],
+             "rank": 2},
+            self.collection.find_one(2))
+        with self.assertRaises(WriteError):
+            self.collection.update_one({"_id": 1}, {"$inc": {"tags": 1}})
+        with self.assertRaises(WriteError):
+            self.collection.update_one({"_id": 1}, {"$set": {"_id": 5}})
+        with self.assertRaises(NotImplementedError):
+            self.collection.update_one({"_id": 1}, {"$bit": {"age": 1}})
+
+    def test_update_results_and_upserts(self) -> None:
+        result = self.collection.update_many(
+            {"age": {"$exists": True}}, {"$set": {"age": 33}})
+        self.assertEqual((3, 2), (result.matched_count, result.modified_count))
+        result = self.collection.update_one(
+            {"name": "Kaylee", "age": {"$gt": 20}},
+            {"$set": {"rank": 3}, "$setOnInsert": {"job": "mechanic"}},
+            upsert=True)
+        self.assertIsNotNone(result.upserted_id)
+        self.assertEqual(
+            {"_id": result.upserted_id, "name": "Kaylee", "rank": 3,
+             "job": "mechanic"},
+            self.collection.find_one(result.upserted_id))
+        result = self.collection.replace_one(
+            {"_id": 7}, {"name": "Book"}, upsert=True)
+        self.assertEqual(7, result.upserted_id)
+        self.assertEqual(
+            {"_id": 7, "name": "Book"}, self.collection.find_one(7))
+
+    def test_delete_one_and_many(self) -> None:
+        self.assertEqual(
+            1, self.collection.delete_one({"age": {"$gt": 0}}).deleted_count)
+        self.assertEqual(
+            2, self.collection.delete_many({"age": {"$gt": 0}}).deleted_count)
+        self.assertEqual(["Jayne"], self.names({}))
+
+    def test_bulk_write_counts_operations(self) -> None:
+        result = self.collection.bulk_write([
+            InsertOne({"_id": 5, "name": "River"}),
+            UpdateOne({"_id": 1}, {"$set": {"age": 41}}),
+            UpdateOne({"_id": 6}, {"$set": {"age": 1}}, upsert=True),
+            DeleteOne({"_id": 4}),
+        ])
+        self.assertEqual(
+            (1, 1, 1, 1, {2: 6}),
+            (result.inserted_count, result.modified_count,
+             result.upserted_count, result.deleted_count,
+             result.upserted_ids))
+
+    def test_unordered_bulk_write_continues_after_errors(self) -> None:
+        with self.assertRaises(BulkWriteError) as context:
+            self.collection.bulk_write([
+                InsertOne({"_id": 1}),
+                InsertOne({"_id": 5}),
+            ], ordered=False)
+        errors = context.exception.details["writeErrors"]
+        self.assertEqual([(0, 11000)], [
+            (error["index"], error["code"]) for error in errors])
+        self.assertEqual(1, self.collection.count_documents({"_id": 5}))
+
+    def test_find_one_and_modify(self) -> None:
+        before = self.collection.find_one_and_update(
+            {"name": "Mal"}, {"$inc": {"age": 1}})
+        assert before is not None
+        self.assertEqual(40, before["age"])
+        after = self.collection.find_one_and_update(
+            {"name": "Mal"}, {"$inc": {"age": 1}}, projection={"age": 1},
+            return_document=ReturnDocument.AFTER)
+        self.assertEqual({"_id": 1, "age": 42}, after)
+        created = self.collection.find_one_and_update(
+            {"name": "River"}, {"$setOnInsert": {"age": 17}}, upsert=True,
+            return_document=ReturnDocument.AFTER)
+        assert created is not None
+        self.assertEqual(("River", 17), (created["name"], created["age"]))
+        replaced = self.collection.find_one_and_replace(
+            {"_id": 4}, {"name": "Jayne Cobb"},
+            return_document=ReturnDocument.AFTER)
+        self.assertEqual({"_id": 4, "name": "Jayne Cobb"}, replaced)
+        deleted = self.collection.find_one_and_delete(
+            {}, sort=[("age", -1)])
+        assert deleted is not None
+        self.assertEqual("Mal", deleted["name"])
+        self.assertIsNone(self.collection.find_one(1))
+        self.assertIsNone(self.collection.find_one_and_delete({"_id": 99}))
+
+    def test_count_and_distinct(self) -> None:
+        self.assertEqual(
+            2, self.collection.count_documents({"age": {"$lt": 40}}))
+        self.assertEqual(
+            1, self.collection.count_documents({}, skip=1, limit=1))
+        self.assertEqual(4, self.collection.estimated_document_count())
+        self.assertEqual(
+            ["captain", "mate", "pilot"], self.collection.distinct("tags"))
+        self.assertEqual(
+            [33, 35], self.collection.distinct("age", {"age": {"$lt": 40}}))
+
+    def test_aggregate_supports_simple_pipelines(self) -> None:
+        result = self.collection.aggregate([
+            {"$match": {"age": {"$exists": True}}},
+            {"$group": {"_id": None, "total": {"$sum": "$age"},
+                        "names": {"$push": "$name"}}},
+        ])
+        self.assertEqual(
+            [{"_id": None, "total": 108, "names": ["Mal", "Zoe", "Wash"]}],
+            list(result))
+        result = self.collection.aggregate([
+            {"$sort": {"age": -1}}, {"$limit": 2}, {"$project": {"_id": 1}}])
+        self.assertEqual([{"_id": 1}, {"_id": 3}], list(result))
+        self.assertEqual(
+            [{"count": 4}],
+            list(self.collection.aggregate([{"$count": "count"}])))
+        with self.assertRaises(NotImplementedError):
+            self.collection.aggregate([{"$lookup": {}}])
+
+    def test_indexes_are_used_for_lookups(self) -> None:
+        name = self.collection.create_index("name")
+        self.assertEqual("name_1", name)
+        index = self.collection._storage.indexes[name]
+        self.assertEqual({2}, index.lookup("Zoe"))
+        self.collection.update_one({"_id": 2}, {"$set": {"name": "Zoe W"}})
+        self.assertEqual(set(), index.lookup("Zoe"))
+        self.assertEqual(["Zoe W"], self.names({"name": "Zoe W"}))
+        self.assertEqual(
+            ["Mal", "Wash"], self.names({"name": {"$in": ["Wash", "Mal"]}}))
+        self.collection.delete_one({"_id": 2})
+        self.assertEqual(set(), index.lookup("Zoe W"))
+        self.assertIn(name, self.collection.index_information())
+        self.collection.drop_indexes()
+        self.assertEqual(["_id_"], list(self.collection.index_information()))
+
+    def test_unique_indexes_reject_duplicates(self) -> None:
+        self.collection.create_index([("name", 1)], unique=True)
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.insert_one({"name": "Mal"})
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.update_one(
+                {"_id": 2}, {"$set": {"name": "Mal"}})
+        self.assertEqual("Zoe", self.get(2)["name"])
+        self.collection.insert_one({"name": "Inara"})
+        # documents without the field are indexed as null
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.create_index("age", unique=True)
+        self.collection.create_index("age", unique=True, sparse=True)
+
+    def test_collections_share_storage(self) -> None:
+        same = self.client.get_database("db").get_collection("crew")
+        self.assertEqual(self.collection, same)
+        self.assertEqual(4, same.count_documents({}))
+        self.assertEqual("db.crew", same.full_name)
+        self.assertEqual(["crew"], self.client["db"].list_collection_names())
+        self.collection.drop()
+        self.assertEqual(0, same.count_documents({}))
+        self.client.drop_database("db")
+        self.assertEqual([], self.client.list_database_names())
+
+
+class TestMemoryClientConnection(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        Connection._instance = None
+
+    def test_connect_uses_the_client(self) -> None:
+        client = MemoryClient()
+        self.assertIs(client, mogo.connect("memory_test", client=client))
+        self.assertIsNone(Connection.instance()._connect_args)
+        sailor = Sailor(name="Mal", rank=1)
+        sailor.save()
+        self.assertIsInstance(Sailor._get_collection(), MemoryCollection)
+        self.assertEqual(sailor, Sailor.find_one({"name": "Mal"}))
+        self.assertEqual(1, Sailor.search(rank=1).count())
+        sailor.rank = 2
+        sailor.save()
+        self.assertEqual(
+            {"_id": sailor.id, "name": "Mal", "rank": 2},
+            client["memory_test"]["sailor"].find_one())
+
+    def test_sessions_with_the_same_client_share_data(self) -> None:
+        client = MemoryClient()
+        with mogo.session("memory_test", client=client) as session:
+            Sailor.use(session).create(name="Zoe")
+        with mogo.session("memory_test", client=client) as session:
+            self.assertEqual(1, Sailor.use(session).count())
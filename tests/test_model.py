@@ -166,6 +166,49 @@ class TestModel(unittest.TestCase):
         testing2.foo = "whatever"  # type: ignore
         self.assertEqual("bar", testing2.foo)  # type: ignore
 
+    def test_model_schema_is_compiled_from_class_hierarchy(self) -> None:
+        class SubFoo(Foo):
+            default = Field[Any](default="child")
+            extra = Field[Any]()
+
+        schema = SubFoo._get_schema()
+        self.assertIs(vars(SubFoo)["default"], schema["default"])
+        self.assertIs(vars(SubFoo)["extra"], schema["extra"])
+        self.assertIs(vars(Foo)["field"], schema["field"])
+        self.assertNotIn(id(vars(Foo)["default"]), SubFoo._get_fields())
+        self.assertNotIn("extra", Foo._get_schema())
+        with self.assertRaises(TypeError):
+            Foo._get_schema()["other"] = Field()  # type: ignore
+
+    def test_model_add_field_updates_existing_subclasses(self) -> None:
+        class Testing(Model):
+            pass
+
+        class SubTesting(Testing):
+            pass
+
+        Testing.add_field("foo", Field(str))
+        self.assertIn("foo", SubTesting._get_schema())
+        self.assertEqual("bar", SubTesting(foo="bar")["foo"])
+
+    def test_fields_know_their_attribute_names(self) -> None:
+        shared = Field[str](str)
+
+        class Testing(Model):
+            name = Field[str](str)
+            custom = Field[str](str, field_name="c")
+            one = shared
+            two = shared
+
+        testing = Testing(name="a", custom="b")
+        schema = Testing._get_schema()
+        self.assertEqual("name", schema["name"]._get_field_name(testing))
+        self.assertEqual("c", schema["custom"]._get_field_name(testing))
+        # shared fields are resolved through the model's schema
+        self.assertEqual(
+            Testing._get_fields()[shared.id],
+            shared._get_field_name(testing))
+
     def test_model_rejects_unknown_field_values_by_default(self) -> None:
         class Testing(Model):
             pass
@@ -275,6 +318,51 @@ class TestModel(unittest.TestCase):
         infant2 = Person(age=3, role="infant")
         self.assertIsInstance(infant2, Infant)
 
+    def test_from_document_adopts_document_without_defaults(self) -> None:
+        document = {"_id": ObjectId(), "required": "value"}
+        foo = Foo.from_document(document)
+        self.assertIsInstance(foo, Foo)
+        self.assertIs(document, foo._pymongo_data)
+        self.assertNotIn("default", foo)
+        self.assertEqual("default", foo.default)
+        self.assertEqual("value", foo.required)
+
+    def test_from_document_constructs_polymorphic_instances(self) -> None:
+        infant = Person.from_document({"_id": ObjectId(), "role": "infant"})
+        self.assertIsInstance(infant, Infant)
+        person = Person.from_document({"_id": ObjectId()})
+        self.assertIsInstance(person, Person)
+        self.assertEqual("person", person.role)
+        triangle = Polygon.from_document({"_id": ObjectId(), "sides": 3})
+        self.assertIsInstance(triangle, Triangle)
+
+    def test_slotted_models_only_hold_document_storage(self) -> None:
+        class Slotted(Model, slots=True):
+            name = Field[str](str, default="slotted")
+
+        for slotted in (
+                Slotted(), Slotted.from_document({"_id": ObjectId()})):
+            self.assertFalse(hasattr(slotted, "__dict__"))
+            self.assertEqual("slotted", slotted.name)
+            with self.assertRaises(AttributeError):
+                setattr(slotted, "other", "value")
+        self.assertTrue(hasattr(Foo(), "__dict__"))
+
+    def test_loaded_models_share_unchanged_state(self) -> None:
+        foo = Foo.from_document({"_id": ObjectId(), "required": "a"})
+        bar = Foo.from_document({"_id": ObjectId(), "required": "b"})
+        self.assertIs(foo._changed_keys, bar._changed_keys)
+        foo.required = "c"
+        self.assertEqual({"required"}, foo._changed_keys)
+        self.assertEqual(frozenset(), bar._changed_keys)
+
+    def test_find_one_hydrates_stored_document(self) -> None:
+        infant = Infant.create(age=4)
+        result = Person.find_one({"_id": infant.id})
+        self.assertIsInstance(result, Infant)
+        self.assertEqual(infant, result)
+        self.assertEqual(4, cast(Infant, result).age)
+
     def test_distinct_returns_sequence_of_distinct_values(self) -> None:
         Infant.create(age=10)
         Infant.create(age=15)
@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+
+from mogo.parallel import split_ranges
+
+
+class TestSplitRanges(unittest.TestCase):
+
+    def test_split_ranges_builds_consecutive_id_ranges(self) -> None:
+        collection = mock.Mock()
+        collection.aggregate.return_value = [
+            {"_id": value} for value in [9, 3, 1, 7, 5, 11]]
+        ranges = split_ranges(collection, {"kind": "a"}, 3)
+        self.assertEqual([
+            {"$and": [{"kind": "a"}, {"_id": {"$lt": 5}}]},
+            {"$and": [{"kind": "a"}, {"_id": {"$gte": 5, "$lt": 9}}]},
+            {"$and": [{"kind": "a"}, {"_id": {"$not": {"$lt": 9}}}]},
+        ], ranges)
+
+    def test_split_ranges_without_spec_uses_only_id_ranges(self) -> None:
+        collection = mock.Mock()
+        collection.aggregate.return_value = [{"key": 1}, {"key": 2}]
+        self.assertEqual(
+            [{"key": {"$lt": 2}}, {"key": {"$not": {"$lt": 2}}}],
+            split_ranges(collection, {}, 2, id_field="key"))
+
+    def test_split_ranges_falls_back_to_a_single_range(self) -> None:
+        collection = mock.Mock()
+        self.assertEqual([{"a": 1}], split_ranges(collection, {"a": 1}, 1))
+        collection.aggregate.assert_not_called()
+
+        collection.aggregate.return_value = []
+        self.assertEqual([{"a": 1}], split_ranges(collection, {"a": 1}, 4))
+
+        collection.aggregate.return_value = [{"_id": 1}, {"_id": "one"}]
+        self.assertEqual([{"a": 1}], split_ranges(collection, {"a": 1}, 4))
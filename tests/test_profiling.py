@@ -0,0 +1,102 @@
+import unittest
+
+import mogo
+from mogo import connect, Field, Model, PolyModel
+from mogo import profiling
+
+from typing import Any, Optional  # noqa: F401
+
+
+def shout(instance: Model, value: Optional[str]) -> Optional[str]:
+    return value and value.upper()
+
+
+class Measured(Model):
+    name = Field[str](str)
+    age = Field[int](int, coerce_callback=int)
+    label = Field[str](
+        str, set_callback=shout,
+        get_callback=lambda instance, value: value.lower())
+
+
+class Shape(PolyModel):
+    kind = Field[str](str, default="shape")
+
+    @classmethod
+    def get_child_key(cls) -> str:
+        return "kind"
+
+
+@Shape.register("square")
+class Square(Shape):
+    kind = Field[str](str, default="square")
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self) -> None:
+        mogo.reset_stats()
+        profiling.enable()
+
+    def tearDown(self) -> None:
+        profiling.disable()
+        mogo.reset_stats()
+
+    def test_profiling_counts_model_and_field_operations(self) -> None:
+        measured = Measured(name="Mal", age="40", label="Captain")
+        self.assertEqual("captain", measured.label)
+        self.assertEqual("Mal", measured.name)
+        measured.name = "Malcolm"
+        Shape(kind="square")
+
+        stats = mogo.stats()
+        self.assertEqual(1, stats[("Measured", None, "__init__")]["calls"])
+        self.assertEqual(2, stats[("Measured", "name", "set")]["calls"])
+        self.assertEqual(1, stats[("Measured", "name", "get")]["calls"])
+        self.assertEqual(
+            1, stats[("Measured", "age", "coerce_callback")]["calls"])
+        self.assertEqual(
+            1, stats[("Measured", "label", "set_callback")]["calls"])
+        self.assertEqual(
+            1, stats[("Measured", "label", "get_callback")]["calls"])
+        self.assertEqual(1, stats[("Shape", None, "__new__")]["calls"])
+        self.assertEqual(1, stats[("Square", None, "__init__")]["calls"])
+        self.assertTrue(all(
+            value["total_ms"] >= 0 for value in stats.values()))
+
+        mogo.reset_stats()
+        self.assertEqual({}, mogo.stats())
+
+    def test_profiling_times_loading_query_results(self) -> None:
+        connection = connect("_mogotest")
+        try:
+            Measured.create(name="Mal")
+            Measured.create(name="Zoe")
+            mogo.reset_stats()
+            self.assertEqual(2, len(list(Measured.find({}))))
+            stats = mogo.stats()
+            self.assertNotIn(("Measured", None, "__init__"), stats)
+            self.assertEqual(
+                2, stats[("Measured", None, "from_document")]["calls"])
+            self.assertEqual(
+                2, stats[("Measured", None, "_hydrate")]["calls"])
+        finally:
+            connection.drop_database("_mogotest")
+            connection.close()
+
+    def test_disable_restores_the_original_methods(self) -> None:
+        profiling.disable()
+        self.assertFalse(profiling.is_enabled())
+        self.assertNotIn("profiling", Field.__set__.__module__)
+        self.assertNotIn("profiling", Model.__init__.__module__)
+        self.assertNotIn("profiling", Model._hydrate.__module__)
+        measured = Measured(name="Zoe", age="33")
+        self.assertEqual(33, measured.age)
+        self.assertIsInstance(Shape(kind="square"), Square)
+        self.assertEqual({}, mogo.stats())
+
+    def test_enable_is_idempotent(self) -> None:
+        profiling.enable()
+        Measured(name="Wash")
+        stats = mogo.stats()  # type: Any
+        self.assertEqual(1, stats[("Measured", "name", "set")]["calls"])
@@ -9,19 +9,28 @@ probably want to change DBNAME. :)
 """
 
 from datetime import datetime
+import gc
 import unittest
+from unittest import mock
+import weakref
 
 from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
 import mogo
-from mogo import PolyModel, Model, Field, ReferenceField, DESC, connect
-from mogo import ConstantField
+from mogo import PolyModel, Model, Field, ReferenceField, ASC, DESC, connect
+from mogo import ConstantField, DictCacheBackend, DocumentCache, QueryCache
 from mogo.connection import Connection
 from mogo.cursor import Cursor
-from mogo.model import UnknownField
+from mogo.field import EmptyRequiredField
+from mogo.helpers import check_none
+from mogo.memory import MemoryClient
+from mogo.model import BulkSaveError, InvalidUpdateCall, PartialDocumentError
+from mogo.model import UnknownField, VersionConflictError
 import pymongo
 from pymongo.collation import Collation
 
-from typing import Any, cast, Optional, overload, Type, TypeVar
+from typing import Any, cast, Dict, Optional, overload, Type, TypeVar
+from typing import Callable, List  # noqa: F401
 
 
 T = TypeVar("T")
@@ -207,6 +216,117 @@ class TestMogoGeneralUsage(unittest.TestCase):
         self.assertEqual(foo.id, qux.id)
         self.assertEqual(qux.typeless, 4)
 
+    def test_search_or_create_upserts_in_a_single_write(self) -> None:
+        with mock.patch.object(Foo, "search") as search:
+            foo = Foo.search_or_create(bar="single", typeless=1)
+        search.assert_not_called()
+        stored = self.assert_not_none(Foo.find_one({"_id": foo.id}))
+        self.assertEqual(("dflt", "funtimes"), (stored.dflt, stored.callme))
+        Foo.update({"_id": foo.id}, {"$set": {"callme": "changed"}})
+        again = Foo.search_or_create(bar="single", typeless=1)
+        self.assertEqual(foo.id, again.id)
+        # the defaults of the new instance don't overwrite the document
+        self.assertEqual("changed", again.callme)
+        self.assertEqual(1, Foo.search(bar="single").count())
+
+    def test_search_or_create_uses_new_and_polymodel_keys(self) -> None:
+        created = FooWithNew.search_or_create(bar="ignored")
+        self.assertEqual("whatever", created.bar)
+        car = SportsCar.search_or_create(wheels=3)
+        self.assertIsInstance(car, SportsCar)
+        self.assertEqual(car.id, Car.search_or_create(wheels=3).id)
+        self.assertIsInstance(Car.grab(car.id), SportsCar)
+        self.assertEqual(car.id, SportsCar.search_or_create(wheels=3).id)
+        self.assertNotEqual(car.id, Convertible.search_or_create(wheels=3).id)
+
+    def test_search_or_create_calls_overridden_save(self) -> None:
+        saved = []  # type: List[Any]
+
+        class Audited(Foo):
+            _name = "foo"
+
+            def save(self, *args: Any, **kwargs: Any) -> Any:
+                saved.append(self.bar)
+                return super().save(*args, **kwargs)
+
+        audited = Audited.search_or_create(bar="audited")
+        self.assertEqual(["audited"], saved)
+        again = Audited.search_or_create(bar="audited")
+        self.assertEqual(audited.id, again.id)
+        self.assertEqual(["audited"], saved)
+        self.assertEqual(1, Foo.search(bar="audited").count())
+
+    def test_search_or_create_checks_required_fields(self) -> None:
+        class Named(Model):
+            _name = "foo"
+            bar = Field[str](str, required=True)
+
+        with self.assertRaises(EmptyRequiredField):
+            Named.search_or_create()
+        self.assertEqual(0, Foo.count())
+
+    def test_search_or_create_finds_matches_of_partial_keywords(self) -> None:
+        class User(Model):
+            email = Field[str](str, required=True)
+            name = Field[str](str, required=True)
+            tags = Field[List[str]](list)
+
+        user = User.create(email="a@x", name="Mal", tags=["a", "b"])
+        self.assertEqual(user.id, User.search_or_create(email="a@x").id)
+        self.assertEqual(user.id, User.search_or_create(tags="a").id)
+        with self.assertRaises(EmptyRequiredField):
+            User.search_or_create(email="b@x")
+        with self.assertRaises(TypeError):
+            User.search_or_create(tags="c")
+        self.assertEqual(1, User.count())
+
+    def test_search_or_create_expires_cached_queries_on_insert(self) -> None:
+        class CachedFoo(Foo):
+            _name = "foo"
+            QUERY_CACHE = QueryCache()
+
+        self.assertEqual(0, CachedFoo.search(bar="cached").count())
+        CachedFoo.search_or_create(bar="cached")
+        self.assertEqual(1, CachedFoo.search(bar="cached").count())
+        CachedFoo.search_or_create(bar="cached")
+        self.assertEqual(1, CachedFoo.search(bar="cached").count())
+        self.assertEqual(
+            (1, 2), (CachedFoo.QUERY_CACHE.hits, CachedFoo.QUERY_CACHE.misses))
+
+    def test_find_one_and_update_returns_models(self) -> None:
+        foo = Foo.create(bar="before", typeless=1)
+        previous = self.assert_not_none(Foo.find_one_and_update(
+            {"bar": "before"}, {"$inc": {"typeless": 1}}))
+        self.assertIsInstance(previous, Foo)
+        self.assertEqual((foo.id, 1), (previous.id, previous.typeless))
+        current = self.assert_not_none(Foo.find_one_and_update(
+            {"_id": foo.id}, {"$set": {"bar": "after"}},
+            projection={"bar": 1},
+            return_document=pymongo.ReturnDocument.AFTER))
+        self.assertEqual("after", current.bar)
+        # the rest of the (partial) document is loaded on access
+        self.assertEqual(2, current.typeless)
+        self.assertIsNone(Foo.find_one_and_update(
+            {"bar": "missing"}, {"$set": {"typeless": 0}}))
+
+    def test_find_one_and_replace_and_delete_return_models(self) -> None:
+        Foo.create(bar="old", typeless=1)
+        replaced = self.assert_not_none(Foo.find_one_and_replace(
+            {"bar": "old"}, {"bar": "new"},
+            return_document=pymongo.ReturnDocument.AFTER))
+        self.assertEqual("new", replaced.bar)
+        self.assertIsNone(replaced.typeless)
+        deleted = self.assert_not_none(Foo.find_one_and_delete(
+            {"bar": "new"}))
+        self.assertEqual(replaced.id, deleted.id)
+        self.assertEqual(0, Foo.count())
+
+    def test_find_one_and_modify_restricts_polymodels(self) -> None:
+        car = Car.create()
+        self.assertIsNone(SportsCar.find_one_and_delete({"_id": car.id}))
+        deleted = Car.find_one_and_delete({"_id": car.id})
+        self.assertEqual(car.id, self.assert_not_none(deleted).id)
+
     def test_find_one_returns_first_matching_entry(self) -> None:
         foo = Foo()
         foo.bar = "find_one"
@@ -383,6 +503,111 @@ class TestMogoGeneralUsage(unittest.TestCase):
         self.assertEqual(result2.bar, "new update")
         self.assertEqual(result.bar, "new update")
 
+    def test_save_only_writes_changed_keys_of_loaded_entry(self) -> None:
+        foo = Foo.create(bar="original")
+        first = self.assert_not_none(Foo.grab(foo.id))
+        second = self.assert_not_none(Foo.grab(foo.id))
+        first.bar = "changed"
+        first.save()
+        second["hidden"] = True
+        second.save()
+        result = self.assert_not_none(Foo.grab(foo.id))
+        self.assertEqual("changed", result.bar)
+        self.assertTrue(result["hidden"])
+
+    def test_save_with_replace_overwrites_entire_entry(self) -> None:
+        foo = Foo.create(bar="original")
+        first = self.assert_not_none(Foo.grab(foo.id))
+        second = self.assert_not_none(Foo.grab(foo.id))
+        first.bar = "changed"
+        first.save()
+        second["hidden"] = True
+        second.save(replace=True)
+        result = self.assert_not_none(Foo.grab(foo.id))
+        self.assertEqual("original", result.bar)
+        self.assertTrue(result["hidden"])
+
+    def test_save_unsets_deleted_keys_and_keeps_list_changes(self) -> None:
+        foo = Foo.create(bar="value", typeless=[1])
+        result = self.assert_not_none(Foo.grab(foo.id))
+        del result["bar"]
+        result["typeless"].append(2)
+        result.save()
+        result = self.assert_not_none(Foo.grab(foo.id))
+        self.assertNotIn("bar", result)
+        self.assertEqual([1, 2], result["typeless"])
+
+    def test_save_restores_entry_deleted_since_it_was_loaded(self) -> None:
+        foo = Foo.create(bar="original", typeless=[1])
+        loaded = self.assert_not_none(Foo.grab(foo.id))
+        second = self.assert_not_none(Foo.grab(foo.id))
+        partial = self.assert_not_none(Foo.find(
+            {"_id": foo.id}).only("bar").first())
+        Foo.remove({"_id": foo.id})
+        loaded.bar = "changed"
+        collection = Foo._get_collection()
+        with mock.patch.object(
+                Foo, "_get_collection", return_value=collection):
+            with mock.patch.object(
+                    collection, "update_one",
+                    wraps=collection.update_one) as update_one:
+                loaded.save()
+        # only the changes are sent, the rest only if nothing matched
+        update_one.assert_called_once_with(
+            {"_id": foo.id}, {"$set": {"bar": "changed"}})
+        result = self.assert_not_none(Foo.grab(foo.id))
+        self.assertEqual("changed", result.bar)
+        self.assertEqual([1], result["typeless"])
+        self.assertEqual("dflt", result["dflt"])
+        Foo.remove({"_id": foo.id})
+        second.bar = "second"
+        Foo.save_many([second])
+        result = self.assert_not_none(Foo.grab(foo.id))
+        self.assertEqual(("second", [1]), (result.bar, result["typeless"]))
+        Foo.remove({"_id": foo.id})
+        partial.bar = "partial"
+        with self.assertRaises(PartialDocumentError):
+            partial.save()
+        self.assertIsNone(Foo.grab(foo.id))
+
+    def test_save_many_inserts_and_updates_models(self) -> None:
+        existing = Foo.create(bar="existing")
+        loaded = self.assert_not_none(Foo.grab(existing.id))
+        loaded.bar = "changed"
+        new_models = [Foo(bar="new{}".format(i)) for i in range(5)]
+        ids = Foo.save_many([loaded] + new_models, batch_size=2)
+        self.assertEqual(6, len(ids))
+        self.assertEqual(existing.id, ids[0])
+        for model, model_id in zip(new_models, ids[1:]):
+            self.assertIsNotNone(model_id)
+            self.assertEqual(model_id, model.id)
+        self.assertEqual(6, Foo.find().count())
+        result = self.assert_not_none(Foo.grab(existing.id))
+        self.assertEqual("changed", result.bar)
+        self.assertEqual("new3", self.assert_not_none(Foo.grab(ids[4])).bar)
+
+    def test_save_many_reports_failed_models(self) -> None:
+        Foo.create_index("bar", unique=True)
+        first = Foo(bar="duplicate")
+        second = Foo(bar="duplicate")
+        third = Foo(bar="unique")
+        with self.assertRaises(BulkSaveError) as context:
+            Foo.save_many([first, second, third])
+        self.assertEqual(
+            [second], [model for model, _ in context.exception.errors])
+        self.assertIsNotNone(first.id)
+        self.assertIsNone(second.id)
+        self.assertIsNotNone(third.id)
+        self.assertEqual(2, Foo.find().count())
+
+    def test_save_many_checks_required_fields_before_writing(self) -> None:
+        class Required(Model):
+            name = Field[str](str, required=True)
+
+        with self.assertRaises(EmptyRequiredField):
+            Required.save_many([Required(name="valid"), Required()])
+        self.assertEqual(0, Required.find().count())
+
     def test_new_fields_added_to_model_with_global_auto_create(self) -> None:
         try:
             mogo.AUTO_CREATE_FIELDS = True
@@ -425,6 +650,49 @@ class TestMogoGeneralUsage(unittest.TestCase):
         finally:
             mogo.AUTO_CREATE_FIELDS = False
 
+    def test_lazy_defaults_are_only_saved_when_read_or_required(self) -> None:
+        calls = []
+
+        def stamp() -> datetime:
+            calls.append(1)
+            return datetime(2020, 1, 1)
+
+        class Lazy(Model):
+            LAZY_DEFAULTS = True
+            stamped = Field[datetime](datetime, default=stamp)
+            status = Field[str](str, required=True, default="new")
+            read = Field[str](str, default="read")
+
+        lazy = Lazy()
+        self.assertEqual(0, len(calls))
+        self.assertEqual({}, lazy.copy())
+        self.assertEqual("read", lazy.read)
+        lazy.save()
+        self.assertEqual(0, len(calls))
+        stored = self.assert_not_none(
+            Lazy._get_collection().find_one({"_id": lazy.id}))
+        self.assertEqual(
+            {"_id": lazy.id, "status": "new", "read": "read"}, stored)
+
+        loaded = self.assert_not_none(Lazy.grab(lazy.id))
+        self.assertEqual(datetime(2020, 1, 1), loaded.stamped)
+        self.assertEqual(1, len(calls))
+        loaded.save()
+        stored = self.assert_not_none(
+            Lazy._get_collection().find_one({"_id": lazy.id}))
+        self.assertEqual(datetime(2020, 1, 1), stored["stamped"])
+
+    def test_lazy_defaults_global_setting_keeps_polymodel_keys(self) -> None:
+        try:
+            mogo.LAZY_DEFAULTS = True
+            car = SportsCar()
+            self.assertEqual({"type": "sportscar_value"}, car.copy())
+            car.save()
+            self.assertIsInstance(Car.grab(car.id), SportsCar)
+            self.assertEqual(2, self.assert_not_none(Car.grab(car.id)).doors)
+        finally:
+            mogo.LAZY_DEFAULTS = False
+
     def test_class_update_affects_all_matching_documents(self) -> None:
         class Mod(Model):
             val = Field(int)
@@ -456,6 +724,242 @@ class TestMogoGeneralUsage(unittest.TestCase):
         self.assertEqual(foo2.mod, 5)
         self.assertEqual(Mod.search(mod=5).count(), 1)
 
+    def test_instance_modifiers_update_atomically_and_locally(self) -> None:
+        class Counter(Model):
+            views = Field[int](int, field_name="v", default=0)
+            tags = Field[List[str]](list, default=list)
+            low = Field[int](int)
+
+        counter = Counter.create(low=5)
+        stale = self.assert_not_none(Counter.grab(counter.id))
+        stale.atomic.inc(views=2)
+        counter.atomic.inc(views=1)
+        # the stored value is loaded, including the other increments
+        self.assertEqual(3, counter.views)
+        counter.atomic.push(tags="a")
+        counter.atomic.push(tags={"$each": ["b", "c"]})
+        counter.atomic.add_to_set(tags="a")
+        counter.atomic.pull(tags="b")
+        counter.atomic.min(low=3)
+        counter.atomic.max(low=1)
+        counter.atomic.inc(**{"stats.hits": 1})
+        self.assertEqual(["a", "c"], counter.tags)
+        self.assertEqual(3, counter.low)
+        self.assertEqual({"hits": 1}, counter["stats"])
+        counter.save()
+        stored = self.assert_not_none(Counter.grab(counter.id))
+        self.assertEqual(
+            {"_id": counter.id, "v": 3, "tags": ["a", "c"], "low": 3,
+             "stats": {"hits": 1}},
+            stored.copy())
+        with self.assertRaises(InvalidUpdateCall):
+            Counter().atomic.inc(views=1)
+        with self.assertRaises(ValueError):
+            counter.atomic.inc()
+
+    def test_instance_modifiers_reload_out_of_date_values(self) -> None:
+        class Counter(Model):
+            views = Field[int](int)
+
+        counter = Counter.create(views=1)
+        Counter.update({"_id": counter.id}, {"$set": {"views": "many"}})
+        Counter.update({"_id": counter.id}, {"$set": {"views": 4}})
+        counter["views"] = "many"
+        counter.atomic.inc(views=1)
+        self.assertEqual(5, counter.views)
+        partial = self.assert_not_none(
+            Counter.find_one({"_id": counter.id}, {"views": 0}))
+        partial.atomic.inc(views=1)
+        self.assertEqual(6, partial.views)
+
+    def test_instance_modifiers_load_the_stored_values(self) -> None:
+        class Counter(Model):
+            LAZY_DECODING = True
+            inc = Field[int](int, default=0)
+            views = Field[int](int, default=0)
+            stats = Field[Dict[str, Any]](dict, default=dict)
+
+        Counter.create()
+        counter = self.assert_not_none(Counter.find_one({}))
+        self.assertIsInstance(counter._pymongo_data, RawBSONDocument)
+        Counter.atomic.inc({"_id": counter.id}, views=5)
+        result = counter.atomic.inc(views=1, **{"stats.hits": 1})
+        self.assertEqual(1, result.matched_count)
+        self.assertEqual((6, {"hits": 1}), (counter.views, counter.stats))
+        self.assertIs(dict, type(counter.stats))
+        counter.inc = 2
+        counter.save()
+        self.assertEqual(
+            2, self.assert_not_none(Counter.grab(counter.id)).inc)
+        Counter._get_collection().delete_one({"_id": counter.id})
+        result = counter.atomic.inc(views=1)
+        self.assertEqual(0, result.matched_count)
+        self.assertEqual(6, counter.views)
+
+    def test_class_modifiers_update_matching_documents(self) -> None:
+        class Counter(Model):
+            views = Field[int](int, field_name="v", default=0)
+            group = Field[int](int)
+
+        for i in range(4):
+            Counter.create(group=i % 2)
+        Counter.atomic.inc({"group": 1}, views=2)
+        self.assertEqual(
+            [0, 0, 0, 2], sorted(c.views for c in Counter.find()))
+        Counter.atomic.inc({"group": 1}, multi=True, views=1)
+        self.assertEqual(
+            [0, 0, 1, 3], sorted(c.views for c in Counter.find()))
+        car = Car.create()
+        SportsCar.atomic.inc({"_id": car.id}, wheels=1)
+        self.assertEqual(4, self.assert_not_none(Car.grab(car.id)).wheels)
+        Car.atomic.inc({"_id": car.id}, wheels=1)
+        self.assertEqual(5, self.assert_not_none(Car.grab(car.id)).wheels)
+
+    def test_versioned_save_raises_on_conflicting_writes(self) -> None:
+        class Versioned(Model):
+            VERSION_FIELD = "_version"
+            name = Field[str](str)
+            rank = Field[int](int)
+
+        versioned = Versioned.create(name="Mal")
+        self.assertEqual(1, versioned["_version"])
+        first = self.assert_not_none(Versioned.grab(versioned.id))
+        second = self.assert_not_none(Versioned.grab(versioned.id))
+        first.rank = 1
+        first.save()
+        self.assertEqual(2, first["_version"])
+        second.name = "Malcolm"
+        with self.assertRaises(VersionConflictError):
+            second.save()
+        with self.assertRaises(VersionConflictError):
+            second.save(replace=True)
+        # saving without changes doesn't write
+        first.save()
+        first.save(replace=True)
+        self.assertEqual(
+            {"_id": versioned.id, "name": "Mal", "rank": 1, "_version": 3},
+            Versioned._get_collection().find_one(versioned.id))
+        first.delete()
+        with self.assertRaises(VersionConflictError):
+            first.save(replace=True)
+
+    def test_versioned_partial_save_raises_on_conflicting_writes(
+            self) -> None:
+        class Versioned(Model):
+            VERSION_FIELD = "_version"
+            name = Field[str](str)
+            rank = Field[int](int)
+
+        versioned = Versioned.create(name="Mal", rank=1)
+        partials = [
+            self.assert_not_none(Versioned.find().only("name").first()),
+            self.assert_not_none(Versioned.find().exclude("_version").first()),
+            self.assert_not_none(Versioned.find_one({}, ["name"])),
+            self.assert_not_none(Versioned.find_one({}, {"_version": 0}))]
+        versioned.rank = 2
+        versioned.save()
+        for partial in partials:
+            partial.name = "Malcolm"
+            with self.assertRaises(VersionConflictError):
+                partial.save()
+        self.assertEqual(
+            "Mal", self.assert_not_none(Versioned.grab(versioned.id)).name)
+
+    def test_versioned_save_adopts_unversioned_documents(self) -> None:
+        class Versioned(Model):
+            VERSION_FIELD = "_version"
+            name = Field[str](str)
+
+        Versioned._get_collection().insert_one({"_id": 1, "name": "Zoe"})
+        legacy = self.assert_not_none(Versioned.find_one({"_id": 1}))
+        legacy.name = "Zoe Washburne"
+        legacy.save()
+        self.assertEqual(1, legacy["_version"])
+        Versioned(_id=2, name="Wash").save()
+        self.assertEqual(
+            [1, 1], [v["_version"] for v in Versioned.find().sort("_id")])
+        partial = self.assert_not_none(
+            Versioned.find_one({"_id": 1}, {"_version": 0}))
+        partial.name = "Zoe"
+        partial.save()
+        self.assertEqual(2, partial["_version"])
+
+    def test_versioned_updates_raise_on_conflicting_writes(self) -> None:
+        class Versioned(Model):
+            VERSION_FIELD = "v"
+            views = Field[int](int, default=0)
+
+        versioned = Versioned.create()
+        stale = self.assert_not_none(Versioned.grab(versioned.id))
+        versioned.update(views=2)
+        self.assertEqual(2, versioned["v"])
+        with self.assertRaises(VersionConflictError):
+            stale.update(views=3)
+        with self.assertRaises(VersionConflictError):
+            stale.atomic.inc(views=1)
+        versioned.atomic.inc(views=1)
+        self.assertEqual((3, 3), (versioned.views, versioned["v"]))
+        # class modifiers don't check the version, but increment it
+        Versioned.atomic.inc({"_id": versioned.id}, views=1)
+        with self.assertRaises(VersionConflictError):
+            versioned.atomic.inc(views=1)
+        stored = self.assert_not_none(Versioned.grab(versioned.id))
+        self.assertEqual((4, 4), (stored.views, stored["v"]))
+        created = Versioned.search_or_create(views=10)
+        self.assertEqual(1, created["v"])
+
+    def test_versioned_class_writes_increment_the_version(self) -> None:
+        class Versioned(Model):
+            VERSION_FIELD = "v"
+            views = Field[int](int, default=0)
+
+        versioned = Versioned.create()
+        Versioned.update({"_id": versioned.id}, {"$set": {"views": 1}})
+        with self.assertRaises(VersionConflictError):
+            versioned.atomic.inc(views=1)
+        updated = self.assert_not_none(Versioned.find_one_and_update(
+            {"_id": versioned.id}, {"$inc": {"views": 1}},
+            return_document=pymongo.ReturnDocument.AFTER))
+        self.assertEqual((2, 3), (updated.views, updated["v"]))
+        replaced = self.assert_not_none(Versioned.find_one_and_replace(
+            {"_id": versioned.id, "v": 3}, {"views": 5},
+            return_document=pymongo.ReturnDocument.AFTER))
+        self.assertEqual((5, 4), (replaced.views, replaced["v"]))
+        with self.assertRaises(VersionConflictError):
+            updated.atomic.inc(views=1)
+        # updates writing the version are left alone
+        Versioned.update(
+            {"_id": versioned.id}, {"$set": {"v": 10}}, multi=True)
+        stored = self.assert_not_none(Versioned.grab(versioned.id))
+        self.assertEqual((5, 10), (stored.views, stored["v"]))
+        Versioned.find_one_and_update(
+            {"_id": versioned.id}, {"$set": {"views": 6, "v": 20}})
+        stored = self.assert_not_none(Versioned.grab(versioned.id))
+        self.assertEqual((6, 20), (stored.views, stored["v"]))
+
+    def test_versioned_save_many_reports_conflicts(self) -> None:
+        class Versioned(Model):
+            VERSION_FIELD = "_version"
+            rank = Field[int](int)
+
+        models = [Versioned.create(rank=i) for i in range(3)]
+        stale = self.assert_not_none(Versioned.grab(models[1].id))
+        models[1].rank = 10
+        models[1].save()
+        for model in models + [stale]:
+            model.rank = cast(int, model.rank) + 1
+        new = Versioned(rank=5)
+        with self.assertRaises(BulkSaveError) as context:
+            Versioned.save_many([models[0], stale, new, models[2]])
+        [(failed, error)] = context.exception.errors
+        self.assertIs(stale, failed)
+        self.assertIsInstance(error["error"], VersionConflictError)
+        self.assertEqual(
+            [(1, 2), (3, 2), (5, 1), (10, 2)],
+            [(v.rank, v["_version"]) for v in Versioned.find().sort("rank")])
+        self.assertEqual(
+            [2, 1, 2], [v["_version"] for v in (models[0], new, models[2])])
+
     def test_cursor_update_affects_all_matching_documents(self) -> None:
         class Atomic(Model):
             value = Field(int)
@@ -485,6 +989,567 @@ class TestMogoGeneralUsage(unittest.TestCase):
         result2 = self.assert_not_none(Foo.find_one({"bar": "ref"}))
         self.assertEqual(result2.ref, foo)  # type: ignore
 
+    def test_cursor_prefetch_resolves_references_in_batches(self) -> None:
+        companies = [Company.create(name="c{}".format(i)) for i in range(3)]
+        for i in range(10):
+            Person.create(name="p{}".format(i), company=companies[i % 3])
+        Person.create(name="nobody", company=None)
+
+        with mock.patch.object(Company, "find", wraps=Company.find) as find:
+            cursor = Person.find({}).prefetch("company", batch_size=4)
+            with mock.patch.object(
+                    Company, "find_one", side_effect=AssertionError):
+                people = list(cursor)
+                for person in people:
+                    if person.name == "nobody":
+                        self.assertIsNone(person.company)
+                    else:
+                        index = int(person["name"][1:])
+                        self.assertEqual(companies[index % 3], person.company)
+        self.assertEqual(3, find.call_count)
+        self.assertEqual(11, len(people))
+
+        # reassigned references are not served from the prefetched values
+        people[0].company = companies[2]
+        self.assertEqual(companies[2], people[0].company)
+        self.assertEqual("c2", people[0].company.name)
+
+    def test_cursor_prefetch_requires_reference_fields(self) -> None:
+        with self.assertRaises(ValueError):
+            Person.find({}).prefetch("name")
+
+    def test_cursor_only_loads_fields_lazily(self) -> None:
+        class Wide(Model):
+            short = Field[str](str, field_name="s")
+            long = Field[str](str)
+            extra = Field[int](int, default=0)
+
+        for i in range(3):
+            Wide.create(short="s{}".format(i), long="x" * 100, extra=i)
+        cursor = Wide.find({}).sort("extra", DESC).limit(2).only("short")
+        results = list(cursor)
+        self.assertEqual(2, len(results))
+        first = results[0]
+        self.assertEqual({"_id", "s"}, set(first.copy()))
+        self.assertEqual("s2", first.short)
+        self.assertEqual("x" * 100, first.long)
+        self.assertEqual(2, first.extra)
+        self.assertEqual({"_id", "s", "long", "extra"}, set(first.copy()))
+
+    def test_cursor_exclude_leaves_fields_out_until_accessed(self) -> None:
+        foo = Foo.create(bar="value", typeless="large")
+        result = self.assert_not_none(Foo.find({}).exclude("typeless").first())
+        self.assertNotIn("typeless", result.copy())
+        self.assertEqual("value", result.bar)
+        self.assertEqual("large", result["typeless"])
+        self.assertEqual(foo.id, result.id)
+
+    def test_partial_models_only_save_changed_fields(self) -> None:
+        foo = Foo.create(bar="value", typeless="kept")
+        result = self.assert_not_none(Foo.find({}).only("bar").first())
+        result.bar = "changed"
+        with self.assertRaises(PartialDocumentError):
+            result.save(replace=True)
+        result.save()
+        stored = self.assert_not_none(Foo.grab(foo.id))
+        self.assertEqual("changed", stored.bar)
+        self.assertEqual("kept", stored.typeless)
+
+    def test_partial_models_save_without_required_fields(self) -> None:
+        class Required(Model):
+            name = Field[str](str, required=True)
+            rank = Field[int](int)
+
+        required = Required.create(name="Mal", rank=1)
+        result = self.assert_not_none(
+            Required.find({}).only("rank").first())
+        result.rank = 2
+        result.save()
+        self.assertNotIn("name", result.copy())
+        stored = self.assert_not_none(Required.grab(required.id))
+        self.assertEqual(("Mal", 2), (stored.name, stored.rank))
+
+    def test_partial_models_keep_stored_values_of_defaults(self) -> None:
+        class Defaults(Model):
+            LAZY_DEFAULTS = True
+            name = Field[str](str, required=True, default="DEFAULT")
+            other = Field[int](int)
+
+        defaults = Defaults.create(name="stored", other=0)
+        result = self.assert_not_none(Defaults.find({}).only("other").first())
+        result.other = 1
+        result.save()
+        self.assertNotIn("name", result.copy())
+        stored = self.assert_not_none(Defaults.grab(defaults.id))
+        self.assertEqual(("stored", 1), (stored.name, stored.other))
+        result = self.assert_not_none(
+            Defaults.find({}).exclude("name").first())
+        self.assertEqual("stored", result.name)
+
+    def test_partial_models_load_dotted_projections_completely(self) -> None:
+        class Located(Model):
+            name = Field[str](str)
+            address = Field[Dict[str, Any]](dict)
+
+        located = Located.create(
+            name="Serenity", address={"city": "Persephone", "zip": "1"})
+        for cursor in (
+                Located.find({}).only("address.city"),
+                Located.find({}).exclude("address.zip")):
+            result = self.assert_not_none(cursor.first())
+            self.assertEqual(
+                {"city": "Persephone", "zip": "1"}, result.address)
+            check_none(result.address)["city"] = "Ariel"
+            result.save()
+            stored = self.assert_not_none(Located.grab(located.id))
+            self.assertEqual(
+                {"city": "Ariel", "zip": "1"}, stored.address)
+            self.assertEqual("Serenity", stored.name)
+            Located.update(
+                {"_id": located.id},
+                {"$set": {"address.city": "Persephone"}})
+
+    def test_find_one_projection_marks_model_as_partial(self) -> None:
+        foo = Foo.create(bar="value", typeless="lazy")
+        result = self.assert_not_none(Foo.find_one({"_id": foo.id}, ["bar"]))
+        self.assertNotIn("typeless", result.copy())
+        self.assertEqual("lazy", result.typeless)
+
+    def test_cursor_projection_rejects_invalid_combinations(self) -> None:
+        with self.assertRaises(ValueError):
+            Foo.find({}).only("bar").exclude("typeless")
+        with self.assertRaises(ValueError):
+            Foo.find({}).exclude("_id")
+
+    def test_cursor_raw_yields_documents(self) -> None:
+        foo = Foo.create(bar="raw")
+        results = list(Foo.search(bar="raw").raw())
+        self.assertEqual(1, len(results))
+        self.assertNotIsInstance(results[0], Model)
+        self.assertEqual(foo.id, results[0]["_id"])
+        self.assertEqual("raw", results[0]["bar"])
+
+    def test_cursor_values_yields_tuples_of_stored_values(self) -> None:
+        class Named(Model):
+            name = Field[str](str, field_name="n")
+            age = Field[int](int)
+
+        for i in range(3):
+            Named.create(name="n{}".format(i), age=i)
+        results = list(Named.find({}).order(age=DESC).values("name", "age"))
+        self.assertEqual([("n2", 2), ("n1", 1), ("n0", 0)], results)
+
+    def test_cursor_values_resolve_dotted_paths(self) -> None:
+        class Located(Model):
+            name = Field[str](str)
+            address = Field[Any](dict)
+
+        Located.create(name="a", address={"city": "Boston", "zip": "02101"})
+        Located.create(name="b", address={"zip": "10001"})
+        Located.create(name="c")
+        results = list(Located.find({}).order(name=ASC).values(
+            "name", "address.city"))
+        self.assertEqual([("a", "Boston"), ("b", None), ("c", None)], results)
+        with self.assertRaises(ValueError):
+            Located.find({}).records("address.city")
+
+    def test_cursor_records_are_keyed_by_storage_names(self) -> None:
+        class Named(Model):
+            name = Field[str](str, field_name="n")
+
+        named = Named.create(name="record")
+        records = list(Named.find({}).records("_id", "name"))
+        self.assertEqual(1, len(records))
+        record = records[0]
+        self.assertEqual({"_id": named.id, "n": "record"}, record._asdict())
+        self.assertEqual("record", getattr(record, "n"))
+        with self.assertRaises(AttributeError):
+            setattr(record, "n", "changed")
+        with self.assertRaises(ValueError):
+            Named.find({}).records()
+
+    def test_cursor_paginate_walks_pages_with_tokens(self) -> None:
+        class Named(Model):
+            name = Field[str](str, field_name="n")
+            rank = Field[int](int)
+
+        for i in range(25):
+            Named.create(name="n{}".format(i % 4), rank=i)
+        expected = sorted(
+            Named.find({}), key=lambda named: (named["n"], named.id))
+
+        for direction, ordered in ((ASC, expected), (DESC, expected[::-1])):
+            results = []  # type: List[Named]
+            token = None  # type: Optional[str]
+            pages = 0
+            while True:
+                page, token = Named.find({}).paginate(
+                    order_by="name", after=token, page_size=10,
+                    direction=direction)
+                results.extend(page)
+                pages += 1
+                if token is None:
+                    break
+            self.assertEqual(3, pages)
+            self.assertEqual(
+                [named.id for named in ordered],
+                [named.id for named in results])
+
+        page, token = Named.search(name="n1").paginate(page_size=5)
+        self.assertEqual(5, len(page))
+        page, token = Named.search(name="n1").paginate(
+            after=token, page_size=5)
+        self.assertEqual(1, len(page))
+        self.assertIsNone(token)
+
+    def test_cursor_paginate_includes_null_and_missing_values(self) -> None:
+        class Named(Model):
+            name = Field[str](str)
+
+        for name in ("c", "a", "b"):
+            Named.create(name=name)
+        Named.create(name=None)
+        Named.create()
+        Named._get_collection().insert_one({"name": None})
+        unnamed = [
+            named.id for named in Named.find({"name": None}).sort("_id")]
+        named = [named.id for named in Named.find(
+            {"name": {"$ne": None}}).sort("name")]
+
+        for direction, expected in (
+                (ASC, unnamed + named), (DESC, named[::-1] + unnamed[::-1])):
+            results = []  # type: List[Any]
+            token = None  # type: Optional[str]
+            while True:
+                page, token = Named.find({}).paginate(
+                    order_by="name", after=token, page_size=2,
+                    direction=direction)
+                results.extend(model.id for model in page)
+                if token is None:
+                    break
+            self.assertEqual(expected, results)
+
+    def test_cursor_paginate_follows_the_order_of_types(self) -> None:
+        class Mixed(Model):
+            value = Field[Any]()
+
+        collection = Mixed._get_collection()
+        ordered = [
+            {"value": None}, {}, {"value": 1}, {"value": 2.5},
+            {"value": 3}, {"value": "a"}, {"value": "b"},
+            {"value": {"x": 1}}, {"value": ObjectId()},
+            {"value": False}, {"value": True},
+            {"value": datetime(2020, 1, 1)}]  # type: List[Dict[str, Any]]
+        ids = [collection.insert_one(value).inserted_id for value in ordered]
+
+        for direction, expected in ((ASC, ids), (DESC, ids[::-1])):
+            results = []  # type: List[Any]
+            token = None  # type: Optional[str]
+            for _ in range(len(ids)):
+                page, token = Mixed.find({}).paginate(
+                    order_by="value", after=token, page_size=2,
+                    direction=direction)
+                results.extend(model.id for model in page)
+                if token is None:
+                    break
+            self.assertIsNone(token)
+            self.assertEqual(expected, results)
+
+        collection.insert_many([{"value": [1, 2]}, {"value": [3]}])
+        with self.assertRaises(ValueError):
+            Mixed.find({"value": {"$type": "array"}}).paginate(
+                order_by="value", page_size=1)
+
+    def test_cursor_paginate_orders_by_dotted_keys(self) -> None:
+        class Nested(Model):
+            nested = Field[Dict[str, Any]](dict)
+
+        for x in (3, 1, 2):
+            Nested.create(nested={"x": x})
+        Nested.create()
+        results = []  # type: List[Any]
+        token = None  # type: Optional[str]
+        for _ in range(5):
+            page, token = Nested.find({}).paginate(
+                order_by="nested.x", after=token, page_size=1)
+            results.extend(
+                (model.get("nested") or {}).get("x") for model in page)
+            if token is None:
+                break
+        self.assertIsNone(token)
+        self.assertEqual([None, 1, 2, 3], results)
+
+    def test_cursor_paginate_restricts_polymodel_pages(self) -> None:
+        for i in range(3):
+            Car.create(doors=i)
+            SportsCar.create(doors=i)
+        page, token = SportsCar.find({}).paginate(
+            order_by="doors", page_size=2)
+        self.assertEqual([0, 1], [car.doors for car in page])
+        page, token = SportsCar.find({}).paginate(
+            order_by="doors", after=token, page_size=2)
+        self.assertEqual([2], [car.doors for car in page])
+        self.assertTrue(all(isinstance(car, SportsCar) for car in page))
+        self.assertIsNone(token)
+
+    def test_cursor_paginate_rejects_invalid_tokens(self) -> None:
+        for i in range(3):
+            Foo.create(bar="page{}".format(i))
+        page, token = Foo.find({}).paginate(order_by="bar", page_size=1)
+        with self.assertRaises(ValueError):
+            Foo.find({}).paginate(order_by="typeless", after=token)
+        with self.assertRaises(ValueError):
+            Foo.find({}).paginate(order_by="bar", after="not-a-token")
+        with self.assertRaises(ValueError):
+            Foo.find({}).paginate(page_size=0)
+
+    def test_query_cache_reuses_results_until_a_write(self) -> None:
+        class Cached(Model):
+            QUERY_CACHE = QueryCache()
+            name = Field[str](str)
+            region = Field[str](str)
+
+        cache = Cached.QUERY_CACHE
+        assert cache is not None
+        first = Cached.create(name="first", region="north")
+        Cached.create(name="second", region="south")
+        collection = Cached._get_collection()
+        with mock.patch.object(
+                Cached, "_get_collection", return_value=collection):
+            with mock.patch.object(
+                    collection, "find", wraps=collection.find) as find:
+                names = [c.name for c in Cached.search(region="north")]
+                cached = [c.name for c in Cached.search(region="north")]
+                self.assertEqual(["first"], names)
+                self.assertEqual(names, cached)
+                # the pymongo cursor is created, but never iterated again
+                self.assertEqual(2, find.call_count)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        self.assertEqual(2, Cached.count())
+        self.assertEqual(2, Cached.count())
+        self.assertEqual(
+            ["north", "south"], sorted(Cached.distinct("region")))
+        regions = Cached.distinct("region")
+        regions.append("modified")
+        self.assertEqual(
+            ["north", "south"], sorted(Cached.distinct("region")))
+        self.assertEqual(4, cache.hits)
+
+        # cached documents are copies
+        Cached.search(region="north").first()
+        model = list(Cached.search(region="north"))[0]
+        model["region"] = "changed"
+        self.assertEqual(
+            "north", list(Cached.search(region="north"))[0].region)
+
+        writes = [
+            lambda: Cached.create(name="third", region="north"),
+            lambda: first.update(name="renamed"),
+            lambda: Cached.update(
+                {"name": "renamed"}, {"$set": {"region": "north"}}),
+            lambda: Cached.find({"name": "third"}).change(region="east"),
+            lambda: Cached.remove({"name": "third"}),
+            lambda: first.delete(),
+        ]  # type: List[Callable[[], Any]]
+        for write in writes:
+            Cached.count()
+            misses = cache.misses
+            write()
+            Cached.count()
+            self.assertEqual(misses + 1, cache.misses)
+        self.assertEqual(1, Cached.count())
+
+    def test_query_cache_only_stores_exhausted_cursors(self) -> None:
+        class Partial(Model):
+            QUERY_CACHE = QueryCache()
+            name = Field[str](str)
+
+        for i in range(3):
+            Partial.create(name="partial{}".format(i))
+        cache = Partial.QUERY_CACHE
+        assert cache is not None
+        self.assertIsNotNone(Partial.find({}).first())
+        self.assertEqual(0, len(cache))
+        # (list() would call len(), which caches the count)
+        self.assertEqual(3, len([p for p in Partial.find({})]))
+        self.assertEqual(1, len(cache))
+        self.assertEqual(
+            3, len([p for p in Partial.find({}).sort("name", DESC)]))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(
+            ["partial2", "partial1"],
+            [p.name for p in Partial.find({}).sort("name", DESC).limit(2)])
+
+    def test_document_cache_serves_lookups_by_id(self) -> None:
+        class Team(Model):
+            DOCUMENT_CACHE = DocumentCache(backend=DictCacheBackend())
+            name = Field[str](str)
+
+        class Player(Model):
+            name = Field[str](str)
+            team = ReferenceField(Team)
+
+        cache = Team.DOCUMENT_CACHE
+        assert cache is not None
+        team = Team.create(name="Serenity")
+        other = Team.create(name="Alliance")
+        Player.create(name="Mal", team=team)
+        Player.create(name="Zoe", team=team)
+        Player.create(name="Hoban", team=other)
+        collection = Team._get_collection()
+        with mock.patch.object(
+                Team, "_get_collection", return_value=collection):
+            with mock.patch.object(
+                    collection, "find_one",
+                    wraps=collection.find_one) as find_one:
+                # saving refreshes the cache
+                self.assertEqual(
+                    "Serenity", check_none(Team.grab(team.id)).name)
+                self.assertEqual(0, find_one.call_count)
+                self.assertIsNot(team, Team.grab(team.id))
+                for player in Player.find({}):
+                    self.assertIsNotNone(player.team)
+                self.assertEqual(0, find_one.call_count)
+
+                team.update(name="Firefly")
+                self.assertEqual(
+                    "Firefly", check_none(Team.grab(team.id)).name)
+                self.assertEqual(1, find_one.call_count)
+                Team.grab(team.id)
+                self.assertEqual(1, find_one.call_count)
+
+                Team.update({}, {"$set": {"name": "Browncoats"}}, multi=True)
+                self.assertEqual(
+                    "Browncoats", check_none(Team.grab(team.id)).name)
+                self.assertEqual(2, find_one.call_count)
+
+                team.delete()
+                self.assertIsNone(Team.grab(team.id))
+                self.assertEqual(3, find_one.call_count)
+
+        Team.DOCUMENT_CACHE = DocumentCache(backend=DictCacheBackend())
+        players = list(Player.find({}).prefetch("team"))
+        teams = [p.team for p in players]
+        self.assertEqual(3, len(teams))
+        self.assertEqual(
+            [other.id], [team.id for team in teams if team is not None])
+        self.assertEqual(2, Team.DOCUMENT_CACHE.misses)
+        with mock.patch.object(Team, "find") as find:
+            players = list(Player.find({"name": "Hoban"}).prefetch("team"))
+            self.assertEqual(other, players[0].team)
+            find.assert_not_called()
+
+    def test_document_cache_checks_polymodel_children(self) -> None:
+        cache = DocumentCache(backend=DictCacheBackend())
+        with mock.patch.object(Car, "DOCUMENT_CACHE", cache):
+            car = Car.create(doors=2)
+            sports_car = SportsCar.create(doors=2)
+            self.assertIsNone(SportsCar.grab(car.id))
+            self.assertIsInstance(Car.grab(sports_car.id), SportsCar)
+            self.assertIsInstance(SportsCar.grab(sports_car.id), SportsCar)
+            self.assertEqual(3, cache.hits)
+
+    def test_parallel_scan_yields_each_model_once(self) -> None:
+        for i in range(50):
+            Foo.create(bar="scan", typeless=i)
+        Foo.create(bar="other")
+        scanned = list(Foo.parallel_scan({"bar": "scan"}, workers=4))
+        self.assertEqual(50, len(scanned))
+        self.assertEqual(
+            list(range(50)), sorted(foo.typeless for foo in scanned))
+        self.assertTrue(all(isinstance(foo, Foo) for foo in scanned))
+
+    def test_parallel_scan_includes_ids_of_other_types(self) -> None:
+        for i in range(200):
+            Foo.create(typeless=i)
+        Foo._get_collection().insert_one({"_id": "legacy-string-id"})
+        with mock.patch("mogo.parallel.SAMPLES_PER_RANGE", 1):
+            scanned = list(Foo.parallel_scan(workers=4))
+        self.assertEqual(201, len(scanned))
+        self.assertIn("legacy-string-id", [foo.id for foo in scanned])
+
+    def test_parallel_scan_calls_back_per_batch(self) -> None:
+        for i in range(30):
+            Foo.create(bar="batch", typeless=i)
+        sizes = list(Foo.parallel_scan(
+            {}, workers=3, callback=len, batch_size=4))
+        self.assertEqual(30, sum(sizes))
+        self.assertTrue(all(0 < size <= 4 for size in sizes))
+
+    def test_parallel_scan_restricts_polymodels(self) -> None:
+        for i in range(5):
+            Car.create(doors=i)
+            SportsCar.create(doors=i)
+        scanned = list(SportsCar.parallel_scan(workers=2))
+        self.assertEqual(5, len(scanned))
+        self.assertTrue(all(isinstance(car, SportsCar) for car in scanned))
+
+    def test_parallel_scan_propagates_callback_errors(self) -> None:
+        Foo.create(bar="error")
+
+        def fail(batch: List[Foo]) -> None:
+            raise RuntimeError("callback failed")
+
+        with self.assertRaises(RuntimeError):
+            list(Foo.parallel_scan(workers=2, callback=fail))
+
+    def test_parallel_scan_rejects_invalid_arguments(self) -> None:
+        with self.assertRaises(ValueError):
+            Foo.parallel_scan(executor="fiber")
+        with self.assertRaises(ValueError):
+            Foo.parallel_scan(workers=0)
+        with self.assertRaises(ValueError):
+            Foo.parallel_scan(executor="process")
+
+    def test_lazy_decoding_models_wrap_raw_documents(self) -> None:
+        class Lazy(Model):
+            LAZY_DECODING = True
+            name = Field[str](str)
+            items = Field[Any]()
+
+        lazy = Lazy.create(name="lazy", items=[{"value": i} for i in range(5)])
+        result = self.assert_not_none(Lazy.find_one({"_id": lazy.id}))
+        self.assertIsInstance(result._pymongo_data, RawBSONDocument)
+        self.assertEqual("lazy", result.name)
+        self.assertIsInstance(result._pymongo_data, RawBSONDocument)
+
+        result.name = "changed"
+        self.assertIsInstance(result._pymongo_data, dict)
+        self.assertEqual(3, result["items"][3]["value"])
+        result.save()
+        stored = self.assert_not_none(Lazy.grab(lazy.id))
+        self.assertEqual("changed", stored.name)
+        self.assertEqual(
+            [{"value": i} for i in range(5)],
+            [dict(item) for item in stored["items"]])
+
+    def test_lazy_decoding_models_decode_nested_values(self) -> None:
+        class Lazy(Model):
+            LAZY_DECODING = True
+            company = ReferenceField(Company)
+            meta = Field[Any](dict)
+
+        company = Company.create(name="Serenity")
+        lazy = Lazy.create(company=company, meta={"a": 1, "nested": {"b": 2}})
+        result = self.assert_not_none(Lazy.find_one({"_id": lazy.id}))
+        self.assertEqual(company, result.company)
+        self.assertIsInstance(result._pymongo_data, RawBSONDocument)
+        prefetched = self.assert_not_none(
+            Lazy.find({}).prefetch("company").first())
+        self.assertEqual(
+            "Serenity", cast(Company, prefetched.company).name)
+
+        meta = cast(Any, result.meta)
+        meta["b"] = 2
+        meta["nested"]["c"] = 3
+        self.assertIsInstance(result._pymongo_data, dict)
+        result.save()
+        stored = self.assert_not_none(Lazy.grab(lazy.id))
+        self.assertEqual(company, stored.company)
+        self.assertEqual(
+            {"a": 1, "b": 2, "nested": {"b": 2, "c": 3}}, stored["meta"])
+
     def test_search_accepts_keywords(self) -> None:
         nothing = Foo.search(bar="whatever").first()
         self.assertEqual(nothing, None)
@@ -647,6 +1712,24 @@ class TestMogoGeneralUsage(unittest.TestCase):
         count = Foo.find().count()
         self.assertEqual(count, 0)
 
+    def test_model_use_reuses_wrapped_class_per_client(self) -> None:
+        client = MemoryClient()
+        with mogo.session(ALTDB, client=client) as first:
+            wrapped = Foo.use(first)
+            self.assertIs(wrapped, Foo.use(first))
+            self.assertIsNot(wrapped, Person.use(first))
+        # e.g. a session per request, sharing the client
+        with mogo.session(ALTDB, client=client) as second:
+            self.assertIs(wrapped, Foo.use(second))
+        with mogo.session(DBNAME, client=client) as other_database:
+            self.assertIsNot(wrapped, Foo.use(other_database))
+        with mogo.session(ALTDB, client=MemoryClient()) as other_client:
+            self.assertIsNot(wrapped, Foo.use(other_client))
+        released = weakref.ref(client)
+        del client, first, second, other_database, wrapped
+        gc.collect()
+        self.assertIsNone(released())
+
     def test_constant_field_allows_setting_before_saving(self) -> None:
         class ConstantModel(Model):
             name = Field(str, required=True)